@@ -0,0 +1,116 @@
+"""
+Benchmark: sync handlers on the threadpool vs. async handlers on AsyncSession
+
+Starts the API under uvicorn once per mode (DB_ASYNC=false/true) and drives it
+with concurrent clients: 80% scene list reads, 20% scene updates spread over a
+few projects. Prints requests/sec and latency percentiles per concurrency level.
+
+Usage: python benchmarks/bench_async_db.py [seconds_per_level] [concurrency ...]
+Needs DATABASE_URL pointing at a migrated Postgres database for meaningful
+numbers (SQLite serializes writers). The load generator shares the machine, so
+compare the two modes with each other rather than reading absolute numbers.
+"""
+import sys
+import os
+import asyncio
+import random
+import socket
+import subprocess
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECTS = 20
+SCENES_PER_PROJECT = 25
+WRITE_RATIO = 0.2
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_server(async_mode: bool):
+    port = free_port()
+    env = {**os.environ, "DB_ASYNC": "true" if async_mode else "false"}
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning", "--no-access-log"],
+        cwd=BACKEND_DIR, env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            httpx.get(f"{base_url}/health", timeout=1)
+            return process, base_url
+        except httpx.TransportError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("uvicorn did not start")
+
+def seed(base_url: str):
+    with httpx.Client(base_url=base_url, timeout=30) as client:
+        workload = []
+        for i in range(PROJECTS):
+            project_id = client.post("/api/projects/", json={"title": f"Async benchmark {i}"}).json()["id"]
+            scene_ids = [
+                client.post("/api/scenes/", json={"project_id": project_id, "prompt_text": f"Scene {j}"}).json()["id"]
+                for j in range(SCENES_PER_PROJECT)
+            ]
+            workload.append((project_id, scene_ids))
+        return workload
+
+def cleanup(base_url: str, workload):
+    with httpx.Client(base_url=base_url, timeout=30) as client:
+        for project_id, _ in workload:
+            client.delete(f"/api/projects/{project_id}")
+
+async def drive(base_url: str, workload, concurrency: int, seconds: float):
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + seconds
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        async def worker():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                project_id, scene_ids = random.choice(workload)
+                start = time.perf_counter()
+                try:
+                    if random.random() < WRITE_RATIO:
+                        response = await client.patch(f"/api/scenes/{random.choice(scene_ids)}", json={"caption": str(start)})
+                    else:
+                        response = await client.get("/api/scenes/", params={"project_id": project_id})
+                    if response.status_code != 200:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    latencies.sort()
+
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+    return len(latencies) / elapsed, percentile(0.5), percentile(0.99), errors
+
+def run(seconds: float, levels):
+    print(f"{'mode':<6} {'clients':>7} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for async_mode in (False, True):
+        process, base_url = start_server(async_mode)
+        try:
+            workload = seed(base_url)
+            for concurrency in levels:
+                rps, p50, p99, errors = asyncio.run(drive(base_url, workload, concurrency, seconds))
+                print(f"{'async' if async_mode else 'sync':<6} {concurrency:>7} {rps:>9.0f} {p50:>9.1f} {p99:>9.1f} {errors:>7}")
+            cleanup(base_url, workload)
+        finally:
+            process.terminate()
+            process.wait()
+
+if __name__ == "__main__":
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+    levels = [int(arg) for arg in sys.argv[2:]] or [50, 100, 250, 500]
+    run(seconds, levels)
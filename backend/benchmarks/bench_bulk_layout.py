@@ -0,0 +1,67 @@
+"""
+Benchmark: persisting a canvas layout change scene-by-scene vs. one bulk PATCH
+
+Usage: python benchmarks/bench_bulk_layout.py [scene_count]
+Uses a throwaway SQLite database unless DATABASE_URL is set.
+"""
+import sys
+import os
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from database import engine, Base
+from main import app
+
+query_count = 0
+
+@event.listens_for(engine, "before_cursor_execute")
+def count_queries(conn, cursor, statement, parameters, context, executemany):
+    global query_count
+    query_count += 1
+
+def run(scene_count: int):
+    Base.metadata.create_all(bind=engine)
+    client = TestClient(app)
+    project = client.post("/api/projects/", json={"title": "Bulk layout benchmark"}).json()
+    scene_ids = [
+        client.post("/api/scenes/", json={"project_id": project["id"], "prompt_text": f"Scene {i}"}).json()["id"]
+        for i in range(scene_count)
+    ]
+
+    def measure(label, fn):
+        global query_count
+        query_count = 0
+        start = time.perf_counter()
+        requests = fn()
+        elapsed = time.perf_counter() - start
+        print(f"{label:<12} {elapsed * 1000:9.1f} ms  {requests:5d} requests  {query_count:6d} queries")
+        return elapsed
+
+    def per_scene():
+        for i, scene_id in enumerate(scene_ids):
+            client.patch(f"/api/scenes/{scene_id}", json={"x": i * 10.0, "y": 50.0})
+        return len(scene_ids)
+
+    def bulk():
+        payload = {
+            "project_id": project["id"],
+            "scenes": [{"id": scene_id, "x": i * 20.0, "y": 80.0} for i, scene_id in enumerate(scene_ids)],
+        }
+        response = client.patch("/api/scenes/bulk", json=payload)
+        assert response.status_code == 200 and len(response.json()) == len(scene_ids)
+        return 1
+
+    print(f"Moving {scene_count} scenes ({engine.url.get_backend_name()})")
+    slow = measure("per-scene", per_scene)
+    fast = measure("bulk", bulk)
+    print(f"Speedup: {slow / fast:.1f}x")
+
+    client.delete(f"/api/projects/{project['id']}")
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -0,0 +1,97 @@
+"""
+Benchmark: startup import time and per-request client overhead
+
+1. Imports `main` in fresh interpreters under `python -X importtime` and
+   reports the median cumulative import time, plus which heavy client
+   libraries were (not) imported.
+2. Times building an OpenAI client, an S3 client and a requests session per
+   call (what generations used to pay) against fetching the shared one from
+   the registry.
+3. Times GETs against a local keep-alive HTTP server with a new session per
+   request against the shared pooled session (plain HTTP; with TLS the gap
+   is larger).
+
+Usage: python benchmarks/bench_clients.py [import_runs] [requests]
+"""
+import sys
+import os
+import statistics
+import subprocess
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "benchmark")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "benchmark")
+
+HEAVY_MODULES = ("boto3", "botocore", "openai", "requests", "httpx")
+
+def import_time(runs: int):
+    probe = "import sys, main; print(','.join(m for m in %r if m in sys.modules))" % (HEAVY_MODULES,)
+    samples, loaded = [], ""
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c", probe], cwd=BACKEND_DIR,
+                                capture_output=True, text=True, check=True)
+        # The last line of the report is `main` itself, with the cumulative time in microseconds
+        main_line = [line for line in result.stderr.splitlines() if line.rstrip().endswith("| main")][-1]
+        samples.append(int(main_line.split("|")[1]) / 1e6)
+        loaded = result.stdout.strip()
+    print(f"import main: median {statistics.median(samples):.2f}s over {runs} runs "
+          f"(heavy client libraries imported: {loaded or 'none'})")
+
+def per_call(label: str, build, iterations: int):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        build()
+    print(f"{label:<40} {(time.perf_counter() - started) / iterations * 1000:8.3f} ms per request")
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without this, delayed ACKs stall every keep-alive response
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        body = b"x" * 1024
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def run(import_runs: int, requests_count: int):
+    import_time(import_runs)
+
+    import boto3
+    import openai
+    import requests
+    from utils import ai_image, clients, s3
+    clients.warm_up()
+    print()
+    per_call("new OpenAI client per request", lambda: openai.OpenAI(api_key="sk-benchmark"), 50)
+    per_call("shared OpenAI client", lambda: ai_image._openai_client.get(), 50)
+    per_call("new S3 client per request", lambda: boto3.client("s3", region_name="us-east-1"), 20)
+    per_call("shared S3 client", s3.get_s3_client, 20)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/image.png"
+
+    def fresh_session():
+        with requests.Session() as session:
+            session.get(url).content
+
+    shared = ai_image.get_http_session()
+    print()
+    per_call("GET with a new session (new connection)", fresh_session, requests_count)
+    per_call("GET with the shared session (keep-alive)", lambda: shared.get(url).content, requests_count)
+    server.shutdown()
+
+if __name__ == "__main__":
+    import_runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    requests_count = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    run(import_runs, requests_count)
@@ -0,0 +1,167 @@
+"""
+Benchmark: deleting a large project and collecting its images
+
+Seeds a project (5,000 scenes with an image and thumbnails each, plus
+connections) and a duplicate that shares its images, and:
+1. Deletes a copy of the board the way the ORM does with children loaded
+   (project.scenes and project.connections read, then deleted row by row), and
+   through DELETE /api/projects/{id} (one statement, rows go via ON DELETE
+   CASCADE). Reports wall time and peak Python memory.
+2. Collects the deleted project's images: a dry run first, then for real. The
+   images the duplicate still uses must survive; orphans must go.
+3. Deletes the duplicate and collects again; now the images go.
+4. Dry-runs a sweep of a live project's prefix, where only old orphans would
+   be deleted.
+
+Usage: python benchmarks/bench_delete.py [scene_count]
+Uses a throwaway SQLite database unless DATABASE_URL is set; images go to a
+throwaway local storage directory.
+"""
+import sys
+import os
+import tempfile
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta, timezone
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+WORK_DIR = tempfile.mkdtemp()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{WORK_DIR}/bench.db")
+os.environ["STORAGE_BACKEND"] = "local"
+os.environ["LOCAL_STORAGE_DIR"] = os.path.join(WORK_DIR, "s3")
+
+from fastapi.testclient import TestClient
+from sqlalchemy import func, insert, select
+from database import engine, SessionLocal
+from database.init_db import init_db
+from models.project import Project
+from models.scene import Scene
+from models.connection import Connection
+from utils import image_gc, s3
+from utils.s3 import get_s3_client, BUCKET_NAME, get_public_url
+from utils.thumbnails import THUMBNAIL_WIDTHS, derivative_key
+from main import app
+
+ORPHANS = 200
+OLD = time.time() - 2 * image_gc.IMAGE_GC_MIN_AGE_SECONDS
+
+def put(key: str, size: int = 2048, mtime: float = None):
+    get_s3_client().put_object(Bucket=BUCKET_NAME, Key=key, Body=os.urandom(size))
+    if mtime is not None:
+        os.utime(os.path.join(s3.LOCAL_STORAGE_DIR, BUCKET_NAME, key), (mtime, mtime))
+
+def seed(scene_count: int, images: bool = True) -> str:
+    project_id = str(uuid.uuid4())
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    scenes = []
+    for i in range(scene_count):
+        scene = {"id": str(uuid.uuid4()), "project_id": project_id, "prompt_text": f"Scene {i}: the harbor at dusk",
+                 "x": (i % 40) * 350.0, "y": (i // 40) * 250.0, "created_at": start + timedelta(seconds=i), "revision": 0}
+        if images:
+            key = f"{project_id}/{uuid.uuid4()}.png"
+            put(key)
+            for width in THUMBNAIL_WIDTHS:
+                put(derivative_key(key, width, "webp"), 512)
+            scene["image_url"] = get_public_url(key)
+            scene["thumbnails"] = {"webp": {str(width): get_public_url(derivative_key(key, width, "webp")) for width in THUMBNAIL_WIDTHS}}
+        scenes.append(scene)
+    db = SessionLocal()
+    try:
+        db.add(Project(id=project_id, title="Delete benchmark"))
+        db.flush()
+        db.execute(insert(Scene), scenes)
+        db.execute(insert(Connection), [
+            {"id": str(uuid.uuid4()), "project_id": project_id, "from_scene_id": scenes[i]["id"],
+             "to_scene_id": scenes[i + 1]["id"], "created_at": start, "revision": 0}
+            for i in range(scene_count - 1)
+        ])
+        db.commit()
+    finally:
+        db.close()
+    return project_id
+
+def measure(label: str, fn):
+    tracemalloc.start()
+    started = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<44} {elapsed * 1000:8.1f} ms  {peak / 1e6:7.1f} MB peak")
+
+def orm_delete(project_id: str):
+    db = SessionLocal()
+    try:
+        project = db.get(Project, project_id)
+        len(project.scenes), len(project.connections)
+        db.delete(project)
+        db.commit()
+    finally:
+        db.close()
+
+def count_rows(project_id: str) -> int:
+    db = SessionLocal()
+    try:
+        return sum(db.scalar(select(func.count()).select_from(model).where(model.project_id == project_id))
+                   for model in (Scene, Connection))
+    finally:
+        db.close()
+
+def stored(prefix: str) -> int:
+    return sum(len(page) for page in s3.list_object_pages(prefix))
+
+def show(label: str, result: dict):
+    for report in result["reports"]:
+        print(f"{label:<12} {report['prefix'][:12] + '…':<14} scanned {report['scanned']:6}  kept {report['kept']:6}  "
+              f"too new {report['too_new']:4}  deleted {report['deleted']:6}  in {report['seconds'] * 1000:7.1f} ms")
+
+def run(scene_count: int):
+    init_db()
+    # Cleanup is run inline below, not on the job queue
+    image_gc.IMAGE_GC_ENABLED = False
+    client = TestClient(app)
+    print(f"{scene_count} scenes, {engine.url.get_backend_name()}\n")
+
+    seeded = seed(scene_count, images=False)
+    measure("ORM delete, children loaded", lambda: orm_delete(seeded))
+    assert count_rows(seeded) == 0
+
+    source = seed(scene_count)
+    duplicate = client.post(f"/api/projects/{source}/duplicate", json={"title": "Copy"}).json()["id"]
+    for i in range(ORPHANS):
+        put(f"{source}/{uuid.uuid4()}.png")
+    source_objects = stored(f"{source}/")
+
+    db = SessionLocal()
+    try:
+        shared = image_gc.project_image_directories(db, source)
+    finally:
+        db.close()
+    measure("DELETE /api/projects/{id}", lambda: client.delete(f"/api/projects/{source}").raise_for_status())
+    assert count_rows(source) == 0
+    print()
+
+    show("dry run", image_gc.collect_project(source, shared, dry_run=True))
+    assert stored(f"{source}/") == source_objects
+    show("collect", image_gc.collect_project(source, shared))
+    assert stored(f"{source}/") == source_objects - ORPHANS, "images the duplicate uses were deleted"
+
+    db = SessionLocal()
+    try:
+        shared = image_gc.project_image_directories(db, duplicate)
+    finally:
+        db.close()
+    client.delete(f"/api/projects/{duplicate}").raise_for_status()
+    show("duplicate", image_gc.collect_project(duplicate, shared))
+    assert stored(f"{source}/") == 0, "images of deleted projects were kept"
+
+    live = seed(10)
+    for i in range(ORPHANS):
+        put(f"{live}/{uuid.uuid4()}.png", mtime=OLD if i % 2 else None)
+    print()
+    show("sweep (dry)", {"reports": [image_gc.collect(f"{live}/", dry_run=True)]})
+
+if __name__ == "__main__":
+    scene_count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    run(scene_count)
@@ -0,0 +1,138 @@
+"""
+Benchmark: duplicating a large project
+
+Seeds a project (1,000 scenes with images by default) and copies it three
+ways: the way the frontend used to (read the board, then POST every scene and
+connection back), and through POST /api/projects/{id}/duplicate with images
+shared and copied. Reports wall time and the time spent in SQL statements.
+
+Usage: python benchmarks/bench_duplicate.py [scene_count]
+Uses a throwaway SQLite database unless DATABASE_URL is set; images go to a
+throwaway local storage directory.
+"""
+import sys
+import os
+import io
+import random
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+WORK_DIR = tempfile.mkdtemp()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{WORK_DIR}/bench.db")
+os.environ["STORAGE_BACKEND"] = "local"
+os.environ["LOCAL_STORAGE_DIR"] = os.path.join(WORK_DIR, "s3")
+
+from fastapi.testclient import TestClient
+from PIL import Image
+from sqlalchemy import event, insert
+from database import engine, SessionLocal
+from database.init_db import init_db
+from models.project import Project
+from models.scene import Scene
+from models.connection import Connection
+from utils.s3 import get_s3_client, BUCKET_NAME, get_public_url
+from utils.thumbnails import THUMBNAIL_WIDTHS, derivative_key
+from main import app
+
+sql_seconds = 0.0
+
+@event.listens_for(engine, "before_cursor_execute")
+def _before(conn, cursor, statement, parameters, context, executemany):
+    conn.info["query_started"] = time.perf_counter()
+
+@event.listens_for(engine, "after_cursor_execute")
+def _after(conn, cursor, statement, parameters, context, executemany):
+    global sql_seconds
+    sql_seconds += time.perf_counter() - conn.info.pop("query_started")
+
+def small_png() -> bytes:
+    buffer = io.BytesIO()
+    Image.effect_noise((64, 64), 32).convert("RGB").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+def seed(scene_count: int):
+    image = small_png()
+    project_id = str(uuid.uuid4())
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    scenes = []
+    for i in range(scene_count):
+        key = f"{project_id}/{uuid.uuid4()}.png"
+        get_s3_client().put_object(Bucket=BUCKET_NAME, Key=key, Body=image, ContentType="image/png")
+        for width in THUMBNAIL_WIDTHS:
+            get_s3_client().put_object(Bucket=BUCKET_NAME, Key=derivative_key(key, width, "webp"), Body=os.urandom(512))
+        scenes.append({
+            "id": str(uuid.uuid4()), "project_id": project_id, "prompt_text": f"Scene {i}: a wide shot of the harbor at dusk",
+            "caption": f"Caption {i}", "image_url": get_public_url(key),
+            "thumbnails": {"webp": {str(width): get_public_url(derivative_key(key, width, "webp")) for width in THUMBNAIL_WIDTHS}},
+            "x": (i % 40) * 350.0, "y": (i // 40) * 250.0, "created_at": start + timedelta(seconds=i), "revision": 0,
+        })
+    pairs = {(i, i + 1) for i in range(scene_count - 1)}
+    pairs.update((i, min(scene_count - 1, i + random.randint(2, 10))) for i in range(0, scene_count - 2, 2))
+    connections = [
+        {"id": str(uuid.uuid4()), "project_id": project_id, "from_scene_id": scenes[a]["id"], "to_scene_id": scenes[b]["id"],
+         "created_at": start, "revision": 0}
+        for a, b in pairs
+    ]
+    db = SessionLocal()
+    try:
+        db.execute(insert(Project), [{"id": project_id, "title": "Duplicate benchmark", "revision": 0}])
+        db.execute(insert(Scene), scenes)
+        db.execute(insert(Connection), connections)
+        db.commit()
+    finally:
+        db.close()
+    return project_id, len(connections)
+
+def client_side_copy(client: TestClient, project_id: str) -> str:
+    """What the frontend did before the endpoint existed"""
+    board = client.get(f"/api/projects/{project_id}/full").json()
+    copy = client.post("/api/projects/", json={"title": board["title"] + " (copy)"}).json()
+    new_ids = {}
+    for scene in board["scenes"]:
+        fields = {name: scene[name] for name in ("prompt_text", "caption", "image_url", "x", "y", "width", "height")}
+        new_ids[scene["id"]] = client.post("/api/scenes/", json={"project_id": copy["id"], **fields}).json()["id"]
+    for connection in board["connections"]:
+        client.post("/api/connections/", json={
+            "project_id": copy["id"], "from_scene_id": new_ids[connection["from_scene_id"]],
+            "to_scene_id": new_ids[connection["to_scene_id"]], "label": connection["label"],
+        })
+    return copy["id"]
+
+def timed(label, fn):
+    global sql_seconds
+    sql_seconds = 0.0
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<36} {elapsed * 1000:>9.0f} ms wall {sql_seconds * 1000:>9.0f} ms SQL")
+    return result
+
+def run(scene_count: int):
+    init_db()
+    project_id, connection_count = seed(scene_count)
+    print(f"{scene_count} scenes, {connection_count} connections ({engine.url.get_backend_name()})")
+    client = TestClient(app).__enter__()
+
+    def counts(new_project_id):
+        board = client.get(f"/api/projects/{new_project_id}/full").json()
+        return f"{len(board['scenes'])} scenes, {len(board['connections'])} connections"
+
+    def endpoint(**options):
+        response = client.post(f"/api/projects/{project_id}/duplicate", json=options)
+        response.raise_for_status()
+        return response.json()["id"]
+
+    for label, fn in (
+        ("POST /duplicate, images shared", lambda: endpoint()),
+        ("POST /duplicate, images copied", lambda: endpoint(copy_images=True)),
+        ("POST /duplicate, template", lambda: endpoint(include_images=False)),
+        # Last: each POSTed scene queues a thumbnail build that runs on in the background
+        ("client-side copy (one POST per row)", lambda: client_side_copy(client, project_id)),
+    ):
+        print(f"{'':<36} -> {counts(timed(label, fn))}")
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
@@ -0,0 +1,168 @@
+"""
+Benchmark: streaming PDF/ZIP export of a large project
+
+Seeds a project with one 1024x1024 PNG per scene in local storage (and a copy
+that also has WebP thumbnails), starts the API under uvicorn for each export
+and downloads it, reporting time to first byte, throughput and how much the
+server's peak memory grew while exporting.
+
+Usage: python benchmarks/bench_export.py [scene_count]
+Uses a throwaway SQLite database and local storage directory.
+"""
+import sys
+import os
+import io
+import socket
+import subprocess
+import tempfile
+import time
+import uuid
+import zipfile
+from datetime import datetime, timedelta, timezone
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+WORK_DIR = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{WORK_DIR}/bench.db"
+os.environ["STORAGE_BACKEND"] = "local"
+os.environ["LOCAL_STORAGE_DIR"] = os.path.join(WORK_DIR, "s3")
+# Seeded URLs must map back to bucket keys in the server process
+os.environ["LOCAL_STORAGE_BASE_URL"] = "http://127.0.0.1/local-s3"
+
+import httpx
+from PIL import Image
+from sqlalchemy import insert
+from database import SessionLocal
+from database.init_db import init_db
+from models.project import Project
+from models.scene import Scene
+from models.connection import Connection
+from utils.s3 import get_s3_client, BUCKET_NAME, get_public_url
+from utils.thumbnails import THUMBNAIL_WIDTHS, derivative_key, render_derivatives
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def sample_images(count: int = 8):
+    images = []
+    for i in range(count):
+        image = Image.linear_gradient("L").resize((1024, 1024)).convert("RGB")
+        noise = Image.effect_noise((1024, 1024), 24 + i * 4).convert("RGB")
+        buffer = io.BytesIO()
+        Image.blend(image, noise, 0.3).save(buffer, format="PNG")
+        images.append(buffer.getvalue())
+    return images
+
+def seed(scene_count: int, images, derivatives=None):
+    project_id = str(uuid.uuid4())
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    scenes = []
+    for i in range(scene_count):
+        key = f"{project_id}/{uuid.uuid4()}.png"
+        get_s3_client().put_object(Bucket=BUCKET_NAME, Key=key, Body=images[i % len(images)], ContentType="image/png")
+        thumbnails = None
+        if derivatives:
+            for (width, fmt), body in derivatives[i % len(images)].items():
+                get_s3_client().put_object(Bucket=BUCKET_NAME, Key=derivative_key(key, width, fmt), Body=body)
+            thumbnails = {"webp": {str(width): get_public_url(derivative_key(key, width, "webp")) for width in THUMBNAIL_WIDTHS}}
+        scenes.append({
+            "id": str(uuid.uuid4()), "project_id": project_id, "prompt_text": f"Scene {i}: a wide shot of the harbor at dusk",
+            "caption": f"Caption {i}", "image_url": get_public_url(key), "thumbnails": thumbnails,
+            "created_at": start + timedelta(seconds=i), "revision": 0,
+        })
+    connections = [
+        {"id": str(uuid.uuid4()), "project_id": project_id, "from_scene_id": scenes[i]["id"], "to_scene_id": scenes[i + 1]["id"],
+         "created_at": start, "revision": 0}
+        for i in range(scene_count - 1)
+    ]
+    db = SessionLocal()
+    try:
+        db.execute(insert(Project), [{"id": project_id, "title": "Export benchmark", "revision": 0}])
+        db.execute(insert(Scene), scenes)
+        db.execute(insert(Connection), connections)
+        db.commit()
+    finally:
+        db.close()
+    total = sum(len(images[i % len(images)]) for i in range(scene_count))
+    return project_id, total
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_server():
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning", "--no-access-log"],
+        cwd=BACKEND_DIR, env=os.environ,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            httpx.get(f"{base_url}/health", timeout=1)
+            return process, base_url
+        except httpx.TransportError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("uvicorn did not start")
+
+def peak_rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+def download(base_url: str, project_id: str, format: str, path: str):
+    started = time.perf_counter()
+    first_byte = None
+    size = 0
+    with open(path, "wb") as sink:
+        with httpx.stream("GET", f"{base_url}/api/projects/{project_id}/export", params={"format": format}, timeout=600) as response:
+            response.raise_for_status()
+            for chunk in response.iter_bytes():
+                if first_byte is None:
+                    first_byte = time.perf_counter() - started
+                size += len(chunk)
+                sink.write(chunk)
+    return first_byte, time.perf_counter() - started, size
+
+def check(format: str, path: str) -> str:
+    if format == "zip":
+        with zipfile.ZipFile(path) as archive:
+            bad = archive.testzip()
+            return f"{len(archive.namelist())} entries, {'corrupt: ' + bad if bad else 'ok'}"
+    with open(path, "rb") as pdf:
+        data = pdf.read()
+    pages = data.count(b"/Type/Page/")
+    return f"{pages} pages, {'ok' if data.startswith(b'%PDF') and data.rstrip().endswith(b'%%EOF') else 'truncated'}"
+
+def run(scene_count: int):
+    init_db()
+    images = sample_images()
+    derivatives = [render_derivatives(image, THUMBNAIL_WIDTHS, ["webp"], 70) for image in images]
+    originals_only, total = seed(scene_count, images)
+    with_thumbnails, _ = seed(scene_count, images, derivatives)
+    print(f"{scene_count} scenes, {total / 1e6:.1f} MB of PNGs")
+    print(f"{'export':<16} {'TTFB ms':>8} {'total s':>8} {'MB':>8} {'MB/s':>7} {'scenes/s':>9} {'peak RSS +MB':>13}  check")
+    for label, project_id, format in (
+        ("pdf", originals_only, "pdf"),
+        ("pdf, thumbnails", with_thumbnails, "pdf"),
+        ("zip", originals_only, "zip"),
+    ):
+        # A fresh server per export so the peak memory is this export's own
+        process, base_url = start_server()
+        try:
+            httpx.get(f"{base_url}/api/projects/{project_id}/graph")
+            before = peak_rss_mb(process.pid)
+            path = os.path.join(WORK_DIR, f"export.{format}")
+            first_byte, elapsed, size = download(base_url, project_id, format, path)
+            growth = peak_rss_mb(process.pid) - before
+        finally:
+            process.terminate()
+            process.wait()
+        print(f"{label:<16} {first_byte * 1000:>8.0f} {elapsed:>8.2f} {size / 1e6:>8.1f} {size / 1e6 / elapsed:>7.1f} "
+              f"{scene_count / elapsed:>9.0f} {growth:>13.1f}  {check(format, path)}")
+        os.remove(path)
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,99 @@
+"""
+Benchmark: importing a shot list vs. posting every scene and connection
+
+Writes a JSON Lines shot list, then times:
+- the old way: one POST /api/scenes/ and one POST /api/connections/ per shot,
+  measured on a sample and extrapolated
+- POST /api/projects/{id}/import with the whole file streamed as the body
+
+It also runs the importer directly on 1x and 5x the file under tracemalloc,
+to show that its peak memory doesn't grow with the file.
+
+Usage: python benchmarks/bench_import.py [rows] [sample]
+Uses a throwaway SQLite database unless DATABASE_URL is set (Postgres uses COPY).
+"""
+import sys
+import os
+import json
+import tempfile
+import time
+import tracemalloc
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+from fastapi.testclient import TestClient
+from database import engine, SessionLocal
+from database.init_db import init_db
+from utils import shot_import
+from main import app
+
+def write_shot_list(path: str, rows: int):
+    with open(path, "w") as f:
+        for i in range(rows):
+            f.write(json.dumps({
+                "shot": i + 1,
+                "prompt": f"Shot {i + 1}: the detective crosses the rain-soaked square toward the lighthouse",
+                "caption": f"Scene {i // 20 + 1}" if i % 20 == 0 else None,
+                "connection_label": "cut" if i % 7 == 0 else None,
+            }) + "\n")
+
+def file_chunks(path: str, size: int = 64 * 1024):
+    with open(path, "rb") as f:
+        while chunk := f.read(size):
+            yield chunk
+
+def per_row_posts(client, path: str, sample: int) -> float:
+    project_id = client.post("/api/projects/", json={"title": "Import benchmark (per row)"}).json()["id"]
+    started = time.perf_counter()
+    previous_id = None
+    with open(path) as f:
+        for _, line in zip(range(sample), f):
+            shot = json.loads(line)
+            scene = client.post("/api/scenes/", json={"project_id": project_id, "prompt_text": shot["prompt"], "caption": shot["caption"]}).json()
+            if previous_id:
+                client.post("/api/connections/", json={"project_id": project_id, "from_scene_id": previous_id, "to_scene_id": scene["id"]})
+            previous_id = scene["id"]
+    return (time.perf_counter() - started) / sample
+
+def import_peak_memory(path: str) -> int:
+    db = SessionLocal()
+    try:
+        project_id = db.connection().exec_driver_sql("SELECT id FROM projects LIMIT 1").scalar()
+        db.commit()
+        tracemalloc.start()
+        with open(path, "rb") as f:
+            shot_import.import_shot_list(db, project_id, f)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return peak
+    finally:
+        db.close()
+
+def run(rows: int, sample: int):
+    init_db()
+    directory = tempfile.mkdtemp()
+    path, big_path = os.path.join(directory, "shots.jsonl"), os.path.join(directory, "shots-5x.jsonl")
+    write_shot_list(path, rows)
+    write_shot_list(big_path, rows * 5)
+    client = TestClient(app)
+    print(f"{rows} shots ({os.path.getsize(path) / 1e6:.1f} MB), {engine.url.get_backend_name()}")
+
+    per_row = per_row_posts(client, path, sample)
+    print(f"POST per scene + connection   {per_row * 1000:7.2f} ms per shot -> {per_row * rows:7.1f} s for {rows} (from {sample})")
+
+    project_id = client.post("/api/projects/", json={"title": "Import benchmark"}).json()["id"]
+    started = time.perf_counter()
+    response = client.post(f"/api/projects/{project_id}/import", content=file_chunks(path))
+    elapsed = time.perf_counter() - started
+    result = response.json()
+    print(f"import endpoint               {elapsed * 1000 / rows:7.3f} ms per shot -> {elapsed:7.2f} s "
+          f"({result['scene_count']} scenes, {result['connection_count']} connections)")
+
+    small, big = import_peak_memory(path), import_peak_memory(big_path)
+    print(f"importer peak memory          {small / 1e6:.1f} MB for {rows} rows, {big / 1e6:.1f} MB for {rows * 5} rows")
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    sample = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    run(rows, sample)
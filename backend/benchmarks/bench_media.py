@@ -0,0 +1,94 @@
+"""
+Benchmark: loading a board's images through /media vs. from the bucket
+
+Stores a board's worth of images (200 x 256 KB by default) in a stand-in
+bucket: the local storage client with a fixed delay per GET, playing S3 (or a
+provider's CDN). Then loads every image:
+1. from the bucket, every time (what clients did before /media)
+2. through /media cold (each a miss: fetched into the disk cache)
+3. through /media warm (served from the disk cache)
+4. through /media with If-None-Match (304, what browsers send after max-age)
+5. through /media as 64 KB ranges
+Reports per-image latency (p50/p99) and the cache's counters.
+
+Usage: python benchmarks/bench_media.py [images] [origin_latency_ms]
+Works offline: images, cache and database go to a throwaway directory.
+"""
+import sys
+import os
+import statistics
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+WORK_DIR = tempfile.mkdtemp()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{WORK_DIR}/bench.db")
+os.environ["STORAGE_BACKEND"] = "s3"
+os.environ["MEDIA_CACHE_DIR"] = os.path.join(WORK_DIR, "media_cache")
+os.environ["MEDIA_SPOOL_DIR"] = os.path.join(WORK_DIR, "media_spool")
+
+from fastapi.testclient import TestClient
+from database.init_db import init_db
+from utils import media, s3
+from main import app
+
+IMAGE_BYTES = 256 * 1024
+
+class SlowBucket(s3.LocalS3Client):
+    """The local storage client, with a round trip's delay on every GET"""
+
+    def __init__(self, root: str, latency_seconds: float):
+        super().__init__(root)
+        self.latency_seconds = latency_seconds
+        self.gets = 0
+
+    def get_object(self, Bucket: str, Key: str, **kwargs):
+        time.sleep(self.latency_seconds)
+        self.gets += 1
+        return super().get_object(Bucket, Key, **kwargs)
+
+def timed(label: str, keys, fetch):
+    latencies = []
+    for key in keys:
+        started = time.perf_counter()
+        fetch(key)
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"{label:<36} p50 {statistics.median(latencies) * 1000:7.2f} ms  p99 {p99 * 1000:7.2f} ms  "
+          f"board {sum(latencies) * 1000:8.1f} ms")
+
+def run(images: int, origin_latency_ms: float):
+    init_db()
+    bucket = SlowBucket(os.path.join(WORK_DIR, "bucket"), origin_latency_ms / 1000)
+    # Stand in for the S3 client the app would build
+    s3._s3_client._client = bucket
+    keys = [f"board/{i:05d}.png" for i in range(images)]
+    for key in keys:
+        bucket.put_object(Bucket=s3.BUCKET_NAME, Key=key, Body=os.urandom(IMAGE_BYTES))
+    client = TestClient(app)
+    print(f"{images} images of {IMAGE_BYTES // 1024} KB, {origin_latency_ms:.0f} ms per bucket GET\n")
+
+    def from_bucket(key):
+        response = bucket.get_object(Bucket=s3.BUCKET_NAME, Key=key)
+        with response["Body"] as body:
+            body.read()
+
+    def via_media(key, headers=None):
+        response = client.get(f"/media/{key}", headers=headers)
+        assert response.status_code in (200, 206, 304), response.status_code
+        return response
+
+    timed("bucket GET", keys, from_bucket)
+    gets = bucket.gets
+    timed("/media cold (miss)", keys, via_media)
+    timed("/media warm (disk cache)", keys, via_media)
+    etags = {key: via_media(key).headers["etag"] for key in keys}
+    timed("/media If-None-Match (304)", keys, lambda key: via_media(key, {"If-None-Match": etags[key]}))
+    timed("/media Range 64 KB", keys, lambda key: via_media(key, {"Range": "bytes=65536-131071"}))
+    print(f"\nbucket GETs through /media: {bucket.gets - gets}; cache {media.cache.stats()}")
+
+if __name__ == "__main__":
+    images = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    origin_latency_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 30
+    run(images, origin_latency_ms)
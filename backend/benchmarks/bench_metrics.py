@@ -0,0 +1,72 @@
+"""
+Benchmark: cost of the metrics middleware and query hooks
+
+Times a trivial ASGI app with and without MetricsMiddleware, and `SELECT 1`
+on an in-memory SQLite engine with and without the query hooks, then renders
+/metrics once the histograms are populated.
+
+Usage: python benchmarks/bench_metrics.py [iterations]
+"""
+import sys
+import os
+import asyncio
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+from utils import metrics
+
+class FakeRoute:
+    path = "/api/scenes/{scene_id}"
+
+async def endpoint(scope, receive, send):
+    scope["route"] = FakeRoute
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+async def send(message):
+    pass
+
+def time_asgi(app, iterations: int) -> float:
+    async def run():
+        started = time.perf_counter()
+        for _ in range(iterations):
+            scope = {"type": "http", "method": "GET", "path": "/api/scenes/1", "headers": []}
+            await app(scope, receive, send)
+        return time.perf_counter() - started
+    return asyncio.run(run())
+
+def time_queries(engine, iterations: int) -> float:
+    with engine.connect() as connection:
+        statement = text("SELECT 1")
+        started = time.perf_counter()
+        for _ in range(iterations):
+            connection.execute(statement).scalar()
+        return time.perf_counter() - started
+
+def report(label: str, bare: float, instrumented: float, iterations: int):
+    overhead = (instrumented - bare) / iterations * 1e6
+    print(f"{label:<28} bare {bare / iterations * 1e6:7.2f} us  instrumented {instrumented / iterations * 1e6:7.2f} us  overhead {overhead:6.2f} us")
+
+def run(iterations: int):
+    bare = min(time_asgi(endpoint, iterations) for _ in range(3))
+    instrumented = min(time_asgi(metrics.MetricsMiddleware(endpoint), iterations) for _ in range(3))
+    report("request middleware", bare, instrumented, iterations)
+
+    plain_engine = create_engine("sqlite://")
+    instrumented_engine = create_engine("sqlite://")
+    metrics.instrument_engine(instrumented_engine, "bench")
+    bare = min(time_queries(plain_engine, iterations) for _ in range(3))
+    instrumented = min(time_queries(instrumented_engine, iterations) for _ in range(3))
+    report("query hooks (SELECT 1)", bare, instrumented, iterations)
+
+    metrics.render()
+    started = time.perf_counter()
+    body = metrics.render()
+    print(f"render /metrics: {(time.perf_counter() - started) * 1000:.2f} ms, {len(body)} bytes")
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
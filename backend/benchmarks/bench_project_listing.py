@@ -0,0 +1,93 @@
+"""
+Benchmark: keyset-paginated project listing vs. loading every project
+
+Usage: python benchmarks/bench_project_listing.py [project_count]
+Uses a throwaway SQLite database unless DATABASE_URL is set.
+"""
+import sys
+import os
+import random
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+from database import engine, Base, SessionLocal
+from models.project import Project
+from models.scene import Scene
+from main import app
+
+WORDS = ["forest", "harbor", "lighthouse", "desert", "city", "storm", "train", "castle", "river", "night"]
+
+def seed(project_count: int):
+    Base.metadata.create_all(bind=engine)
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    projects, scenes = [], []
+    for i in range(project_count):
+        project_id = str(uuid.uuid4())
+        stamp = start + timedelta(seconds=random.randint(0, 3600 * 24 * 365))
+        projects.append({
+            "id": project_id,
+            "title": f"{random.choice(WORDS).title()} {random.choice(WORDS)} {i}",
+            "created_at": stamp,
+            "updated_at": stamp,
+            "revision": 0,
+        })
+        for j in range(3):
+            scenes.append({"id": str(uuid.uuid4()), "project_id": project_id, "prompt_text": f"Scene {j}", "revision": 0})
+    db = SessionLocal()
+    try:
+        for offset in range(0, len(projects), 10000):
+            db.execute(insert(Project), projects[offset:offset + 10000])
+        for offset in range(0, len(scenes), 10000):
+            db.execute(insert(Scene), scenes[offset:offset + 10000])
+        db.commit()
+    finally:
+        db.close()
+
+def timed(label, fn, repeat=5):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    print(f"{label:<34} median {samples[len(samples) // 2] * 1000:9.2f} ms  {result}")
+
+def run(project_count: int):
+    print(f"Seeding {project_count} projects ({engine.url.get_backend_name()})...")
+    seed(project_count)
+    client = TestClient(app)
+
+    def load_everything():
+        db = SessionLocal()
+        try:
+            return f"{len(db.query(Project).all())} rows"
+        finally:
+            db.close()
+
+    def first_page(**params):
+        response = client.get("/api/projects/", params={"limit": 50, **params})
+        return f"{len(response.json())} rows"
+
+    def deep_page():
+        cursor = None
+        for _ in range(20):
+            response = client.get("/api/projects/", params={"limit": 50, **({"cursor": cursor} if cursor else {})})
+            cursor = response.headers.get("X-Next-Cursor")
+        return "page 20"
+
+    timed("unbounded ORM load (old)", load_everything, repeat=3)
+    timed("first page", first_page)
+    timed("first page + stats", lambda: first_page(include_stats=True))
+    timed("20 pages via cursor", deep_page)
+    timed("title prefix 'light'", lambda: first_page(prefix="light"))
+    timed("title search 'storm'", lambda: first_page(q="storm"))
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,89 @@
+"""
+Benchmark: image provider routing against local fake providers
+
+Runs concurrent generations through ProviderRouter with fake providers that
+inject latency, errors and slow outliers, and reports the success rate,
+p50/p95/p99 latency and the calls each provider received for: a flaky
+provider with and without retries and a backup, a provider with a slow tail
+with and without hedging, a dead provider behind a circuit breaker, and a
+rate-limited provider queueing or overflowing to a backup.
+
+Usage: python benchmarks/bench_provider_router.py [generations] [concurrency]
+"""
+import sys
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import ai_image, provider_router
+from utils.ai_image import FakeProvider
+
+class CountingProvider(FakeProvider):
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, prompt, timeout=ai_image.IMAGE_PROVIDER_TIMEOUT_SECONDS):
+        with self._lock:
+            self.calls += 1
+        return super().__call__(prompt, timeout)
+
+def scenario(label, providers, generations, concurrency, retries=2, hedge_after_ms=0, rates="", rate_wait=10.0):
+    ai_image.PROVIDERS.update({provider.name: provider for provider in providers})
+    ai_image.IMAGE_PROVIDERS = ",".join(provider.name for provider in providers)
+    provider_router.IMAGE_PROVIDER_RETRIES = retries
+    provider_router.IMAGE_HEDGE_AFTER_MS = hedge_after_ms
+    provider_router.IMAGE_PROVIDER_RATE_PER_MINUTE = rates
+    provider_router.IMAGE_RATE_LIMIT_WAIT_SECONDS = rate_wait
+    router = provider_router.ProviderRouter()
+
+    def one(index):
+        started = time.perf_counter()
+        try:
+            router.generate(f"benchmark prompt {index}")
+            return time.perf_counter() - started, True
+        except Exception:
+            return time.perf_counter() - started, False
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(generations)))
+    elapsed = time.perf_counter() - started
+    latencies = sorted(seconds for seconds, ok in results if ok)
+    succeeded = len(latencies)
+
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else 0.0
+
+    calls = ", ".join(f"{provider.name} {provider.calls}" for provider in providers)
+    print(f"{label:<36} ok {succeeded / generations:6.1%}  p50 {pct(0.5):6.0f} ms  p95 {pct(0.95):6.0f} ms  "
+          f"p99 {pct(0.99):6.0f} ms  {generations / elapsed:6.1f}/s  calls: {calls}")
+
+def run(generations: int, concurrency: int):
+    # Short backoff so the retry scenarios finish quickly; the shape is what matters
+    provider_router.IMAGE_RETRY_BASE_SECONDS = 0.05
+    provider_router.IMAGE_RETRY_MAX_SECONDS = 0.5
+    print(f"{generations} generations, {concurrency} at a time")
+
+    scenario("flaky (30% errors), no retries", [CountingProvider("flaky", 100, 0.3)], generations, concurrency, retries=0)
+    scenario("flaky, 2 retries", [CountingProvider("flaky", 100, 0.3)], generations, concurrency)
+    scenario("flaky, 2 retries, then backup", [CountingProvider("flaky", 100, 0.3), CountingProvider("backup", 150)],
+             generations, concurrency)
+    scenario("slow tail (5% at 10x), no hedging", [CountingProvider("laggy", 100, 0, 0.05), CountingProvider("backup", 150)],
+             generations, concurrency)
+    scenario("slow tail, hedge after 250 ms", [CountingProvider("laggy", 100, 0, 0.05), CountingProvider("backup", 150)],
+             generations, concurrency, hedge_after_ms=250)
+    scenario("dead provider, breaker + backup", [CountingProvider("dead", 100, 1.0), CountingProvider("backup", 150)],
+             generations, concurrency)
+    scenario("rate limited (300/min), queue", [CountingProvider("limited", 100), CountingProvider("backup", 150)],
+             generations, concurrency, rates="limited=300")
+    scenario("rate limited, overflow after 0.2 s", [CountingProvider("limited", 100), CountingProvider("backup", 150)],
+             generations, concurrency, rates="limited=300", rate_wait=0.2)
+
+if __name__ == "__main__":
+    generations = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    run(generations, concurrency)
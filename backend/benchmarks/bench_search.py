@@ -0,0 +1,115 @@
+"""
+Benchmark: scene search latency on a large database
+
+Seeds scenes whose prompts are drawn from a skewed vocabulary (so some words
+are in thousands of scenes and others in a handful), then times
+GET /api/search/scenes for rare, common, multi-word, phrase, misspelt and
+project-scoped queries.
+
+Usage: python benchmarks/bench_search.py [scene_count] [scenes_per_project]
+Uses a throwaway SQLite database unless DATABASE_URL is set; the numbers that
+matter come from Postgres (SQLite scans every scene).
+"""
+import sys
+import os
+import random
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+from fastapi.testclient import TestClient
+from sqlalchemy import func, insert, select
+from database import engine, SessionLocal
+from database.init_db import init_db
+from models.project import Project
+from models.scene import Scene
+from utils import scene_search
+from main import app
+
+SUBJECTS = ["lighthouse", "harbor", "fisherman", "castle", "dragon", "robot", "train", "market", "forest", "river",
+            "child", "detective", "ship", "garden", "tower", "bridge", "village", "knight", "astronaut", "cat"]
+ADJECTIVES = ["quiet", "stormy", "golden", "abandoned", "crowded", "misty", "ancient", "neon", "frozen", "sunlit"]
+TIMES = ["at dawn", "at dusk", "at night", "in the rain", "in winter", "under a full moon", "at noon", "in fog"]
+SUBJECT_WEIGHTS = [1 / rank for rank in range(1, len(SUBJECTS) + 1)]
+SHOTS = ["wide shot", "close-up", "aerial view", "over the shoulder", "low angle", "tracking shot"]
+
+def vocabulary(size: int, rng: random.Random):
+    syllables = ["ka", "lo", "mi", "ren", "sa", "tor", "vel", "qua", "zin", "dra", "pho", "bel"]
+    return ["".join(rng.choice(syllables) for _ in range(3)) for _ in range(size)]
+
+def prompt(rng: random.Random, rare_words) -> str:
+    # Subjects follow Zipf's law: the first is in over a quarter of all scenes
+    subject = rng.choices(SUBJECTS, SUBJECT_WEIGHTS)[0]
+    extras = " ".join(rng.choice(rare_words) for _ in range(2))
+    return f"{rng.choice(SHOTS)} of a {rng.choice(ADJECTIVES)} {subject} {rng.choice(TIMES)}, {extras}"
+
+def seed(scene_count: int, scenes_per_project: int):
+    rng = random.Random(7)
+    rare_words = vocabulary(20000, rng)
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    project_ids = []
+    db = SessionLocal()
+    try:
+        for offset in range(0, scene_count, scenes_per_project):
+            project_id = str(uuid.uuid4())
+            project_ids.append(project_id)
+            db.execute(insert(Project), [{"id": project_id, "title": f"Search benchmark {len(project_ids)}", "revision": 0}])
+            db.execute(insert(Scene), [
+                {"id": str(uuid.uuid4()), "project_id": project_id, "prompt_text": prompt(rng, rare_words),
+                 "caption": f"The {rng.choice(SUBJECTS)} waits" if rng.random() < 0.3 else None,
+                 "created_at": start + timedelta(seconds=i), "revision": 0}
+                for i in range(min(scenes_per_project, scene_count - offset))
+            ])
+            if len(project_ids) % 50 == 0:
+                db.commit()
+                print(f"  seeded {offset + scenes_per_project} scenes", end="\r")
+        db.commit()
+        if engine.dialect.name == "postgresql":
+            db.connection().exec_driver_sql("ANALYZE scenes")
+            db.commit()
+    finally:
+        db.close()
+    return project_ids, rare_words
+
+def timed(client, label, params, repeat=20):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = client.get("/api/search/scenes", params=params)
+        samples.append(time.perf_counter() - started)
+    samples.sort()
+    results = response.json()
+    top = results[0]["prompt_text"][:50] if results else "-"
+    print(f"{label:<34} p50 {samples[len(samples) // 2] * 1000:7.2f} ms  p95 {samples[int(len(samples) * 0.95)] * 1000:7.2f} ms  "
+          f"{len(results):>3} results  top: {top}")
+
+def run(scene_count: int, scenes_per_project: int):
+    init_db()
+    started = time.perf_counter()
+    project_ids, rare_words = seed(scene_count, scenes_per_project)
+    print(f"{scene_count} scenes in {len(project_ids)} projects, seeded in {time.perf_counter() - started:.0f}s ({engine.url.get_backend_name()})")
+    with SessionLocal() as db:
+        for word in ("lighthouse", "harbor", rare_words[0]):
+            count = db.execute(select(func.count()).where(func.lower(Scene.prompt_text).contains(word))).scalar()
+            print(f"  '{word}' appears in {count} prompts")
+        fuzzy = db.get_bind().dialect.name == "postgresql" and scene_search.SEARCH_FUZZY and scene_search.has_trigram_index(db)
+    print(f"  typo tolerance: {'on' if fuzzy else 'off'}")
+    client = TestClient(app)
+
+    timed(client, "rare word", {"q": rare_words[0]})
+    timed(client, "common word (most frequent subject)", {"q": "lighthouse"})
+    timed(client, "common word, 2nd page", {"q": "lighthouse", "cursor": scene_search.encode_cursor(20)})
+    timed(client, "two words", {"q": "harbor dusk"})
+    timed(client, "phrase", {"q": '"misty castle"'})
+    timed(client, "misspelt word", {"q": "lighthuose"})
+    timed(client, "rare word, one project", {"q": rare_words[1], "project_id": project_ids[-1]})
+    timed(client, "common word, one project", {"q": "lighthouse", "project_id": project_ids[-1]})
+
+if __name__ == "__main__":
+    scene_count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    scenes_per_project = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    run(scene_count, scenes_per_project)
@@ -0,0 +1,127 @@
+"""
+Benchmark: response serialization, pydantic + json vs. plain rows + orjson
+
+Seeds a board and:
+1. Times serialization alone, in µs per scene: validating ORM objects through
+   the response model and encoding with json (what FastAPI does), against
+   shaping column rows and encoding with orjson (and MessagePack if installed).
+2. Times the endpoints end to end with the fast path off and on.
+That both paths send the same bytes is checked by tests/test_fast_response.py.
+
+Usage: python benchmarks/bench_serialization.py [scenes] [rounds]
+Uses a throwaway SQLite database unless DATABASE_URL is set.
+"""
+import sys
+import os
+import json
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import List
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+from fastapi.testclient import TestClient
+from pydantic import TypeAdapter
+from sqlalchemy import insert, select
+from database import engine, SessionLocal
+from database.init_db import init_db
+from models.project import Project
+from models.scene import Scene
+from models.connection import Connection
+from routes.scenes import SceneResponse
+from utils import fast_response
+from main import app
+
+def seed(db, scenes: int) -> str:
+    project_id = str(uuid.uuid4())
+    db.add(Project(id=project_id, title="Serialization benchmark ✦ «storyboard»"))
+    db.flush()
+    created_at = datetime.now(timezone.utc)
+    rows = [{
+        "id": str(uuid.uuid4()),
+        "project_id": project_id,
+        "prompt_text": f"Shot {i + 1}: the detective crosses the rain-soaked square toward the lighthouse — “night”, 雨",
+        "caption": f"Scene {i // 20 + 1}" if i % 20 == 0 else None,
+        "image_url": f"https://example.com/images/{i}.png",
+        "thumbnails": {"webp": {"320": f"https://example.com/thumbs/{i}_w320.webp"}} if i % 2 else None,
+        "x": (i % 100) * 350.0 + 0.25,
+        "y": (i // 100) * 250.0,
+        "width": 300.0,
+        "height": 200.0,
+        "created_at": created_at + timedelta(microseconds=i),
+        "revision": i,
+    } for i in range(scenes)]
+    db.execute(insert(Scene), rows)
+    db.execute(insert(Connection), [{
+        "id": str(uuid.uuid4()),
+        "project_id": project_id,
+        "from_scene_id": rows[i]["id"],
+        "to_scene_id": rows[i + 1]["id"],
+        "label": "cut" if i % 3 == 0 else None,
+        "created_at": created_at + timedelta(microseconds=i),
+    } for i in range(scenes - 1)])
+    db.commit()
+    return project_id
+
+def per_scene(label: str, serialize, scenes: int, rounds: int):
+    serialize()
+    started = time.perf_counter()
+    for _ in range(rounds):
+        body = serialize()
+    elapsed = (time.perf_counter() - started) / rounds
+    print(f"{label:<44} {elapsed / scenes * 1e6:7.2f} µs per scene  ({elapsed * 1000:7.1f} ms, {len(body) / 1e6:.1f} MB)")
+
+def serialization(db, project_id: str, scenes: int, rounds: int):
+    adapter = TypeAdapter(List[SceneResponse])
+    objects = db.scalars(select(Scene).where(Scene.project_id == project_id).order_by(Scene.created_at, Scene.id)).all()
+    columns = fast_response.model_columns(SceneResponse, Scene.__table__)
+    rows = db.execute(select(*columns).where(Scene.project_id == project_id).order_by(Scene.created_at, Scene.id)).mappings().all()
+
+    def pydantic_json():
+        content = adapter.dump_python(adapter.validate_python(objects), mode="json")
+        return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+    def rows_orjson():
+        items, plain_floats = fast_response.shape_rows(SceneResponse, rows)
+        return fast_response.dumps_json(items, plain_floats)
+
+    assert pydantic_json() == rows_orjson(), "fast serialization differs from pydantic + json"
+    per_scene("response model validation + json", pydantic_json, scenes, rounds)
+    per_scene("rows shaped + orjson" if fast_response.orjson else "rows shaped + json (orjson missing)", rows_orjson, scenes, rounds)
+    if fast_response.msgpack is not None:
+        per_scene("rows shaped + MessagePack", lambda: fast_response.dumps_msgpack(fast_response.shape_rows(SceneResponse, rows)[0]),
+                  scenes, rounds)
+    else:
+        print("MessagePack: skipped (msgpack is not installed)")
+
+def end_to_end(client, url: str, label: str, scenes: int, rounds: int):
+    for fast in (False, True):
+        fast_response.FAST_RESPONSES = fast
+        client.get(url)
+        started = time.perf_counter()
+        for _ in range(rounds):
+            client.get(url).raise_for_status()
+        elapsed = (time.perf_counter() - started) / rounds
+        print(f"{label + (' (fast)' if fast else ''):<44} {elapsed / scenes * 1e6:7.2f} µs per scene  ({elapsed * 1000:7.1f} ms per request)")
+    fast_response.FAST_RESPONSES = False
+
+def run(scenes: int, rounds: int):
+    init_db()
+    db = SessionLocal()
+    try:
+        project_id = seed(db, scenes)
+        client = TestClient(app)
+        print(f"{scenes} scenes, {engine.url.get_backend_name()}\n")
+        serialization(db, project_id, scenes, rounds)
+        print()
+        end_to_end(client, f"/api/scenes/?project_id={project_id}", "GET /api/scenes/", scenes, rounds)
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    scenes = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    run(scenes, rounds)
@@ -0,0 +1,124 @@
+"""
+Benchmark: story graph analysis on a large project
+
+Seeds one project with a branching story (about 10k connections by default,
+including a few loops) and times the graph endpoint cold, cached, and after
+single edits that it must catch up on incrementally.
+
+Usage: python benchmarks/bench_story_graph.py [scene_count] [edges_per_scene]
+Uses a throwaway SQLite database unless DATABASE_URL is set.
+"""
+import sys
+import os
+import random
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+from database import engine, SessionLocal
+from database.init_db import init_db
+from models.project import Project
+from models.scene import Scene
+from models.connection import Connection
+from utils import story_graph
+from main import app
+
+def seed(scene_count: int, edges_per_scene: int):
+    project_id = str(uuid.uuid4())
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    scene_ids = [str(uuid.uuid4()) for _ in range(scene_count)]
+    scenes = [
+        {"id": scene_id, "project_id": project_id, "prompt_text": f"Scene {i}", "created_at": start + timedelta(seconds=i), "revision": 0}
+        for i, scene_id in enumerate(scene_ids)
+    ]
+    pairs = set()
+    for i in range(scene_count - 1):
+        # Mostly forward edges to nearby scenes, i.e. branches that merge again
+        pairs.add((i, i + 1))
+        for _ in range(edges_per_scene - 1):
+            pairs.add((i, min(scene_count - 1, i + random.randint(1, 20))))
+    for _ in range(5):
+        i = random.randint(20, scene_count - 1)
+        pairs.add((i, i - random.randint(1, 10)))
+    connections = [
+        {"id": str(uuid.uuid4()), "project_id": project_id, "from_scene_id": scene_ids[a], "to_scene_id": scene_ids[b],
+         "created_at": start, "revision": 0}
+        for a, b in pairs if a != b
+    ]
+    db = SessionLocal()
+    try:
+        db.execute(insert(Project), [{"id": project_id, "title": "Graph benchmark", "revision": 0}])
+        db.execute(insert(Scene), scenes)
+        for offset in range(0, len(connections), 5000):
+            db.execute(insert(Connection), connections[offset:offset + 5000])
+        db.commit()
+    finally:
+        db.close()
+    return project_id, scene_ids, len(connections)
+
+def timed(label, fn, repeat=5):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    print(f"{label:<40} median {samples[len(samples) // 2] * 1000:8.2f} ms  {result}")
+
+def run(scene_count: int, edges_per_scene: int):
+    init_db()
+    project_id, scene_ids, edge_count = seed(scene_count, edges_per_scene)
+    print(f"{scene_count} scenes, {edge_count} connections ({engine.url.get_backend_name()})")
+    client = TestClient(app)
+
+    def summary(response):
+        data = response.json()
+        return f"{response.status_code}, {len(data['order'])} ordered, {len(data['cycles'])} cycles, {len(data['branches'])} branches"
+
+    def cold():
+        story_graph.invalidate(project_id)
+        return summary(client.get(f"/api/projects/{project_id}/graph"))
+
+    def analyze_only():
+        with SessionLocal() as db:
+            graph = story_graph.get_graph(db, project_id, 0)
+        graph._changed()
+        start = time.perf_counter()
+        graph.analyze()
+        return f"analysis alone {(time.perf_counter() - start) * 1000:.2f} ms"
+
+    def edit_then_get():
+        a, b = random.sample(range(scene_count), 2)
+        client.post("/api/connections/", json={"project_id": project_id, "from_scene_id": scene_ids[a], "to_scene_id": scene_ids[b]})
+        start = time.perf_counter()
+        response = client.get(f"/api/projects/{project_id}/graph")
+        return f"{summary(response)}; GET {(time.perf_counter() - start) * 1000:.2f} ms"
+
+    def caption_then_get():
+        client.patch(f"/api/scenes/{random.choice(scene_ids)}", json={"caption": str(time.time())})
+        start = time.perf_counter()
+        response = client.get(f"/api/projects/{project_id}/graph")
+        return f"{response.status_code}; GET {(time.perf_counter() - start) * 1000:.2f} ms"
+
+    def path():
+        response = client.get(f"/api/projects/{project_id}/graph/path", params={"from_scene_id": scene_ids[0], "to_scene_id": random.choice(scene_ids)})
+        return f"{response.status_code}, {len(response.json().get('path', []))} scenes"
+
+    timed("GET /health (test client overhead)", lambda: client.get("/health").status_code, repeat=20)
+    timed("GET /graph, cold (load + analyze)", cold)
+    timed("analyze() in memory", analyze_only)
+    timed("GET /graph, cached", lambda: summary(client.get(f"/api/projects/{project_id}/graph")), repeat=20)
+    timed("add connection, then GET /graph", edit_then_get)
+    timed("edit caption, then GET /graph", caption_then_get)
+    timed("GET /graph/path", path, repeat=20)
+
+if __name__ == "__main__":
+    scene_count = int(sys.argv[1]) if len(sys.argv) > 1 else 2500
+    edges_per_scene = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    run(scene_count, edges_per_scene)
@@ -0,0 +1,114 @@
+"""
+Benchmark: loading a whole board vs. only the scenes in the viewport
+
+Seeds one project with a grid of scenes (and a few other projects of the same
+size, so the index has to pick one project's scenes out of many) and times
+GET /api/scenes/ for:
+- every scene, in full (what the canvas used to load)
+- every scene as a summary (?detail=summary)
+- a 1920x1080 viewport at random positions (?bbox=)
+- a zoomed-out viewport, 4x larger, as summaries
+
+Usage: python benchmarks/bench_viewport.py [scenes] [other_projects] [requests]
+Uses a throwaway SQLite database unless DATABASE_URL is set (Postgres uses the GiST index).
+"""
+import sys
+import os
+import random
+import statistics
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+from database import engine, SessionLocal
+from database.init_db import init_db
+from models.project import Project
+from models.scene import Scene
+from utils import scene_viewport
+from main import app
+
+COLUMNS = 200
+PITCH_X, PITCH_Y = 350.0, 250.0
+VIEWPORT_W, VIEWPORT_H = 1920.0, 1080.0
+
+def seed_project(db, scenes: int) -> str:
+    project_id = str(uuid.uuid4())
+    db.add(Project(id=project_id, title="Viewport benchmark"))
+    db.flush()
+    created_at = datetime.now(timezone.utc)
+    for start in range(0, scenes, 5000):
+        db.execute(insert(Scene), [{
+            "id": str(uuid.uuid4()),
+            "project_id": project_id,
+            "prompt_text": f"Shot {i + 1}: the detective crosses the rain-soaked square toward the lighthouse at dusk",
+            "caption": f"Scene {i // 20 + 1}" if i % 20 == 0 else None,
+            "image_url": f"https://example.com/images/{i}.png",
+            "thumbnails": {"webp": {"320": f"https://example.com/thumbs/{i}_w320.webp", "640": f"https://example.com/thumbs/{i}_w640.webp"}},
+            "x": (i % COLUMNS) * PITCH_X,
+            "y": (i // COLUMNS) * PITCH_Y,
+            "width": 300.0,
+            "height": 200.0,
+            "created_at": created_at + timedelta(microseconds=i),
+        } for i in range(start, min(scenes, start + 5000))])
+    db.commit()
+    return project_id
+
+def timed(client, url: str):
+    started = time.perf_counter()
+    response = client.get(url)
+    elapsed = time.perf_counter() - started
+    response.raise_for_status()
+    return elapsed, len(response.content), len(response.json())
+
+def report(label: str, samples):
+    times = sorted(elapsed for elapsed, _, _ in samples)
+    sizes = statistics.mean(size for _, size, _ in samples)
+    counts = statistics.mean(count for _, _, count in samples)
+    print(f"{label:<34} p50 {times[len(times) // 2] * 1000:8.1f} ms  p99 {times[min(len(times) - 1, int(len(times) * 0.99))] * 1000:8.1f} ms  "
+          f"{counts:7.0f} scenes  {sizes / 1e3:8.1f} KB")
+
+def viewports(scenes: int, requests: int, zoom: float):
+    board_w, board_h = COLUMNS * PITCH_X, (scenes // COLUMNS + 1) * PITCH_Y
+    width, height = VIEWPORT_W * zoom, VIEWPORT_H * zoom
+    for _ in range(requests):
+        x, y = random.uniform(0, max(0.0, board_w - width)), random.uniform(0, max(0.0, board_h - height))
+        yield f"{x:.0f},{y:.0f},{x + width:.0f},{y + height:.0f}"
+
+def run(scenes: int, other_projects: int, requests: int):
+    init_db()
+    random.seed(7)
+    db = SessionLocal()
+    try:
+        for _ in range(other_projects):
+            seed_project(db, scenes)
+        project_id = seed_project(db, scenes)
+        if engine.url.get_backend_name() == "postgresql":
+            db.connection().exec_driver_sql("ANALYZE scenes")
+            db.commit()
+            query = scene_viewport.scenes_query("postgresql", project_id, (0.0, 0.0, VIEWPORT_W, VIEWPORT_H))
+            compiled = query.compile(engine, compile_kwargs={"literal_binds": True})
+            plan = [row[0] for row in db.connection().exec_driver_sql(f"EXPLAIN {compiled}")]
+            print("viewport plan uses:", ", ".join(sorted({word for line in plan for word in line.split() if word.startswith("ix_")})) or "no index")
+    finally:
+        db.close()
+
+    client = TestClient(app)
+    base = f"/api/scenes/?project_id={project_id}"
+    print(f"{scenes} scenes on the board, {scenes * (other_projects + 1)} in the table, {engine.url.get_backend_name()}")
+    report("whole board, full", [timed(client, base) for _ in range(max(3, requests // 20))])
+    report("whole board, summary", [timed(client, f"{base}&detail=summary") for _ in range(max(3, requests // 20))])
+    report("1920x1080 viewport, full", [timed(client, f"{base}&bbox={bbox}") for bbox in viewports(scenes, requests, 1)])
+    report("4x zoomed-out viewport, summary", [timed(client, f"{base}&bbox={bbox}&detail=summary")
+                                              for bbox in viewports(scenes, requests, 4)])
+
+if __name__ == "__main__":
+    scenes = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    other_projects = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    requests = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+    run(scenes, other_projects, requests)
@@ -0,0 +1,322 @@
+"""
+Load test: editor traffic against the real API, with stand-ins for the image provider and S3
+
+Seeds synthetic projects, starts `main:app` under uvicorn with the stub image
+provider and local storage (or the S3-compatible server at S3_ENDPOINT_URL,
+e.g. moto or MinIO), and drives it with concurrent editors for a fixed time.
+Each editor works on one project and picks actions by weight:
+
+  open      GET /api/projects/{id}/full
+  drag      PATCH /api/scenes/bulk moving 1-5 scenes
+  connect   POST /api/connections/ between two random scenes (409 for an existing pair is fine)
+  generate  POST /api/generate_image/ with a new prompt, then PATCH the scene's image_url
+
+Reports throughput and p50/p95/p99 per action, and SQL statements per request
+for each route (read from /metrics). The run is compared with the saved
+baseline of the same name; the script exits with status 1 on a regression.
+
+Usage:
+  python benchmarks/load_test.py                    # run and compare with the baseline
+  python benchmarks/load_test.py --save-baseline    # run and record the baseline
+  python benchmarks/load_test.py --projects 20 --scenes 500 --concurrency 32 --duration 30 --mix open=1,drag=6,connect=2,generate=1
+
+Uses a throwaway SQLite database unless DATABASE_URL is set. Timings depend on
+the machine, so baselines (benchmarks/baselines/<name>.json) are only
+comparable with runs on the same one.
+"""
+import sys
+import os
+import argparse
+import asyncio
+import json
+import random
+import re
+import socket
+import subprocess
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+WORK_DIR = tempfile.mkdtemp()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{WORK_DIR}/load.db")
+os.environ["IMAGE_PROVIDER"] = "stub"
+if not os.getenv("S3_ENDPOINT_URL"):
+    os.environ["STORAGE_BACKEND"] = "local"
+    os.environ["LOCAL_STORAGE_DIR"] = os.path.join(WORK_DIR, "s3")
+
+import httpx
+from sqlalchemy import insert
+from database import DB_ASYNC, engine, SessionLocal
+from database.init_db import init_db
+from models.project import Project
+from models.scene import Scene
+from models.connection import Connection
+from utils.s3 import STORAGE_BACKEND, BUCKET_NAME, get_s3_client
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+DEFAULT_MIX = "open=2,drag=5,connect=2,generate=1"
+# Responses other than these count as errors
+EXPECTED_STATUS = {"connect": (200, 409)}
+
+def seed(projects: int, scenes: int, connections_per_scene: int, rng: random.Random):
+    """Insert projects with scenes laid out on a grid and mostly-forward connections; returns [(project_id, scene_ids)]"""
+    workload = []
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    db = SessionLocal()
+    try:
+        for p in range(projects):
+            project_id = str(uuid.uuid4())
+            scene_ids = [str(uuid.uuid4()) for _ in range(scenes)]
+            pairs = set()
+            for i in range(scenes - 1):
+                for _ in range(connections_per_scene):
+                    pairs.add((i, min(scenes - 1, i + rng.randint(1, 10))))
+            db.execute(insert(Project), [{"id": project_id, "title": f"Load test {p}", "revision": 0}])
+            db.execute(insert(Scene), [
+                {"id": scene_id, "project_id": project_id, "prompt_text": f"Scene {i}: a wide shot of the harbor at dusk",
+                 "caption": f"Caption {i}", "x": (i % 20) * 350.0, "y": (i // 20) * 250.0,
+                 "created_at": start + timedelta(seconds=i), "revision": 0}
+                for i, scene_id in enumerate(scene_ids)
+            ])
+            if pairs:
+                db.execute(insert(Connection), [
+                    {"id": str(uuid.uuid4()), "project_id": project_id, "from_scene_id": scene_ids[a], "to_scene_id": scene_ids[b],
+                     "created_at": start, "revision": 0}
+                    for a, b in pairs
+                ])
+            workload.append((project_id, scene_ids))
+        db.commit()
+    finally:
+        db.close()
+    return workload
+
+def ensure_bucket():
+    if STORAGE_BACKEND == "local":
+        return
+    try:
+        get_s3_client().head_bucket(Bucket=BUCKET_NAME)
+    except Exception:
+        get_s3_client().create_bucket(Bucket=BUCKET_NAME)
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_server(provider_latency_ms: float):
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    env = {
+        **os.environ,
+        "IMAGE_STUB_LATENCY_MS": str(provider_latency_ms),
+        "LOCAL_STORAGE_BASE_URL": f"{base_url}/local-s3",
+        "METRICS_ENABLED": "true",
+    }
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning", "--no-access-log"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL,
+    )
+    for _ in range(100):
+        try:
+            httpx.get(f"{base_url}/health", timeout=1)
+            return process, base_url
+        except httpx.TransportError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("uvicorn did not start")
+
+async def open_project(client, rng, project_id, scene_ids):
+    return [await client.get(f"/api/projects/{project_id}/full")]
+
+async def drag(client, rng, project_id, scene_ids):
+    moved = [
+        {"id": scene_id, "x": round(rng.uniform(0, 7000), 1), "y": round(rng.uniform(0, 7000), 1)}
+        for scene_id in rng.sample(scene_ids, min(len(scene_ids), rng.randint(1, 5)))
+    ]
+    return [await client.patch("/api/scenes/bulk", json={"project_id": project_id, "scenes": moved})]
+
+async def connect(client, rng, project_id, scene_ids):
+    from_scene_id, to_scene_id = rng.sample(scene_ids, 2)
+    return [await client.post("/api/connections/", json={"project_id": project_id, "from_scene_id": from_scene_id, "to_scene_id": to_scene_id})]
+
+async def generate(client, rng, project_id, scene_ids):
+    # A prompt nobody asked for before, so the image cache misses and the full pipeline runs
+    prompt = f"A lighthouse in a storm, variation {rng.getrandbits(48):x}"
+    generated = await client.post("/api/generate_image/", json={"prompt": prompt, "project_id": project_id})
+    if generated.status_code != 200:
+        return [generated]
+    updated = await client.patch(f"/api/scenes/{rng.choice(scene_ids)}", json={"image_url": generated.json()["image_url"]})
+    return [generated, updated]
+
+ACTIONS = {"open": open_project, "drag": drag, "connect": connect, "generate": generate}
+
+def parse_mix(spec: str) -> dict:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in ACTIONS:
+            raise SystemExit(f"Unknown action in --mix: {name!r} (choose from {', '.join(ACTIONS)})")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+async def drive(base_url: str, workload, mix: dict, concurrency: int, seconds: float, seed: int):
+    """Run `concurrency` editors in a closed loop for `seconds`; returns {action: [(seconds, ok), ...]}"""
+    names, weights = list(mix), list(mix.values())
+    samples = {name: [] for name in names}
+    deadline = time.perf_counter() + seconds
+
+    async def editor(index: int):
+        rng = random.Random(seed * 1000 + index)
+        project_id, scene_ids = workload[index % len(workload)]
+        while time.perf_counter() < deadline:
+            action = rng.choices(names, weights)[0]
+            started = time.perf_counter()
+            try:
+                responses = await ACTIONS[action](client, rng, project_id, scene_ids)
+                ok = all(response.status_code in EXPECTED_STATUS.get(action, (200,)) for response in responses)
+            except httpx.HTTPError:
+                ok = False
+            samples[action].append((time.perf_counter() - started, ok))
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+        await asyncio.gather(*(editor(index) for index in range(concurrency)))
+    return samples
+
+SAMPLE_LINE = re.compile(r'^(http_request_db_queries_(?:sum|count))\{method="([^"]*)",route="([^"]*)"\} (\S+)$')
+
+def scrape_queries(base_url: str) -> dict:
+    """{"METHOD route": [queries, requests]} from the server's /metrics"""
+    totals = {}
+    for line in httpx.get(f"{base_url}/metrics").text.splitlines():
+        match = SAMPLE_LINE.match(line)
+        if match:
+            name, method, route, value = match.groups()
+            entry = totals.setdefault(f"{method} {route}", [0.0, 0.0])
+            entry[0 if name.endswith("_sum") else 1] = float(value)
+    return totals
+
+def percentile(sorted_values, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+def summarize(samples: dict, seconds: float, before: dict, after: dict) -> dict:
+    actions = {}
+    for name, results in samples.items():
+        latencies = sorted(latency for latency, _ in results)
+        actions[name] = {
+            "ops": len(results),
+            "ops_per_second": round(len(results) / seconds, 2),
+            "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+            "errors": sum(1 for _, ok in results if not ok),
+        }
+    routes = {}
+    for route, (queries, requests) in after.items():
+        previous_queries, previous_requests = before.get(route, (0.0, 0.0))
+        count = requests - previous_requests
+        if count > 0 and not route.endswith(("/metrics", "/health")):
+            routes[route] = {"requests": int(count), "queries_per_request": round((queries - previous_queries) / count, 2)}
+    total = sum(action["ops"] for action in actions.values())
+    return {"throughput": round(total / seconds, 2), "actions": actions, "routes": routes}
+
+def print_report(result: dict):
+    print(f"\n{'action':<10} {'ops':>7} {'ops/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for name, action in result["actions"].items():
+        print(f"{name:<10} {action['ops']:>7} {action['ops_per_second']:>8.1f} {action['p50_ms']:>8.1f} "
+              f"{action['p95_ms']:>8.1f} {action['p99_ms']:>8.1f} {action['errors']:>7}")
+    print(f"{'total':<10} {'':>7} {result['throughput']:>8.1f}")
+    print(f"\n{'route':<52} {'requests':>9} {'queries/request':>16}")
+    for route, stats in sorted(result["routes"].items()):
+        print(f"{route:<52} {stats['requests']:>9} {stats['queries_per_request']:>16.2f}")
+
+def compare(result: dict, baseline: dict, tolerance: float) -> list:
+    """Regressions against a baseline: slower p95, lower throughput, more errors, or more queries per request"""
+    regressions = []
+    for name, current in result["actions"].items():
+        before = baseline["actions"].get(name)
+        if not before:
+            continue
+        if current["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {before['p95_ms']:.1f} -> {current['p95_ms']:.1f} ms")
+        if current["ops_per_second"] < before["ops_per_second"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {before['ops_per_second']:.1f} -> {current['ops_per_second']:.1f} ops/s")
+        error_rate = current["errors"] / max(1, current["ops"])
+        if error_rate > before["errors"] / max(1, before["ops"]) + 0.01:
+            regressions.append(f"{name}: errors {before['errors']}/{before['ops']} -> {current['errors']}/{current['ops']}")
+    for route, current in result["routes"].items():
+        before = baseline["routes"].get(route)
+        # Query counts barely vary between runs, so any real increase is a change in the code
+        if before and current["queries_per_request"] > before["queries_per_request"] + 0.5:
+            regressions.append(f"{route}: {before['queries_per_request']:.2f} -> {current['queries_per_request']:.2f} queries/request")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive the API with editor traffic and compare with a baseline")
+    parser.add_argument("--projects", type=int, default=10)
+    parser.add_argument("--scenes", type=int, default=200, help="scenes per project")
+    parser.add_argument("--connections-per-scene", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, default=16, help="editors working at once")
+    parser.add_argument("--duration", type=float, default=20, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=3, help="unmeasured seconds before the run")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"action weights (default {DEFAULT_MIX})")
+    parser.add_argument("--provider-latency-ms", type=float, default=200, help="simulated image provider latency")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--baseline", help="baseline name (default: <database>-<sync|async>)")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before a timing counts as a regression")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    config = {key: value for key, value in vars(args).items() if key not in ("baseline", "save_baseline", "tolerance")}
+    name = args.baseline or f"{engine.url.get_backend_name()}-{'async' if DB_ASYNC else 'sync'}"
+
+    init_db()
+    ensure_bucket()
+    workload = seed(args.projects, args.scenes, args.connections_per_scene, random.Random(args.seed))
+    print(f"{args.projects} projects x {args.scenes} scenes, {args.concurrency} editors, {args.duration:.0f}s "
+          f"({engine.url.get_backend_name()}, {'async' if DB_ASYNC else 'sync'} handlers, {STORAGE_BACKEND} storage)")
+
+    process, base_url = start_server(args.provider_latency_ms)
+    try:
+        if args.warmup > 0:
+            asyncio.run(drive(base_url, workload, mix, args.concurrency, args.warmup, args.seed + 1))
+        before = scrape_queries(base_url)
+        samples = asyncio.run(drive(base_url, workload, mix, args.concurrency, args.duration, args.seed))
+        after = scrape_queries(base_url)
+    finally:
+        process.terminate()
+        process.wait()
+
+    result = {"config": config, **summarize(samples, args.duration, before, after)}
+    print_report(result)
+
+    path = os.path.join(BASELINE_DIR, f"{name}.json")
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        with open(path, "w") as baseline_file:
+            json.dump(result, baseline_file, indent=2, sort_keys=True)
+        print(f"\nSaved baseline {path}")
+        return
+    if not os.path.exists(path):
+        print(f"\nNo baseline at {path}; run with --save-baseline to record one")
+        return
+    with open(path) as baseline_file:
+        baseline = json.load(baseline_file)
+    if baseline.get("config") != config:
+        print(f"\n⚠️  Baseline {name} was recorded with different settings: {baseline.get('config')}")
+    regressions = compare(result, baseline, args.tolerance)
+    if regressions:
+        print(f"\nRegressions against baseline {name}:")
+        for regression in regressions:
+            print(f"  - {regression}")
+        sys.exit(1)
+    print(f"\nNo regressions against baseline {name} (tolerance {args.tolerance:.0%})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Build thumbnails for scenes whose images predate the derivative pipeline
+
+Usage: python database/backfill_thumbnails.py [--project-id ID] [--parallelism N] [--force]
+Scenes are read in batches by id, and at most --parallelism images are
+downloaded/encoded/uploaded at a time (encoding runs in the thumbnail process pool).
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from database import SessionLocal
+from models.scene import Scene
+from utils.image_pipeline import store_scene_thumbnails
+from utils.s3 import key_for_url
+from utils import thumbnails
+
+BATCH_SIZE = 500
+
+def scene_batches(project_id: str = None, force: bool = False):
+    """Yield lists of (scene id, image_url) needing thumbnails, keyset-paginated by id"""
+    last_id = ""
+    while True:
+        db = SessionLocal()
+        try:
+            query = db.query(Scene.id, Scene.image_url).filter(Scene.id > last_id, Scene.image_url.isnot(None))
+            if project_id:
+                query = query.filter(Scene.project_id == project_id)
+            if not force:
+                query = query.filter(Scene.thumbnails.is_(None))
+            rows = query.order_by(Scene.id).limit(BATCH_SIZE).all()
+        finally:
+            db.close()
+        if not rows:
+            return
+        last_id = rows[-1].id
+        yield [(row.id, row.image_url) for row in rows]
+
+def backfill(project_id: str = None, parallelism: int = 4, force: bool = False):
+    if not thumbnails.THUMBNAILS_ENABLED:
+        print("❌ THUMBNAILS_ENABLED is false; nothing to do")
+        return
+    started = time.perf_counter()
+    done = skipped = failed = 0
+
+    def process(scene):
+        scene_id, image_url = scene
+        if key_for_url(image_url) is None:
+            # Provider URLs and other external images can't have derivatives stored next to them
+            return "skipped"
+        try:
+            return "done" if store_scene_thumbnails(scene_id, image_url, force) else "failed"
+        except Exception as e:
+            print(f"⚠️  WARNING: Thumbnails failed for scene {scene_id}: {str(e)}")
+            return "failed"
+
+    try:
+        with ThreadPoolExecutor(max_workers=parallelism) as executor:
+            for batch in scene_batches(project_id, force):
+                for outcome in executor.map(process, batch):
+                    done += outcome == "done"
+                    skipped += outcome == "skipped"
+                    failed += outcome == "failed"
+                print(f"… {done} done, {skipped} skipped, {failed} failed ({time.perf_counter() - started:.1f}s)")
+    finally:
+        thumbnails.shutdown()
+    print(f"✅ Thumbnail backfill finished: {done} done, {skipped} skipped (not in our bucket), {failed} failed")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build thumbnails for existing scenes")
+    parser.add_argument("--project-id", help="Only scenes of this project")
+    parser.add_argument("--parallelism", type=int, default=4, help="Images processed at once (default 4)")
+    parser.add_argument("--force", action="store_true", help="Rebuild thumbnails that already exist")
+    args = parser.parse_args()
+    backfill(args.project_id, max(1, args.parallelism), args.force)
@@ -0,0 +1,39 @@
+"""
+Delete stored images that no scene refers to any more
+
+Usage: python database/collect_images.py [--prefix PREFIX] [--dry-run] [--min-age-seconds N]
+Sweeps the whole bucket unless --prefix is given (e.g. a project id followed
+by "/"). With --dry-run nothing is deleted, and the report lists what would be.
+Objects younger than --min-age-seconds (default IMAGE_GC_MIN_AGE_SECONDS) are
+kept, since generated images are uploaded before their scene is saved.
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+from utils import image_gc
+
+def main():
+    parser = argparse.ArgumentParser(description="Delete stored images no scene refers to")
+    parser.add_argument("--prefix", default="", help="Only objects whose key starts with this (default: the whole bucket)")
+    parser.add_argument("--dry-run", action="store_true", help="Report what would be deleted without deleting it")
+    parser.add_argument("--min-age-seconds", type=int, default=image_gc.IMAGE_GC_MIN_AGE_SECONDS,
+                        help=f"Keep objects younger than this (default {image_gc.IMAGE_GC_MIN_AGE_SECONDS})")
+    args = parser.parse_args()
+
+    report = image_gc.collect(args.prefix, args.dry_run, max(0, args.min_age_seconds))
+    print(f"{'🔍 Dry run: would delete' if report['dry_run'] else '✅ Deleted'} {report['deleted']} objects "
+          f"({report['deleted_bytes'] / 1e6:.1f} MB); scanned {report['scanned']}, kept {report['kept']} in use "
+          f"and {report['too_new']} too new")
+    for key in report["sample"]:
+        print(f"   {key}")
+    if report["deleted"] > len(report["sample"]):
+        print(f"   … and {report['deleted'] - len(report['sample'])} more")
+    for error in report["errors"]:
+        print(f"❌ {error['key']}: {error['error']}")
+    if report["errors"]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
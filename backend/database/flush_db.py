@@ -7,8 +7,8 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from sqlalchemy import text
-from database import engine, Base
-from models import User, Project, Scene, Connection
+from database import engine
+from database.init_db import init_db
 
 def flush_database():
     """Drop all tables and recreate them"""
@@ -18,10 +18,13 @@ def flush_database():
     with engine.connect() as conn:
         try:
             # Drop all tables in reverse order of dependencies
+            conn.execute(text("DROP TABLE IF EXISTS tombstones CASCADE"))
+            conn.execute(text("DROP TABLE IF EXISTS image_cache CASCADE"))
             conn.execute(text("DROP TABLE IF EXISTS connections CASCADE"))
             conn.execute(text("DROP TABLE IF EXISTS scenes CASCADE"))
             conn.execute(text("DROP TABLE IF EXISTS projects CASCADE"))
             conn.execute(text("DROP TABLE IF EXISTS users CASCADE"))
+            conn.execute(text("DROP TABLE IF EXISTS alembic_version"))
             conn.commit()
             print("✅ All tables dropped successfully!")
         except Exception as e:
@@ -31,10 +34,9 @@ def flush_database():
     
     print("Creating tables with new schema...")
     try:
-        # Recreate all tables with the current schema
-        Base.metadata.create_all(bind=engine)
+        # Recreate all tables by replaying the migrations
+        init_db()
         print("✅ Database flushed and recreated successfully!")
-        print("✅ All tables created with the new schema (no user_id in projects)")
     except Exception as e:
         print(f"❌ Error creating tables: {e}")
         raise
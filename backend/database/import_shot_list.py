@@ -0,0 +1,46 @@
+"""
+Import a shot list (JSON Lines or CSV) into an existing project
+
+Usage: python database/import_shot_list.py PROJECT_ID FILE [--format jsonl|csv] [--no-chain]
+FILE may be `-` for stdin. The format defaults to the file extension (.csv
+is CSV, anything else JSON Lines). Rows are streamed in batches, so the file
+never has to fit in memory.
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+from database import SessionLocal
+from utils import shot_import
+from utils.pubsub import publish_project_event
+
+def main():
+    parser = argparse.ArgumentParser(description="Import a shot list into a project")
+    parser.add_argument("project_id")
+    parser.add_argument("file", help="Path to the shot list, or - for stdin")
+    parser.add_argument("--format", choices=shot_import.FORMATS, help="Default: from the file extension")
+    parser.add_argument("--no-chain", action="store_true", help="Don't connect consecutive shots")
+    args = parser.parse_args()
+
+    fmt = args.format or ("csv" if args.file.lower().endswith(".csv") else "jsonl")
+    stream = sys.stdin.buffer if args.file == "-" else open(args.file, "rb")
+    db = SessionLocal()
+    try:
+        result = shot_import.import_shot_list(db, args.project_id, stream, fmt, chain=not args.no_chain)
+    except shot_import.ShotImportError as e:
+        print("❌ Shot list has invalid rows; nothing was imported:")
+        for error in e.errors:
+            print(f"   line {error['line']}: {error['error']}")
+        sys.exit(1)
+    finally:
+        db.close()
+        stream.close()
+    if result is None:
+        print(f"❌ Project {args.project_id} not found")
+        sys.exit(1)
+    publish_project_event(args.project_id, "scenes.imported", {"scene_count": result["scene_count"], "connection_count": result["connection_count"]}, result["revision"])
+    print(f"✅ {result['scene_count']} scenes and {result['connection_count']} connections at revision {result['revision']}")
+
+if __name__ == "__main__":
+    main()
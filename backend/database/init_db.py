@@ -2,13 +2,42 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from database import engine, Base
-from models import User, Project, Scene, Connection
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect
+from database import engine
+
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic.ini")
+# Schemas that init_db's old create_all() produced, for databases that predate migrations:
+# the original models, and later ones with the revision columns, tombstones and image cache
+BASELINE_REVISION = "0001_baseline"
+LEGACY_REVISION = "0002_revisions_image_cache"
+
+def alembic_config() -> Config:
+    config = Config(ALEMBIC_INI)
+    config.set_main_option("script_location", os.path.join(os.path.dirname(ALEMBIC_INI), "migrations"))
+    return config
+
+def legacy_revision(inspector) -> str:
+    """The revision an unversioned schema matches: 0002 only if everything it adds is there"""
+    tables = set(inspector.get_table_names())
+    if not {"tombstones", "image_cache"} <= tables:
+        return BASELINE_REVISION
+    for table in ("projects", "scenes", "connections"):
+        if "revision" not in {column["name"] for column in inspector.get_columns(table)}:
+            return BASELINE_REVISION
+    return LEGACY_REVISION
 
 def init_db():
-    Base.metadata.create_all(bind=engine)
+    config = alembic_config()
+    inspector = inspect(engine)
+    tables = inspector.get_table_names()
+    if "projects" in tables and "alembic_version" not in tables:
+        revision = legacy_revision(inspector)
+        print(f"Existing schema without migration history, marking it as {revision}")
+        command.stamp(config, revision)
+    command.upgrade(config, "head")
     print("Database tables created successfully!")
 
 if __name__ == "__main__":
     init_db()
-
@@ -1,12 +1,24 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
-from routes import projects, scenes, connections, generate_image
+from fastapi.staticfiles import StaticFiles
+from routes import projects, scenes, connections, generate_image, realtime, story_graph, export, search, shot_import, media
+from database import DB_ASYNC, engine, async_engine
+from utils.jobs import job_queue
+from utils import clients, metrics, thumbnails
+from utils import media as media_utils
+from utils import export as export_utils
+from utils.pubsub import get_broker
+from utils.s3 import STORAGE_BACKEND, LOCAL_STORAGE_DIR, BUCKET_NAME
+import anyio
 import sys
 import os
 
 # Add backend directory to path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+# Threads available to sync route handlers (AnyIO's default is 40); keep it in line with the DB pool
+API_THREADPOOL_SIZE = int(os.getenv("API_THREADPOOL_SIZE", "40"))
+
 app = FastAPI(title="Storyboard API", version="1.0.0")
 
 # CORS middleware
@@ -16,13 +28,65 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor", "Content-Disposition", "Server-Timing", "Content-Range", "Accept-Ranges"],
 )
+# Added last so it sees every request, including CORS preflights
+app.add_middleware(metrics.MetricsMiddleware)
+metrics.instrument_engine(engine, "sync")
+if async_engine is not None:
+    metrics.instrument_engine(async_engine.sync_engine, "async")
 
 # Include routers
-app.include_router(projects.router, prefix="/api/projects", tags=["projects"])
-app.include_router(scenes.router, prefix="/api/scenes", tags=["scenes"])
-app.include_router(connections.router, prefix="/api/connections", tags=["connections"])
+if DB_ASYNC:
+    from routes import projects_async, scenes_async, connections_async
+    app.include_router(projects_async.router, prefix="/api/projects", tags=["projects"])
+    app.include_router(scenes_async.router, prefix="/api/scenes", tags=["scenes"])
+    app.include_router(connections_async.router, prefix="/api/connections", tags=["connections"])
+else:
+    app.include_router(projects.router, prefix="/api/projects", tags=["projects"])
+    app.include_router(scenes.router, prefix="/api/scenes", tags=["scenes"])
+    app.include_router(connections.router, prefix="/api/connections", tags=["connections"])
 app.include_router(generate_image.router, prefix="/api/generate_image", tags=["generate_image"])
+app.include_router(realtime.router, prefix="/api/projects", tags=["realtime"])
+app.include_router(story_graph.router, prefix="/api/projects", tags=["story_graph"])
+app.include_router(export.router, prefix="/api/projects", tags=["export"])
+app.include_router(shot_import.router, prefix="/api/projects", tags=["import"])
+app.include_router(search.router, prefix="/api/search", tags=["search"])
+app.include_router(media.router, prefix="/media", tags=["media"])
+
+# Serve images from the local storage stand-in when S3 is not used
+if STORAGE_BACKEND == "local":
+    app.mount("/local-s3", StaticFiles(directory=os.path.join(LOCAL_STORAGE_DIR, BUCKET_NAME), check_dir=False), name="local-s3")
+
+@app.on_event("startup")
+async def configure_threadpool():
+    anyio.to_thread.current_default_thread_limiter().total_tokens = API_THREADPOOL_SIZE
+
+@app.on_event("startup")
+def warm_up_clients():
+    # S3/OpenAI/HTTP clients are built in the background; requests don't wait for them
+    clients.start_warm_up()
+
+@app.on_event("startup")
+def upload_spooled_media():
+    # Images spooled to disk because their upload failed get another try
+    media_utils.queue_spool_upload()
+
+@app.on_event("shutdown")
+def shutdown_job_queue():
+    job_queue.shutdown(wait=False)
+    thumbnails.shutdown()
+    export_utils.shutdown()
+    clients.close_all()
+
+@app.on_event("shutdown")
+async def shutdown_pubsub():
+    await get_broker().close()
+
+@app.on_event("shutdown")
+async def shutdown_async_engine():
+    if async_engine is not None:
+        await async_engine.dispose()
 
 @app.get("/")
 def read_root():
@@ -32,3 +96,8 @@ def read_root():
 def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    # Rendered on the event loop so a scrape isn't queued behind a saturated threadpool
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
@@ -0,0 +1,58 @@
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import create_engine, pool
+
+from database import DATABASE_URL, Base
+import models  # noqa: F401  (registers every table on Base.metadata)
+
+config = context.config
+
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+target_metadata = Base.metadata
+
+# Postgres-only search column and indexes, created by raw SQL in 0005_scene_search/0006_scene_viewport/0008_scene_bounds_by_project and not modelled
+UNMODELED_OBJECTS = {
+    ("column", "search_vector"),
+    ("index", "ix_scenes_search_vector"),
+    ("index", "ix_scenes_search_text_trgm"),
+    ("index", "ix_scenes_bounds"),
+}
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    return not (reflected and compare_to is None and (type_, name) in UNMODELED_OBJECTS)
+
+
+def _configure(**kwargs):
+    context.configure(
+        target_metadata=target_metadata,
+        # SQLite can't ALTER constraints in place; batch mode rebuilds the table
+        render_as_batch=DATABASE_URL.startswith("sqlite"),
+        include_object=include_object,
+        **kwargs,
+    )
+
+
+def run_migrations_offline() -> None:
+    """Emit the migration SQL for DATABASE_URL without connecting"""
+    _configure(url=DATABASE_URL, literal_binds=True, dialect_opts={"paramstyle": "named"})
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    """Run migrations against DATABASE_URL"""
+    connectable = create_engine(DATABASE_URL, poolclass=pool.NullPool)
+    with connectable.connect() as connection:
+        _configure(connection=connection)
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,81 @@
+"""Baseline schema: users, projects, scenes, connections
+
+Revision ID: 0001_baseline
+Revises:
+Create Date: 2026-10-18 09:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001_baseline"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Constraint names match what Postgres picked for the old create_all() schema
+    op.create_table(
+        "users",
+        sa.Column("id", sa.String(), nullable=False),
+        sa.Column("email", sa.String(), nullable=False),
+        sa.Column("password_hash", sa.String(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint("id", name="users_pkey"),
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+
+    op.create_table(
+        "projects",
+        sa.Column("id", sa.String(), nullable=False),
+        sa.Column("title", sa.String(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint("id", name="projects_pkey"),
+    )
+    op.create_index("ix_projects_id", "projects", ["id"])
+
+    op.create_table(
+        "scenes",
+        sa.Column("id", sa.String(), nullable=False),
+        sa.Column("project_id", sa.String(), nullable=False),
+        sa.Column("prompt_text", sa.String(), nullable=False),
+        sa.Column("caption", sa.String()),
+        sa.Column("image_url", sa.String()),
+        sa.Column("x", sa.Float()),
+        sa.Column("y", sa.Float()),
+        sa.Column("width", sa.Float()),
+        sa.Column("height", sa.Float()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint("id", name="scenes_pkey"),
+        sa.ForeignKeyConstraint(["project_id"], ["projects.id"], name="scenes_project_id_fkey"),
+    )
+    op.create_index("ix_scenes_id", "scenes", ["id"])
+
+    op.create_table(
+        "connections",
+        sa.Column("id", sa.String(), nullable=False),
+        sa.Column("project_id", sa.String(), nullable=False),
+        sa.Column("from_scene_id", sa.String(), nullable=False),
+        sa.Column("to_scene_id", sa.String(), nullable=False),
+        sa.Column("label", sa.String()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint("id", name="connections_pkey"),
+        sa.ForeignKeyConstraint(["project_id"], ["projects.id"], name="connections_project_id_fkey"),
+        sa.ForeignKeyConstraint(["from_scene_id"], ["scenes.id"], name="connections_from_scene_id_fkey"),
+        sa.ForeignKeyConstraint(["to_scene_id"], ["scenes.id"], name="connections_to_scene_id_fkey"),
+    )
+    op.create_index("ix_connections_id", "connections", ["id"])
+
+
+def downgrade() -> None:
+    op.drop_table("connections")
+    op.drop_table("scenes")
+    op.drop_table("projects")
+    op.drop_table("users")
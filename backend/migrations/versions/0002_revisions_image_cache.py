@@ -0,0 +1,90 @@
+"""Project revisions, tombstones, image cache and project list indexes
+
+Databases that predate migrations were built by create_all() from whatever
+the models were at the time, so any of these may exist already; only the
+missing ones are created.
+
+Revision ID: 0002_revisions_image_cache
+Revises: 0001_baseline
+Create Date: 2026-10-18 09:05:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002_revisions_image_cache"
+down_revision: Union[str, None] = "0001_baseline"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+    indexes = {name: {index["name"] for index in inspector.get_indexes(name)} for name in tables}
+
+    def create_index(name, table, columns):
+        if name not in indexes.get(table, ()):
+            op.create_index(name, table, columns)
+
+    if "image_cache" not in tables:
+        op.create_table(
+            "image_cache",
+            sa.Column("key", sa.String(), nullable=False),
+            sa.Column("provider", sa.String(), nullable=False),
+            sa.Column("model", sa.String(), nullable=False),
+            sa.Column("size", sa.String(), nullable=False),
+            sa.Column("quality", sa.String(), nullable=False),
+            sa.Column("prompt", sa.String(), nullable=False),
+            sa.Column("s3_key", sa.String(), nullable=False),
+            sa.Column("image_url", sa.String(), nullable=False),
+            sa.Column("hit_count", sa.Integer(), nullable=False),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.Column("last_used_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.PrimaryKeyConstraint("key", name="image_cache_pkey"),
+        )
+    create_index("ix_image_cache_last_used_at", "image_cache", ["last_used_at"])
+
+    for table in ("projects", "scenes", "connections"):
+        if "revision" not in {column["name"] for column in inspector.get_columns(table)}:
+            op.add_column(table, sa.Column("revision", sa.Integer(), nullable=False, server_default="0"))
+
+    if "tombstones" not in tables:
+        op.create_table(
+            "tombstones",
+            sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column("project_id", sa.String(), nullable=False),
+            sa.Column("entity_type", sa.String(), nullable=False),
+            sa.Column("entity_id", sa.String(), nullable=False),
+            sa.Column("revision", sa.Integer(), nullable=False),
+            sa.Column("deleted_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.PrimaryKeyConstraint("id", name="tombstones_pkey"),
+            sa.ForeignKeyConstraint(["project_id"], ["projects.id"], name="tombstones_project_id_fkey"),
+        )
+    create_index("ix_tombstones_project_id_revision", "tombstones", ["project_id", "revision"])
+    create_index("ix_scenes_project_id_revision", "scenes", ["project_id", "revision"])
+    create_index("ix_connections_project_id_revision", "connections", ["project_id", "revision"])
+
+    create_index("ix_projects_updated_at_id", "projects", ["updated_at", "id"])
+    # Expression indexes aren't reflected on SQLite, hence IF NOT EXISTS
+    if op.get_bind().dialect.name == "postgresql":
+        # text_pattern_ops lets LIKE 'prefix%' use the index under any collation
+        op.execute("CREATE INDEX IF NOT EXISTS ix_projects_title_lower ON projects (lower(title) text_pattern_ops)")
+    else:
+        op.execute("CREATE INDEX IF NOT EXISTS ix_projects_title_lower ON projects (lower(title))")
+
+
+def downgrade() -> None:
+    op.drop_index("ix_projects_title_lower", table_name="projects")
+    op.drop_index("ix_projects_updated_at_id", table_name="projects")
+    op.drop_index("ix_connections_project_id_revision", table_name="connections")
+    op.drop_index("ix_scenes_project_id_revision", table_name="scenes")
+    op.drop_table("tombstones")
+    for table in ("connections", "scenes", "projects"):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column("revision")
+    op.drop_table("image_cache")
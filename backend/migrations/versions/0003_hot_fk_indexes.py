@@ -0,0 +1,89 @@
+"""Indexes for project/scene foreign-key lookups, unique connections, ON DELETE CASCADE
+
+Revision ID: 0003_hot_fk_indexes
+Revises: 0002_revisions_image_cache
+Create Date: 2026-10-18 09:10:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003_hot_fk_indexes"
+down_revision: Union[str, None] = "0002_revisions_image_cache"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (table, constraint, column, referenced table)
+FOREIGN_KEYS = [
+    ("scenes", "scenes_project_id_fkey", "project_id", "projects"),
+    ("connections", "connections_project_id_fkey", "project_id", "projects"),
+    ("connections", "connections_from_scene_id_fkey", "from_scene_id", "scenes"),
+    ("connections", "connections_to_scene_id_fkey", "to_scene_id", "scenes"),
+    ("tombstones", "tombstones_project_id_fkey", "project_id", "projects"),
+]
+
+# Keep the oldest of any duplicated edge so the unique constraint can be added
+DELETE_DUPLICATE_CONNECTIONS = """
+DELETE FROM connections WHERE id IN (
+    SELECT c.id FROM connections c
+    WHERE EXISTS (
+        SELECT 1 FROM connections d
+        WHERE d.project_id = c.project_id
+          AND d.from_scene_id = c.from_scene_id
+          AND d.to_scene_id = c.to_scene_id
+          AND (d.created_at < c.created_at OR (d.created_at = c.created_at AND d.id < c.id))
+    )
+)
+"""
+
+
+# Gives unnamed foreign keys (SQLite databases built by create_all) the names above, so batch mode can drop them
+NAMING_CONVENTION = {"fk": "%(table_name)s_%(column_0_name)s_fkey"}
+
+
+def _existing_foreign_key(table, column, referent, default_name):
+    """Name of the reflected foreign key on table.column, the convention's name if it has none, or None if absent"""
+    for foreign_key in sa.inspect(op.get_bind()).get_foreign_keys(table):
+        if foreign_key["constrained_columns"] == [column] and foreign_key["referred_table"] == referent:
+            return foreign_key["name"] or default_name
+    return None
+
+
+def _replace_foreign_keys(ondelete):
+    for table, name, column, referent in FOREIGN_KEYS:
+        existing = _existing_foreign_key(table, column, referent, name)
+        with op.batch_alter_table(table, naming_convention=NAMING_CONVENTION) as batch_op:
+            if existing is not None:
+                batch_op.drop_constraint(existing, type_="foreignkey")
+            batch_op.create_foreign_key(name, referent, [column], ["id"], ondelete=ondelete)
+
+
+def upgrade() -> None:
+    # Scene/connection lists and the snapshot filter by project and order by created_at
+    op.create_index("ix_scenes_project_id_created_at", "scenes", ["project_id", "created_at"])
+    op.create_index("ix_connections_project_id_created_at", "connections", ["project_id", "created_at"])
+    # Deleting a scene looks up its connections from both ends
+    op.create_index("ix_connections_from_scene_id", "connections", ["from_scene_id"])
+    op.create_index("ix_connections_to_scene_id", "connections", ["to_scene_id"])
+
+    op.execute(DELETE_DUPLICATE_CONNECTIONS)
+    with op.batch_alter_table("connections") as batch_op:
+        batch_op.create_unique_constraint(
+            "uq_connections_project_id_from_to", ["project_id", "from_scene_id", "to_scene_id"]
+        )
+
+    _replace_foreign_keys("CASCADE")
+
+
+def downgrade() -> None:
+    _replace_foreign_keys(None)
+    with op.batch_alter_table("connections") as batch_op:
+        batch_op.drop_constraint("uq_connections_project_id_from_to", type_="unique")
+    op.drop_index("ix_connections_to_scene_id", table_name="connections")
+    op.drop_index("ix_connections_from_scene_id", table_name="connections")
+    op.drop_index("ix_connections_project_id_created_at", table_name="connections")
+    op.drop_index("ix_scenes_project_id_created_at", table_name="scenes")
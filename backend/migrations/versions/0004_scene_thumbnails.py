@@ -0,0 +1,27 @@
+"""Thumbnail URLs on scenes
+
+Revision ID: 0004_scene_thumbnails
+Revises: 0003_hot_fk_indexes
+Create Date: 2026-10-18 11:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004_scene_thumbnails"
+down_revision: Union[str, None] = "0003_hot_fk_indexes"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("scenes", sa.Column("thumbnails", sa.JSON()))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("scenes") as batch_op:
+        batch_op.drop_column("thumbnails")
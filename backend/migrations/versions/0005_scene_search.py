@@ -0,0 +1,53 @@
+"""Full-text and trigram search over scene prompts and captions (Postgres)
+
+Revision ID: 0005_scene_search
+Revises: 0004_scene_thumbnails
+Create Date: 2026-10-18 15:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005_scene_search"
+down_revision: Union[str, None] = "0004_scene_thumbnails"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Kept in step with utils/scene_search.py, which must repeat these expressions for the indexes to be used
+ADD_SEARCH_VECTOR = """
+ALTER TABLE scenes ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+    setweight(to_tsvector('english', prompt_text), 'A') ||
+    setweight(to_tsvector('english', coalesce(caption, '')), 'B')
+) STORED
+"""
+CREATE_TRIGRAM_INDEX = """
+CREATE INDEX ix_scenes_search_text_trgm ON scenes
+USING gin ((prompt_text || ' ' || coalesce(caption, '')) gin_trgm_ops)
+"""
+
+
+def upgrade() -> None:
+    # SQLite searches with LIKE scans instead (see utils/scene_search.py)
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute(ADD_SEARCH_VECTOR)
+    op.execute("CREATE INDEX ix_scenes_search_vector ON scenes USING gin (search_vector)")
+    # Typo-tolerant matching needs pg_trgm, a contrib extension some servers don't ship
+    available = op.get_bind().execute(sa.text("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")).scalar()
+    if available:
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.execute(CREATE_TRIGRAM_INDEX)
+    else:
+        print("⚠️  pg_trgm is not available: scene search will match whole words only")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("DROP INDEX IF EXISTS ix_scenes_search_text_trgm")
+    op.execute("DROP INDEX IF EXISTS ix_scenes_search_vector")
+    op.execute("ALTER TABLE scenes DROP COLUMN search_vector")
@@ -0,0 +1,36 @@
+"""Spatial index over scene bounds for viewport queries (Postgres)
+
+Revision ID: 0006_scene_viewport
+Revises: 0005_scene_search
+Create Date: 2026-10-18 18:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006_scene_viewport"
+down_revision: Union[str, None] = "0005_scene_search"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Kept in step with SCENE_BOUNDS in utils/scene_viewport.py, which must repeat this expression for the index to be used
+CREATE_BOUNDS_INDEX = """
+CREATE INDEX ix_scenes_bounds ON scenes
+USING gist (box(point(x, y), point(x + width, y + height)))
+"""
+
+
+def upgrade() -> None:
+    # SQLite compares x/y ranges over the project's scenes instead (see utils/scene_viewport.py)
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute(CREATE_BOUNDS_INDEX)
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("DROP INDEX IF EXISTS ix_scenes_bounds")
@@ -0,0 +1,26 @@
+"""Index scenes by image_url for image garbage collection
+
+Revision ID: 0007_scene_image_url_index
+Revises: 0006_scene_viewport
+Create Date: 2026-10-18 20:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0007_scene_image_url_index"
+down_revision: Union[str, None] = "0006_scene_viewport"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The image GC asks which of a page of stored objects any scene still points at
+    op.create_index("ix_scenes_image_url", "scenes", ["image_url"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_scenes_image_url", table_name="scenes")
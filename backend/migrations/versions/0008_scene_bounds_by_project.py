@@ -0,0 +1,48 @@
+"""Lead the scene bounds index with project_id, via btree_gist (Postgres)
+
+Revision ID: 0008_scene_bounds_by_project
+Revises: 0007_scene_image_url_index
+Create Date: 2026-10-18 22:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0008_scene_bounds_by_project"
+down_revision: Union[str, None] = "0007_scene_image_url_index"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Same bounds expression as 0006_scene_viewport and SCENE_BOUNDS in utils/scene_viewport.py
+CREATE_PROJECT_BOUNDS_INDEX = """
+CREATE INDEX ix_scenes_bounds ON scenes
+USING gist (project_id, box(point(x, y), point(x + width, y + height)))
+"""
+CREATE_BOUNDS_INDEX = """
+CREATE INDEX ix_scenes_bounds ON scenes
+USING gist (box(point(x, y), point(x + width, y + height)))
+"""
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    # A GiST index can only hold project_id (plain equality) with btree_gist, a contrib extension some servers don't ship
+    available = op.get_bind().execute(sa.text("SELECT 1 FROM pg_available_extensions WHERE name = 'btree_gist'")).scalar()
+    if not available:
+        print("⚠️  btree_gist is not available: viewport queries will search every project's scenes in the box")
+        return
+    op.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+    op.execute("DROP INDEX IF EXISTS ix_scenes_bounds")
+    op.execute(CREATE_PROJECT_BOUNDS_INDEX)
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("DROP INDEX IF EXISTS ix_scenes_bounds")
+    op.execute(CREATE_BOUNDS_INDEX)
@@ -2,6 +2,8 @@ from .user import User
 from .project import Project
 from .scene import Scene
 from .connection import Connection
+from .image_cache import ImageCacheEntry
+from .tombstone import Tombstone
 
-__all__ = ["User", "Project", "Scene", "Connection"]
+__all__ = ["User", "Project", "Scene", "Connection", "ImageCacheEntry", "Tombstone"]
 
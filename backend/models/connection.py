@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
@@ -7,13 +7,23 @@ class Connection(Base):
     __tablename__ = "connections"
 
     id = Column(String, primary_key=True, index=True)
-    project_id = Column(String, ForeignKey("projects.id"), nullable=False)
-    from_scene_id = Column(String, ForeignKey("scenes.id"), nullable=False)
-    to_scene_id = Column(String, ForeignKey("scenes.id"), nullable=False)
+    project_id = Column(String, ForeignKey("projects.id", name="connections_project_id_fkey", ondelete="CASCADE"), nullable=False)
+    from_scene_id = Column(String, ForeignKey("scenes.id", name="connections_from_scene_id_fkey", ondelete="CASCADE"), nullable=False)
+    to_scene_id = Column(String, ForeignKey("scenes.id", name="connections_to_scene_id_fkey", ondelete="CASCADE"), nullable=False)
     label = Column(String)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Project revision at which this connection was last written
+    revision = Column(Integer, nullable=False, default=0, server_default="0")
 
     project = relationship("Project", back_populates="connections")
     from_scene = relationship("Scene", foreign_keys=[from_scene_id], back_populates="from_connections")
     to_scene = relationship("Scene", foreign_keys=[to_scene_id], back_populates="to_connections")
 
+    __table_args__ = (
+        UniqueConstraint("project_id", "from_scene_id", "to_scene_id", name="uq_connections_project_id_from_to"),
+        Index("ix_connections_project_id_created_at", "project_id", "created_at"),
+        Index("ix_connections_project_id_revision", "project_id", "revision"),
+        Index("ix_connections_from_scene_id", "from_scene_id"),
+        Index("ix_connections_to_scene_id", "to_scene_id"),
+    )
+
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, String, Integer, DateTime
+from sqlalchemy.sql import func
+from database import Base
+
+class ImageCacheEntry(Base):
+    __tablename__ = "image_cache"
+
+    key = Column(String, primary_key=True)
+    provider = Column(String, nullable=False)
+    model = Column(String, nullable=False)
+    size = Column(String, nullable=False)
+    quality = Column(String, nullable=False)
+    prompt = Column(String, nullable=False)
+    s3_key = Column(String, nullable=False)
+    image_url = Column(String, nullable=False)
+    hit_count = Column(Integer, default=0, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_used_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime
+from sqlalchemy import Column, String, Integer, DateTime, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
@@ -10,7 +10,18 @@ class Project(Base):
     title = Column(String, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    # Bumped on every write to the project or its scenes/connections
+    revision = Column(Integer, nullable=False, default=0, server_default="0")
 
-    scenes = relationship("Scene", back_populates="project", cascade="all, delete-orphan")
-    connections = relationship("Connection", back_populates="project", cascade="all, delete-orphan")
+    scenes = relationship("Scene", back_populates="project", cascade="all, delete-orphan", passive_deletes=True)
+    connections = relationship("Connection", back_populates="project", cascade="all, delete-orphan", passive_deletes=True)
+    tombstones = relationship("Tombstone", cascade="all, delete-orphan", passive_deletes=True)
+
+    __table_args__ = (
+        # Keyset pagination of the project list (most recently updated first)
+        Index("ix_projects_updated_at_id", "updated_at", "id"),
+    )
+
+# Case-insensitive title prefix filtering
+Index("ix_projects_title_lower", func.lower(Project.title).label("title_lower"), postgresql_ops={"title_lower": "text_pattern_ops"})
 
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Float, Integer, DateTime, ForeignKey
+from sqlalchemy import Column, String, Float, Integer, DateTime, ForeignKey, Index, JSON
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
@@ -7,17 +7,29 @@ class Scene(Base):
     __tablename__ = "scenes"
 
     id = Column(String, primary_key=True, index=True)
-    project_id = Column(String, ForeignKey("projects.id"), nullable=False)
+    project_id = Column(String, ForeignKey("projects.id", name="scenes_project_id_fkey", ondelete="CASCADE"), nullable=False)
     prompt_text = Column(String, nullable=False)
     caption = Column(String)
     image_url = Column(String)
+    # {format: {width: url}} of resized copies of image_url, stored next to it
+    thumbnails = Column(JSON(none_as_null=True))
     x = Column(Float, default=0.0)
     y = Column(Float, default=0.0)
     width = Column(Float, default=300.0)
     height = Column(Float, default=200.0)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Project revision at which this scene was last written
+    revision = Column(Integer, nullable=False, default=0, server_default="0")
 
     project = relationship("Project", back_populates="scenes")
-    from_connections = relationship("Connection", foreign_keys="Connection.from_scene_id", back_populates="from_scene")
-    to_connections = relationship("Connection", foreign_keys="Connection.to_scene_id", back_populates="to_scene")
+    # Connections are removed by ON DELETE CASCADE in the database
+    from_connections = relationship("Connection", foreign_keys="Connection.from_scene_id", back_populates="from_scene", passive_deletes=True)
+    to_connections = relationship("Connection", foreign_keys="Connection.to_scene_id", back_populates="to_scene", passive_deletes=True)
+
+    __table_args__ = (
+        Index("ix_scenes_project_id_created_at", "project_id", "created_at"),
+        Index("ix_scenes_project_id_revision", "project_id", "revision"),
+        # Image GC: is an object still referenced by any scene?
+        Index("ix_scenes_image_url", "image_url"),
+    )
 
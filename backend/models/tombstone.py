@@ -0,0 +1,18 @@
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Index
+from sqlalchemy.sql import func
+from database import Base
+
+class Tombstone(Base):
+    """Record of a deleted scene/connection so clients can sync deletes incrementally"""
+    __tablename__ = "tombstones"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    project_id = Column(String, ForeignKey("projects.id", name="tombstones_project_id_fkey", ondelete="CASCADE"), nullable=False)
+    entity_type = Column(String, nullable=False)
+    entity_id = Column(String, nullable=False)
+    revision = Column(Integer, nullable=False)
+    deleted_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_tombstones_project_id_revision", "project_id", "revision"),
+    )
@@ -1,10 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from pydantic import BaseModel, field_serializer
 from datetime import datetime
 from database import get_db
 from models.connection import Connection
+from utils import fast_response, story_graph
+from utils.revisions import bump_project_revision, record_deletes
+from utils.pubsub import publish_project_event
 import uuid
 
 router = APIRouter()
@@ -25,6 +30,7 @@ class ConnectionResponse(BaseModel):
     to_scene_id: str
     label: Optional[str]
     created_at: datetime
+    revision: int = 0
 
     @field_serializer('created_at')
     def serialize_datetime(self, dt: datetime, _info):
@@ -33,9 +39,28 @@ class ConnectionResponse(BaseModel):
     class Config:
         from_attributes = True
 
+def reject_cycle(db: Session, connection: ConnectionCreate, revision: int):
+    """409 if the new connection would close a loop
+
+    Runs after bump_project_revision: the project row lock keeps concurrent
+    connection writes out, so the graph at the previous revision is current.
+    """
+    graph = story_graph.get_graph(db, connection.project_id, revision - 1)
+    with graph.lock:
+        closes_loop = graph.creates_cycle(connection.from_scene_id, connection.to_scene_id)
+    if closes_loop:
+        raise HTTPException(status_code=409, detail="Connection would create a cycle")
+
+def fast_connections_query(project_id: str):
+    """Plain rows of exactly the ConnectionResponse columns, for fast_response.render_rows"""
+    columns = fast_response.model_columns(ConnectionResponse, Connection.__table__)
+    return select(*columns).where(Connection.project_id == project_id)
+
 @router.get("/", response_model=List[ConnectionResponse])
-def get_connections(project_id: str, db: Session = Depends(get_db)):
+def get_connections(request: Request, project_id: str, db: Session = Depends(get_db)):
     """Get all connections for a project"""
+    if fast_response.use_fast_path(request):
+        return fast_response.render_rows(request, ConnectionResponse, db.execute(fast_connections_query(project_id)).mappings())
     connections = db.query(Connection).filter(Connection.project_id == project_id).all()
     return connections
 
@@ -52,9 +77,26 @@ def create_connection(connection: ConnectionCreate, db: Session = Depends(get_db
         to_scene_id=connection.to_scene_id,
         label=connection.label
     )
+    db_connection.revision = bump_project_revision(db, connection.project_id)
+    if db_connection.revision is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    if not story_graph.STORY_GRAPH_ALLOW_CYCLES:
+        reject_cycle(db, connection, db_connection.revision)
     db.add(db_connection)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        duplicate = db.query(Connection.id).filter(
+            Connection.project_id == connection.project_id,
+            Connection.from_scene_id == connection.from_scene_id,
+            Connection.to_scene_id == connection.to_scene_id,
+        ).first()
+        if duplicate:
+            raise HTTPException(status_code=409, detail=f"Connection already exists: {duplicate.id}")
+        raise HTTPException(status_code=400, detail="Project or scene not found")
     db.refresh(db_connection)
+    publish_project_event(db_connection.project_id, "connection.created", ConnectionResponse.model_validate(db_connection).model_dump(mode="json"), db_connection.revision)
     return db_connection
 
 @router.patch("/{connection_id}", response_model=ConnectionResponse)
@@ -67,8 +109,10 @@ def update_connection(connection_id: str, connection: ConnectionUpdate, db: Sess
     if connection.label is not None:
         db_connection.label = connection.label
     
+    db_connection.revision = bump_project_revision(db, db_connection.project_id)
     db.commit()
     db.refresh(db_connection)
+    publish_project_event(db_connection.project_id, "connection.updated", ConnectionResponse.model_validate(db_connection).model_dump(mode="json"), db_connection.revision)
     return db_connection
 
 @router.delete("/{connection_id}")
@@ -78,7 +122,10 @@ def delete_connection(connection_id: str, db: Session = Depends(get_db)):
     if not db_connection:
         raise HTTPException(status_code=404, detail="Connection not found")
     
+    revision = bump_project_revision(db, db_connection.project_id)
+    record_deletes(db, db_connection.project_id, "connection", [connection_id], revision)
     db.delete(db_connection)
     db.commit()
+    publish_project_event(db_connection.project_id, "connection.deleted", {"id": connection_id}, revision)
     return {"message": "Connection deleted successfully"}
 
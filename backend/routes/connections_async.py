@@ -0,0 +1,87 @@
+"""Async versions of routes/connections.py, mounted instead of it when DB_ASYNC=true"""
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List
+from database import get_async_db
+from models.connection import Connection
+from routes.connections import ConnectionCreate, ConnectionUpdate, ConnectionResponse, fast_connections_query, reject_cycle
+from utils import fast_response, story_graph
+from utils.revisions import bump_project_revision, record_deletes
+from utils.pubsub import publish_project_event_async
+import uuid
+
+router = APIRouter()
+
+@router.get("/", response_model=List[ConnectionResponse])
+async def get_connections(request: Request, project_id: str, db: AsyncSession = Depends(get_async_db)):
+    """Get all connections for a project"""
+    if fast_response.use_fast_path(request):
+        return fast_response.render_rows(request, ConnectionResponse, (await db.execute(fast_connections_query(project_id))).mappings())
+    return (await db.scalars(select(Connection).where(Connection.project_id == project_id))).all()
+
+@router.post("/", response_model=ConnectionResponse)
+async def create_connection(connection: ConnectionCreate, db: AsyncSession = Depends(get_async_db)):
+    """Create a new connection"""
+    if connection.from_scene_id == connection.to_scene_id:
+        raise HTTPException(status_code=400, detail="Cannot connect scene to itself")
+
+    db_connection = Connection(
+        id=str(uuid.uuid4()),
+        project_id=connection.project_id,
+        from_scene_id=connection.from_scene_id,
+        to_scene_id=connection.to_scene_id,
+        label=connection.label
+    )
+    db_connection.revision = await db.run_sync(bump_project_revision, connection.project_id)
+    if db_connection.revision is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    if not story_graph.STORY_GRAPH_ALLOW_CYCLES:
+        await db.run_sync(reject_cycle, connection, db_connection.revision)
+    db.add(db_connection)
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        duplicate_id = await db.scalar(select(Connection.id).where(
+            Connection.project_id == connection.project_id,
+            Connection.from_scene_id == connection.from_scene_id,
+            Connection.to_scene_id == connection.to_scene_id,
+        ))
+        if duplicate_id:
+            raise HTTPException(status_code=409, detail=f"Connection already exists: {duplicate_id}")
+        raise HTTPException(status_code=400, detail="Project or scene not found")
+    await db.refresh(db_connection)
+    await publish_project_event_async(db_connection.project_id, "connection.created", ConnectionResponse.model_validate(db_connection).model_dump(mode="json"), db_connection.revision)
+    return db_connection
+
+@router.patch("/{connection_id}", response_model=ConnectionResponse)
+async def update_connection(connection_id: str, connection: ConnectionUpdate, db: AsyncSession = Depends(get_async_db)):
+    """Update a connection"""
+    db_connection = await db.get(Connection, connection_id)
+    if not db_connection:
+        raise HTTPException(status_code=404, detail="Connection not found")
+
+    if connection.label is not None:
+        db_connection.label = connection.label
+
+    db_connection.revision = await db.run_sync(bump_project_revision, db_connection.project_id)
+    await db.commit()
+    await db.refresh(db_connection)
+    await publish_project_event_async(db_connection.project_id, "connection.updated", ConnectionResponse.model_validate(db_connection).model_dump(mode="json"), db_connection.revision)
+    return db_connection
+
+@router.delete("/{connection_id}")
+async def delete_connection(connection_id: str, db: AsyncSession = Depends(get_async_db)):
+    """Delete a connection"""
+    db_connection = await db.get(Connection, connection_id)
+    if not db_connection:
+        raise HTTPException(status_code=404, detail="Connection not found")
+
+    revision = await db.run_sync(bump_project_revision, db_connection.project_id)
+    await db.run_sync(record_deletes, db_connection.project_id, "connection", [connection_id], revision)
+    await db.delete(db_connection)
+    await db.commit()
+    await publish_project_event_async(db_connection.project_id, "connection.deleted", {"id": connection_id}, revision)
+    return {"message": "Connection deleted successfully"}
@@ -0,0 +1,56 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from typing import Literal
+from database import get_db
+from models.project import Project
+from models.scene import Scene
+from models.connection import Connection
+from utils import export, story_graph
+from utils.project_snapshot import row_to_dict
+import re
+
+router = APIRouter()
+
+MEDIA_TYPES = {"pdf": "application/pdf", "zip": "application/zip"}
+
+def export_filename(title: str, format: str) -> str:
+    stem = re.sub(r"[^A-Za-z0-9._-]+", "-", title).strip("-.") or "storyboard"
+    return f"{stem[:80]}.{format}"
+
+@router.get("/{project_id}/export")
+def export_project(project_id: str, format: Literal["pdf", "zip"] = "pdf", db: Session = Depends(get_db)):
+    """Download a project as a PDF contact sheet or a ZIP of its images with a manifest
+
+    Scenes follow the story graph order. The file is streamed as it is
+    built: images are fetched a few at a time ahead of the writer, and the
+    database session is released before the first byte goes out.
+    """
+    project = db.execute(select(Project.__table__).where(Project.id == project_id)).mappings().first()
+    if project is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    scenes = {
+        row["id"]: row_to_dict(row)
+        for row in db.execute(select(Scene.__table__).where(Scene.project_id == project_id)).mappings()
+    }
+    connections = [
+        row_to_dict(row)
+        for row in db.execute(
+            select(Connection.__table__).where(Connection.project_id == project_id).order_by(Connection.created_at)
+        ).mappings()
+    ]
+    graph = story_graph.get_graph(db, project_id, project["revision"])
+    with graph.lock:
+        order = graph.analyze()["order"]
+    # The graph may be a revision ahead of the rows read above
+    ordered = [scenes.pop(scene_id) for scene_id in order if scene_id in scenes]
+    ordered.extend(scenes.values())
+    project = row_to_dict(project)
+
+    if format == "pdf":
+        body = export.stream_pdf(project, ordered)
+    else:
+        body = export.stream_zip(project, ordered, connections)
+    headers = {"Content-Disposition": f'attachment; filename="{export_filename(project["title"], format)}"'}
+    return StreamingResponse(body, media_type=MEDIA_TYPES[format], headers=headers)
@@ -1,52 +1,142 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from utils.ai_image import generate_image as generate_ai_image, download_image
-from utils.s3 import upload_image_to_s3
-import uuid
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from database import get_db, SessionLocal
+from models.scene import Scene
+from utils.image_pipeline import generate_and_store, build_thumbnails
+from utils import image_cache
+from utils.revisions import bump_project_revision
+from utils.pubsub import publish_project_event
+from utils.jobs import job_queue, IMAGE_BATCH_PARALLELISM, FINISHED_STATES
+import asyncio
+import json
 
 router = APIRouter()
 
 class GenerateImageRequest(BaseModel):
     prompt: str
     project_id: str
+    bypass_cache: bool = False
 
 class GenerateImageResponse(BaseModel):
     image_url: str
 
+class GenerateBatchRequest(BaseModel):
+    project_id: Optional[str] = None
+    scene_ids: Optional[List[str]] = None
+    max_parallel: int = Field(default=IMAGE_BATCH_PARALLELISM, ge=1, le=64)
+    only_missing: bool = False
+    bypass_cache: bool = False
+
+class JobResponse(BaseModel):
+    id: str
+    kind: str
+    status: str
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    progress: Optional[dict] = None
+    items: Optional[dict] = None
+
+def generate_scene_image(scene_id: str, prompt: str, project_id: str, bypass_cache: bool = False) -> dict:
+    """Generate an image for a scene and store its URL on the scene"""
+    image_url = generate_and_store(prompt, project_id, bypass_cache=bypass_cache)
+    # Already on a worker thread, so build thumbnails now and write them with the image
+    thumbnails = build_thumbnails(image_url)
+    db = SessionLocal()
+    try:
+        revision = bump_project_revision(db, project_id)
+        db.query(Scene).filter(Scene.id == scene_id).update(
+            {Scene.image_url: image_url, Scene.thumbnails: thumbnails, Scene.revision: revision}, synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+    publish_project_event(project_id, "scene.image_updated", {"id": scene_id, "image_url": image_url, "thumbnails": thumbnails}, revision)
+    return {"image_url": image_url, "thumbnails": thumbnails}
+
 @router.post("/", response_model=GenerateImageResponse)
 def generate_image(request: GenerateImageRequest):
     """Generate an image using AI and upload to S3"""
     try:
-        print(f"🎨 Generating image for prompt: {request.prompt[:50]}...")
-        # Generate image using available service (OpenAI or Stability AI)
-        openai_url = generate_ai_image(request.prompt)
-        print(f"✅ Image generated: {openai_url[:80]}...")
-        
-        # Try to upload to S3, but fallback to OpenAI URL if it fails
-        try:
-            print("📥 Downloading image from OpenAI...")
-            # Download the image
-            image_data = download_image(openai_url)
-            print(f"✅ Image downloaded ({len(image_data)} bytes)")
-            
-            # Upload to S3
-            filename = f"{request.project_id}/{uuid.uuid4()}.png"
-            print(f"☁️  Uploading to S3: {filename}")
-            s3_url = upload_image_to_s3(image_data, filename, "image/png")
-            
-            print(f"✅ Successfully uploaded to S3: {s3_url}")
-            return GenerateImageResponse(image_url=s3_url)
-        except Exception as s3_error:
-            # If S3 upload fails, return the OpenAI URL directly
-            # This allows the app to work even without S3 configured
-            print(f"⚠️  WARNING: S3 upload failed: {str(s3_error)}")
-            print(f"⚠️  Using OpenAI URL directly (temporary): {openai_url}")
-            import traceback
-            traceback.print_exc()
-            return GenerateImageResponse(image_url=openai_url)
+        return GenerateImageResponse(image_url=generate_and_store(request.prompt, request.project_id, bypass_cache=request.bypass_cache))
     except Exception as e:
         print(f"❌ Error generating image: {str(e)}")
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/jobs", response_model=JobResponse, status_code=202)
+def create_generate_image_job(request: GenerateImageRequest):
+    """Queue an image generation and return the job immediately"""
+    job = job_queue.submit(
+        "generate_image",
+        request.model_dump(),
+        lambda: {"image_url": generate_and_store(request.prompt, request.project_id, bypass_cache=request.bypass_cache)},
+    )
+    return job.to_dict()
+
+@router.get("/cache/stats")
+def get_image_cache_stats():
+    """Get prompt->image cache hit/miss counters"""
+    return image_cache.get_stats()
+
+@router.post("/batch", response_model=JobResponse, status_code=202)
+def create_generate_image_batch(request: GenerateBatchRequest, db: Session = Depends(get_db)):
+    """Generate images for every scene of a project (or a list of scenes) concurrently"""
+    if not request.project_id and not request.scene_ids:
+        raise HTTPException(status_code=400, detail="Provide project_id or scene_ids")
+
+    query = db.query(Scene.id, Scene.project_id, Scene.prompt_text)
+    if request.project_id:
+        query = query.filter(Scene.project_id == request.project_id)
+    if request.scene_ids:
+        query = query.filter(Scene.id.in_(request.scene_ids))
+    if request.only_missing:
+        query = query.filter(Scene.image_url.is_(None))
+    rows = query.order_by(Scene.created_at).all()
+    if request.scene_ids and not request.only_missing:
+        missing = set(request.scene_ids) - {row.id for row in rows}
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Scenes not found: {', '.join(sorted(missing))}")
+
+    items = [
+        (row.id, lambda row=row: generate_scene_image(row.id, row.prompt_text, row.project_id, request.bypass_cache))
+        for row in rows
+    ]
+    batch = job_queue.submit_batch("generate_image_batch", request.model_dump(), items, request.max_parallel)
+    return batch.to_dict()
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+def get_generate_image_job(job_id: str):
+    """Get the status of an image generation job or batch"""
+    job = job_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+@router.get("/jobs/{job_id}/stream")
+async def stream_generate_image_job(job_id: str):
+    """Stream job status changes as server-sent events until the job finishes"""
+    job = job_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def events():
+        last_state = None
+        while True:
+            snapshot = job.to_dict()
+            # Batches also report progress, so emit whenever status or progress changes
+            state = (snapshot["status"], json.dumps(snapshot.get("progress")))
+            if state != last_state:
+                last_state = state
+                yield f"event: status\ndata: {json.dumps(snapshot)}\n\n"
+            if snapshot["status"] in FINISHED_STATES:
+                break
+            await asyncio.sleep(0.25)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
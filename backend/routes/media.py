@@ -0,0 +1,20 @@
+from fastapi import APIRouter, HTTPException, Request
+from utils import media
+
+router = APIRouter()
+
+@router.api_route("/{key:path}", methods=["GET", "HEAD"])
+def get_media(key: str, request: Request):
+    """A stored image (or thumbnail) by its object key, from the local disk when it is there
+
+    Sends a strong ETag and Cache-Control, answers If-None-Match with 304 and
+    a single `Range` with 206. A miss fetches the object from the bucket into
+    the disk cache first.
+    """
+    try:
+        path = media.resolve(key)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid media key")
+    if path is None:
+        raise HTTPException(status_code=404, detail="Media not found")
+    return media.file_response(path, key, request.headers)
@@ -1,27 +1,45 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import delete, func, select, tuple_
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from pydantic import BaseModel, field_serializer
 from datetime import datetime
 from database import get_db
 from models.project import Project
 from models.scene import Scene
 from models.connection import Connection
+from utils import fast_response, image_gc, project_copy, project_snapshot, story_graph
+from utils.s3 import copy_objects
+from utils.revisions import bump_project_revision, load_changes
+from utils.pubsub import publish_project_event
+import base64
+import json
 import uuid
 
 router = APIRouter()
 
+PROJECT_PAGE_SIZE = 50
+PROJECT_PAGE_SIZE_MAX = 500
+
 class ProjectCreate(BaseModel):
     title: str
 
 class ProjectUpdate(BaseModel):
     title: str
 
+class ProjectDuplicate(BaseModel):
+    title: Optional[str] = None
+    # False makes a template: same scenes, prompts and layout, no images
+    include_images: bool = True
+    # Give the copy its own image objects instead of sharing the source's
+    copy_images: bool = False
+
 class ProjectResponse(BaseModel):
     id: str
     title: str
     created_at: datetime
     updated_at: datetime
+    revision: int = 0
 
     @field_serializer('created_at', 'updated_at')
     def serialize_datetime(self, dt: datetime, _info):
@@ -30,31 +48,144 @@ class ProjectResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class ProjectSummaryResponse(ProjectResponse):
+    scene_count: Optional[int] = None
+    connection_count: Optional[int] = None
+    cover_image_url: Optional[str] = None
+
 class ProjectFullResponse(ProjectResponse):
     scenes: List[dict]
     connections: List[dict]
 
-@router.get("/", response_model=List[ProjectResponse])
-def get_projects(db: Session = Depends(get_db)):
-    """Get all projects"""
-    projects = db.query(Project).all()
-    return projects
+class ProjectChangesResponse(BaseModel):
+    revision: int
+    project: Optional[dict]
+    scenes: List[dict]
+    connections: List[dict]
+    deleted: List[dict]
+
+def _encode_cursor(updated_at: datetime, project_id: str) -> str:
+    raw = json.dumps([updated_at.isoformat(), project_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+def _decode_cursor(cursor: str):
+    try:
+        updated_at, project_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.fromisoformat(updated_at), project_id
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def project_list_query(dialect_name: str, limit: int, cursor: Optional[str], prefix: Optional[str], q: Optional[str], include_stats: bool):
+    """SELECT for one page of the project list (fetches limit + 1 rows to detect a next page)"""
+    columns = [Project.id, Project.title, Project.created_at, Project.updated_at, Project.revision]
+    if include_stats:
+        # Correlated subqueries run only for the rows on this page, via the scenes/connections project_id indexes
+        columns += [
+            select(func.count()).where(Scene.project_id == Project.id).correlate(Project).scalar_subquery().label("scene_count"),
+            select(func.count()).where(Connection.project_id == Project.id).correlate(Project).scalar_subquery().label("connection_count"),
+            select(Scene.image_url)
+            .where(Scene.project_id == Project.id, Scene.image_url.isnot(None))
+            .order_by(Scene.created_at)
+            .limit(1)
+            .correlate(Project)
+            .scalar_subquery()
+            .label("cover_image_url"),
+        ]
+    query = select(*columns)
+    updated_at_key = Project.updated_at
+    if dialect_name == "sqlite":
+        # SQLite keeps timestamps as text of mixed precision; compare them numerically there
+        updated_at_key = func.julianday(Project.updated_at)
+    if cursor:
+        updated_at, project_id = _decode_cursor(cursor)
+        if dialect_name == "sqlite":
+            updated_at = func.julianday(updated_at.isoformat())
+        query = query.where(tuple_(updated_at_key, Project.id) < tuple_(updated_at, project_id))
+    if prefix:
+        query = query.where(func.lower(Project.title).like(_escape_like(prefix.lower()) + "%", escape="\\"))
+    if q:
+        query = query.where(func.lower(Project.title).like("%" + _escape_like(q.lower()) + "%", escape="\\"))
+    return query.order_by(updated_at_key.desc(), Project.id.desc()).limit(limit + 1)
+
+def project_page(response: Response, rows, limit: int) -> List[dict]:
+    """Trim the extra row fetched by project_list_query and point X-Next-Cursor past this page"""
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        response.headers["X-Next-Cursor"] = _encode_cursor(last["updated_at"], last["id"])
+    return [dict(row) for row in rows]
+
+def snapshot_response(body: bytes, etag: str, msgpack: bool) -> Response:
+    """A JSON snapshot body as it is, or re-encoded as MessagePack"""
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept"}
+    if msgpack:
+        return Response(content=fast_response.json_to_msgpack(body), media_type=fast_response.MSGPACK_MEDIA_TYPES[0], headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    return etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]
+
+@router.get("/", response_model=List[ProjectSummaryResponse], response_model_exclude_unset=True)
+def get_projects(
+    request: Request,
+    response: Response,
+    limit: int = Query(PROJECT_PAGE_SIZE, ge=1, le=PROJECT_PAGE_SIZE_MAX),
+    cursor: Optional[str] = None,
+    prefix: Optional[str] = None,
+    q: Optional[str] = None,
+    include_stats: bool = False,
+    db: Session = Depends(get_db),
+):
+    """Get projects, most recently updated first
+
+    Paginated by keyset: pass the X-Next-Cursor header of one page as `cursor`
+    to get the next. `prefix` matches the start of the title and `q` any part
+    of it (both case-insensitive). `include_stats` adds scene/connection counts
+    and a cover image.
+    """
+    query = project_list_query(db.get_bind().dialect.name, limit, cursor, prefix, q, include_stats)
+    page = project_page(response, db.execute(query).mappings().all(), limit)
+    if fast_response.use_fast_path(request):
+        return fast_response.render_rows(request, ProjectSummaryResponse, page, response.headers)
+    return page
 
 @router.get("/{project_id}/full", response_model=ProjectFullResponse)
-def get_project_full(project_id: str, db: Session = Depends(get_db)):
+def get_project_full(project_id: str, request: Request, db: Session = Depends(get_db)):
     """Get project with all scenes and connections"""
-    project = db.query(Project).filter(Project.id == project_id).first()
-    if not project:
+    revision = db.query(Project.revision).filter(Project.id == project_id).scalar()
+    if revision is None:
         raise HTTPException(status_code=404, detail="Project not found")
-    
-    scenes = db.query(Scene).filter(Scene.project_id == project_id).all()
-    connections = db.query(Connection).filter(Connection.project_id == project_id).all()
-    
-    return {
-        **project.__dict__,
-        "scenes": [scene.__dict__ for scene in scenes],
-        "connections": [conn.__dict__ for conn in connections]
-    }
+
+    msgpack = fast_response.wants_msgpack(request)
+    etag = project_snapshot.etag_for(project_id, revision, msgpack)
+    if is_not_modified(request, etag):
+        return Response(status_code=304, headers={"ETag": etag, "Vary": "Accept"})
+
+    body = project_snapshot.get_cached(project_id, revision)
+    if body is None:
+        snapshot = project_snapshot.load_snapshot(db, project_id)
+        if snapshot is None:
+            raise HTTPException(status_code=404, detail="Project not found")
+        revision, body = snapshot
+        project_snapshot.put_cached(project_id, revision, body)
+        etag = project_snapshot.etag_for(project_id, revision, msgpack)
+
+    # Serialized straight from rows; no per-object pydantic validation
+    return snapshot_response(body, etag, msgpack)
+
+@router.get("/{project_id}/changes", response_model=ProjectChangesResponse)
+def get_project_changes(project_id: str, since: int = Query(0, ge=0), db: Session = Depends(get_db)):
+    """Get scenes/connections written and deleted after revision `since`"""
+    changes = load_changes(db, project_id, since)
+    if changes is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    if since > changes["revision"]:
+        # Cursor from the future (e.g. a restored database): the client must reload in full
+        raise HTTPException(status_code=409, detail="Revision is ahead of the project; reload the full project")
+    return changes
 
 @router.post("/", response_model=ProjectResponse)
 def create_project(project: ProjectCreate, db: Session = Depends(get_db)):
@@ -68,6 +199,27 @@ def create_project(project: ProjectCreate, db: Session = Depends(get_db)):
     db.refresh(db_project)
     return db_project
 
+@router.post("/{project_id}/duplicate", response_model=ProjectSummaryResponse)
+def duplicate_project(project_id: str, options: ProjectDuplicate, db: Session = Depends(get_db)):
+    """Copy a project with all its scenes and connections in one transaction
+
+    Images are shared with the source by default; `copy_images` copies them
+    within S3 first. `include_images: false` copies the board as a template.
+    """
+    new_project_id = str(uuid.uuid4())
+    copied_images = options.include_images and options.copy_images
+    if copied_images:
+        from botocore.exceptions import ClientError
+        try:
+            copy_objects(project_copy.image_copies(db, project_id, new_project_id))
+        except ClientError as e:
+            raise HTTPException(status_code=502, detail=f"Failed to copy images: {e}")
+    project = project_copy.duplicate_project(db, project_id, new_project_id, options.title, options.include_images, copied_images)
+    if project is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    db.commit()
+    return project
+
 @router.put("/{project_id}", response_model=ProjectResponse)
 def update_project(project_id: str, project: ProjectUpdate, db: Session = Depends(get_db)):
     """Update a project"""
@@ -76,18 +228,24 @@ def update_project(project_id: str, project: ProjectUpdate, db: Session = Depend
         raise HTTPException(status_code=404, detail="Project not found")
     
     db_project.title = project.title
+    bump_project_revision(db, project_id)
     db.commit()
     db.refresh(db_project)
+    publish_project_event(project_id, "project.updated", ProjectResponse.model_validate(db_project).model_dump(mode="json"), db_project.revision)
     return db_project
 
 @router.delete("/{project_id}")
 def delete_project(project_id: str, db: Session = Depends(get_db)):
-    """Delete a project"""
-    db_project = db.query(Project).filter(Project.id == project_id).first()
-    if not db_project:
+    """Delete a project; its images are deleted in the background unless other scenes use them"""
+    shared_directories = image_gc.project_image_directories(db, project_id)
+    # Scenes, connections and tombstones go with it via ON DELETE CASCADE, without loading them
+    result = db.execute(delete(Project).where(Project.id == project_id))
+    if result.rowcount == 0:
         raise HTTPException(status_code=404, detail="Project not found")
-    
-    db.delete(db_project)
     db.commit()
+    project_snapshot.invalidate(project_id)
+    story_graph.invalidate(project_id)
+    publish_project_event(project_id, "project.deleted", {"id": project_id})
+    image_gc.queue_project_cleanup(project_id, shared_directories)
     return {"message": "Project deleted successfully"}
 
@@ -0,0 +1,133 @@
+"""Async versions of routes/projects.py, mounted instead of it when DB_ASYNC=true"""
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from database import get_async_db
+from models.project import Project
+from routes.projects import (
+    PROJECT_PAGE_SIZE, PROJECT_PAGE_SIZE_MAX, ProjectCreate, ProjectUpdate, ProjectDuplicate, ProjectResponse,
+    ProjectSummaryResponse, ProjectFullResponse, ProjectChangesResponse,
+    project_list_query, project_page, is_not_modified, snapshot_response,
+)
+from utils import fast_response, image_gc, project_copy, project_snapshot, story_graph
+from utils.s3 import copy_objects
+from utils.revisions import bump_project_revision, load_changes
+from utils.pubsub import publish_project_event_async
+import anyio
+import uuid
+
+router = APIRouter()
+
+@router.get("/", response_model=List[ProjectSummaryResponse], response_model_exclude_unset=True)
+async def get_projects(
+    request: Request,
+    response: Response,
+    limit: int = Query(PROJECT_PAGE_SIZE, ge=1, le=PROJECT_PAGE_SIZE_MAX),
+    cursor: Optional[str] = None,
+    prefix: Optional[str] = None,
+    q: Optional[str] = None,
+    include_stats: bool = False,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Get projects, most recently updated first (see routes/projects.get_projects)"""
+    query = project_list_query(db.bind.dialect.name, limit, cursor, prefix, q, include_stats)
+    page = project_page(response, (await db.execute(query)).mappings().all(), limit)
+    if fast_response.use_fast_path(request):
+        return fast_response.render_rows(request, ProjectSummaryResponse, page, response.headers)
+    return page
+
+@router.get("/{project_id}/full", response_model=ProjectFullResponse)
+async def get_project_full(project_id: str, request: Request, db: AsyncSession = Depends(get_async_db)):
+    """Get project with all scenes and connections"""
+    revision = await db.scalar(select(Project.revision).where(Project.id == project_id))
+    if revision is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    msgpack = fast_response.wants_msgpack(request)
+    etag = project_snapshot.etag_for(project_id, revision, msgpack)
+    if is_not_modified(request, etag):
+        return Response(status_code=304, headers={"ETag": etag, "Vary": "Accept"})
+
+    body = project_snapshot.get_cached(project_id, revision)
+    if body is None:
+        snapshot = await db.run_sync(project_snapshot.load_snapshot, project_id)
+        if snapshot is None:
+            raise HTTPException(status_code=404, detail="Project not found")
+        revision, body = snapshot
+        project_snapshot.put_cached(project_id, revision, body)
+        etag = project_snapshot.etag_for(project_id, revision, msgpack)
+
+    return snapshot_response(body, etag, msgpack)
+
+@router.get("/{project_id}/changes", response_model=ProjectChangesResponse)
+async def get_project_changes(project_id: str, since: int = Query(0, ge=0), db: AsyncSession = Depends(get_async_db)):
+    """Get scenes/connections written and deleted after revision `since`"""
+    changes = await db.run_sync(load_changes, project_id, since)
+    if changes is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    if since > changes["revision"]:
+        raise HTTPException(status_code=409, detail="Revision is ahead of the project; reload the full project")
+    return changes
+
+@router.post("/", response_model=ProjectResponse)
+async def create_project(project: ProjectCreate, db: AsyncSession = Depends(get_async_db)):
+    """Create a new project"""
+    db_project = Project(
+        id=str(uuid.uuid4()),
+        title=project.title
+    )
+    db.add(db_project)
+    await db.commit()
+    await db.refresh(db_project)
+    return db_project
+
+@router.post("/{project_id}/duplicate", response_model=ProjectSummaryResponse)
+async def duplicate_project(project_id: str, options: ProjectDuplicate, db: AsyncSession = Depends(get_async_db)):
+    """Copy a project with all its scenes and connections (see routes/projects.duplicate_project)"""
+    new_project_id = str(uuid.uuid4())
+    copied_images = options.include_images and options.copy_images
+    if copied_images:
+        from botocore.exceptions import ClientError
+        copies = await db.run_sync(project_copy.image_copies, project_id, new_project_id)
+        try:
+            # S3 calls block, so keep them off the event loop
+            await anyio.to_thread.run_sync(copy_objects, copies)
+        except ClientError as e:
+            raise HTTPException(status_code=502, detail=f"Failed to copy images: {e}")
+    project = await db.run_sync(
+        project_copy.duplicate_project, project_id, new_project_id, options.title, options.include_images, copied_images
+    )
+    if project is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    await db.commit()
+    return project
+
+@router.put("/{project_id}", response_model=ProjectResponse)
+async def update_project(project_id: str, project: ProjectUpdate, db: AsyncSession = Depends(get_async_db)):
+    """Update a project"""
+    db_project = await db.get(Project, project_id)
+    if not db_project:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    db_project.title = project.title
+    await db.run_sync(bump_project_revision, project_id)
+    await db.commit()
+    await db.refresh(db_project)
+    await publish_project_event_async(project_id, "project.updated", ProjectResponse.model_validate(db_project).model_dump(mode="json"), db_project.revision)
+    return db_project
+
+@router.delete("/{project_id}")
+async def delete_project(project_id: str, db: AsyncSession = Depends(get_async_db)):
+    """Delete a project; its images are deleted in the background unless other scenes use them"""
+    shared_directories = await db.run_sync(image_gc.project_image_directories, project_id)
+    # Scenes, connections and tombstones go with it via ON DELETE CASCADE
+    result = await db.execute(delete(Project).where(Project.id == project_id))
+    if result.rowcount == 0:
+        raise HTTPException(status_code=404, detail="Project not found")
+    await db.commit()
+    project_snapshot.invalidate(project_id)
+    story_graph.invalidate(project_id)
+    await publish_project_event_async(project_id, "project.deleted", {"id": project_id})
+    image_gc.queue_project_cleanup(project_id, shared_directories)
+    return {"message": "Project deleted successfully"}
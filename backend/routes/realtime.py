@@ -0,0 +1,200 @@
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from starlette.concurrency import run_in_threadpool
+from typing import Dict, Optional
+from database import SessionLocal
+from models.project import Project
+from models.scene import Scene
+from routes.scenes import publish_scenes_updated
+from utils.pubsub import get_broker, project_channel
+from utils.scene_layout import apply_layout_updates, LAYOUT_FIELDS
+from dotenv import load_dotenv
+import asyncio
+import json
+import os
+import time
+import uuid
+
+load_dotenv()
+
+# Live drag positions are relayed to other clients at most this often
+REALTIME_BROADCAST_HZ = float(os.getenv("REALTIME_BROADCAST_HZ", "20"))
+# Coalesced drag positions are written to the database at most this often
+REALTIME_FLUSH_INTERVAL_SECONDS = float(os.getenv("REALTIME_FLUSH_INTERVAL_SECONDS", "0.5"))
+# Messages beyond this per client per second are dropped
+REALTIME_MAX_MESSAGES_PER_SECOND = int(os.getenv("REALTIME_MAX_MESSAGES_PER_SECOND", "120"))
+
+router = APIRouter()
+
+
+class ProjectRoom:
+    """Coalesces live scene drags for one project in this process
+
+    Moves are buffered per scene: the latest position is broadcast on each
+    tick and persisted in one bulk update per flush interval, so a 60 Hz drag
+    costs a handful of messages and a couple of DB writes per second.
+    """
+
+    def __init__(self, project_id: str):
+        self.project_id = project_id
+        self.clients = 0
+        self.pending_broadcast: Dict[str, dict] = {}
+        self.pending_persist: Dict[str, dict] = {}
+        self.task: Optional[asyncio.Task] = None
+
+    def move(self, scene_id: str, values: dict, origin: str):
+        self.pending_broadcast.setdefault(scene_id, {}).update(values, origin=origin)
+        self.pending_persist.setdefault(scene_id, {}).update(values)
+
+    def start(self):
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        await self._broadcast()
+        await self._flush()
+
+    async def _run(self):
+        interval = 1.0 / REALTIME_BROADCAST_HZ
+        last_flush = time.monotonic()
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self._broadcast()
+                if time.monotonic() - last_flush >= REALTIME_FLUSH_INTERVAL_SECONDS:
+                    last_flush = time.monotonic()
+                    await self._flush()
+            except Exception as e:
+                print(f"⚠️  WARNING: Realtime tick failed for project {self.project_id}: {str(e)}")
+
+    async def _broadcast(self):
+        if not self.pending_broadcast:
+            return
+        moves, self.pending_broadcast = self.pending_broadcast, {}
+        await get_broker().publish_async(project_channel(self.project_id), {
+            "type": "scenes.moving",
+            "project_id": self.project_id,
+            "revision": None,
+            "origin": None,
+            "data": [{"id": scene_id, **values} for scene_id, values in moves.items()],
+        })
+
+    async def _flush(self):
+        if not self.pending_persist:
+            return
+        updates, self.pending_persist = self.pending_persist, {}
+        await run_in_threadpool(self._persist, updates)
+
+    def _persist(self, updates: Dict[str, dict]):
+        db = SessionLocal()
+        try:
+            try:
+                changed_ids = apply_layout_updates(db, updates, self.project_id)
+            except (LookupError, ValueError):
+                # Some scenes were deleted or aren't in this project: keep only the valid ones
+                db.rollback()
+                valid_ids = {
+                    row.id for row in db.query(Scene.id).filter(
+                        Scene.id.in_(list(updates)), Scene.project_id == self.project_id
+                    )
+                }
+                changed_ids = apply_layout_updates(
+                    db, {scene_id: values for scene_id, values in updates.items() if scene_id in valid_ids}, self.project_id
+                )
+            if changed_ids:
+                db.commit()
+                publish_scenes_updated(db.query(Scene).filter(Scene.id.in_(changed_ids)).all(), origin="realtime")
+        finally:
+            db.close()
+
+
+_rooms: Dict[str, ProjectRoom] = {}
+
+
+def _join(project_id: str) -> ProjectRoom:
+    room = _rooms.get(project_id)
+    if room is None:
+        room = ProjectRoom(project_id)
+        room.start()
+        _rooms[project_id] = room
+    room.clients += 1
+    return room
+
+
+async def _leave(room: ProjectRoom):
+    room.clients -= 1
+    if room.clients == 0 and _rooms.get(room.project_id) is room:
+        del _rooms[room.project_id]
+        await room.stop()
+
+
+def _project_revision(project_id: str) -> Optional[int]:
+    db = SessionLocal()
+    try:
+        return db.query(Project.revision).filter(Project.id == project_id).scalar()
+    finally:
+        db.close()
+
+
+async def _forward(websocket: WebSocket, subscription, client_id: str):
+    """Relay broker messages to the client, leaving out its own live moves"""
+    while True:
+        message = await subscription.get()
+        if message["type"] == "scenes.moving":
+            moves = [move for move in message["data"] if move.get("origin") != client_id]
+            if not moves:
+                continue
+            message = {**message, "data": moves}
+        await websocket.send_text(json.dumps(message))
+
+
+@router.websocket("/{project_id}/ws")
+async def project_socket(websocket: WebSocket, project_id: str):
+    """Live channel for a project: receives committed changes and relays scene drags"""
+    revision = await run_in_threadpool(_project_revision, project_id)
+    if revision is None:
+        await websocket.close(code=4404)
+        return
+    await websocket.accept()
+
+    client_id = str(uuid.uuid4())
+    broker = get_broker()
+    subscription = await broker.subscribe(project_channel(project_id))
+    room = _join(project_id)
+    sender = asyncio.create_task(_forward(websocket, subscription, client_id))
+    try:
+        await websocket.send_text(json.dumps({"type": "hello", "client_id": client_id, "revision": revision}))
+        window_started, window_count = time.monotonic(), 0
+        while True:
+            raw = await websocket.receive_text()
+            now = time.monotonic()
+            if now - window_started >= 1.0:
+                window_started, window_count = now, 0
+            window_count += 1
+            if window_count > REALTIME_MAX_MESSAGES_PER_SECOND:
+                continue
+            try:
+                message = json.loads(raw)
+            except ValueError:
+                await websocket.send_text(json.dumps({"type": "error", "detail": "Invalid JSON"}))
+                continue
+
+            if message.get("type") == "scene.move" and isinstance(message.get("id"), str):
+                values = {
+                    key: float(message[key]) for key in LAYOUT_FIELDS
+                    if isinstance(message.get(key), (int, float))
+                }
+                if values:
+                    room.move(message["id"], values, client_id)
+            elif message.get("type") == "ping":
+                await websocket.send_text(json.dumps({"type": "pong"}))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        broker.unsubscribe(subscription)
+        await _leave(room)
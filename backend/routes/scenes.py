@@ -1,10 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import delete, select
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import Dict, List, Optional
 from pydantic import BaseModel, field_serializer
 from datetime import datetime
 from database import get_db
 from models.scene import Scene
+from models.connection import Connection
+from utils.revisions import bump_project_revision, record_deletes
+from utils.scene_layout import apply_layout_updates
+from utils.image_pipeline import queue_scene_thumbnails
+from utils.pubsub import publish_project_event
+from utils import fast_response, image_gc, scene_viewport
 import uuid
 
 router = APIRouter()
@@ -28,17 +35,30 @@ class SceneUpdate(BaseModel):
     width: Optional[float] = None
     height: Optional[float] = None
 
+class SceneLayoutUpdate(BaseModel):
+    id: str
+    x: Optional[float] = None
+    y: Optional[float] = None
+    width: Optional[float] = None
+    height: Optional[float] = None
+
+class SceneBulkLayoutUpdate(BaseModel):
+    project_id: Optional[str] = None
+    scenes: List[SceneLayoutUpdate]
+
 class SceneResponse(BaseModel):
     id: str
     project_id: str
     prompt_text: str
     caption: Optional[str]
     image_url: Optional[str]
+    thumbnails: Optional[Dict[str, Dict[str, str]]] = None
     x: float
     y: float
     width: float
     height: float
     created_at: datetime
+    revision: int = 0
 
     @field_serializer('created_at')
     def serialize_datetime(self, dt: datetime, _info):
@@ -47,11 +67,50 @@ class SceneResponse(BaseModel):
     class Config:
         from_attributes = True
 
+def publish_scenes_updated(scenes: List[Scene], origin: str = None):
+    """Broadcast a batch of committed scene changes, one event per project"""
+    by_project = {}
+    for scene in scenes:
+        by_project.setdefault(scene.project_id, []).append(scene)
+    for project_id, project_scenes in by_project.items():
+        publish_project_event(
+            project_id,
+            "scenes.updated",
+            [SceneResponse.model_validate(scene).model_dump(mode="json") for scene in project_scenes],
+            max(scene.revision for scene in project_scenes),
+            origin,
+        )
+
+def parse_viewport(bbox: Optional[str]) -> Optional[scene_viewport.BBox]:
+    try:
+        return scene_viewport.parse_bbox(bbox) if bbox is not None else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def fast_scenes_query(dialect: str, project_id: str, viewport: Optional[scene_viewport.BBox]):
+    """Plain rows of exactly the SceneResponse columns, for fast_response.render_rows"""
+    return scene_viewport.scenes_query(dialect, project_id, viewport, fast_response.model_columns(SceneResponse, Scene.__table__))
+
 @router.get("/", response_model=List[SceneResponse])
-def get_scenes(project_id: str, db: Session = Depends(get_db)):
-    """Get all scenes for a project"""
-    scenes = db.query(Scene).filter(Scene.project_id == project_id).all()
-    return scenes
+def get_scenes(
+    request: Request,
+    project_id: str,
+    bbox: Optional[str] = Query(None, description="min_x,min_y,max_x,max_y"),
+    detail: str = Query("full", pattern="^(full|summary)$"),
+    db: Session = Depends(get_db),
+):
+    """Get the scenes of a project, or only those overlapping `bbox`
+
+    `detail=summary` returns just each scene's box, a short label, its
+    smallest thumbnail and revision, for drawing a zoomed-out board.
+    """
+    viewport = parse_viewport(bbox)
+    if detail == "summary":
+        return fast_response.render(request, scene_viewport.get_scenes(db, project_id, viewport, detail))
+    if fast_response.use_fast_path(request):
+        query = fast_scenes_query(db.get_bind().dialect.name, project_id, viewport)
+        return fast_response.render_rows(request, SceneResponse, db.execute(query).mappings())
+    return scene_viewport.get_scenes(db, project_id, viewport)
 
 @router.get("/{scene_id}", response_model=SceneResponse)
 def get_scene(scene_id: str, db: Session = Depends(get_db)):
@@ -75,11 +134,38 @@ def create_scene(scene: SceneCreate, db: Session = Depends(get_db)):
         width=scene.width,
         height=scene.height
     )
+    db_scene.revision = bump_project_revision(db, scene.project_id)
     db.add(db_scene)
     db.commit()
     db.refresh(db_scene)
+    publish_project_event(db_scene.project_id, "scene.created", SceneResponse.model_validate(db_scene).model_dump(mode="json"), db_scene.revision)
+    if db_scene.image_url:
+        queue_scene_thumbnails(db_scene.id, db_scene.image_url)
     return db_scene
 
+@router.patch("/bulk", response_model=List[SceneResponse])
+def update_scene_layouts(layout: SceneBulkLayoutUpdate, db: Session = Depends(get_db)):
+    """Update positions/sizes of many scenes in one transaction and return the changed scenes"""
+    updates = {}
+    for item in layout.scenes:
+        # Later entries for the same scene win, like applying the PATCHes in order
+        updates.setdefault(item.id, {}).update(item.model_dump(exclude_unset=True, exclude={"id"}))
+    if not updates:
+        return []
+
+    try:
+        changed_ids = apply_layout_updates(db, updates, layout.project_id)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=f"Scenes not found: {', '.join(e.args[0])}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not changed_ids:
+        return []
+    db.commit()
+    changed_scenes = db.query(Scene).filter(Scene.id.in_(changed_ids)).all()
+    publish_scenes_updated(changed_scenes)
+    return changed_scenes
+
 @router.patch("/{scene_id}", response_model=SceneResponse)
 def update_scene(scene_id: str, scene: SceneUpdate, db: Session = Depends(get_db)):
     """Update a scene"""
@@ -88,21 +174,41 @@ def update_scene(scene_id: str, scene: SceneUpdate, db: Session = Depends(get_db
         raise HTTPException(status_code=404, detail="Scene not found")
     
     update_data = scene.dict(exclude_unset=True)
+    image_changed = "image_url" in update_data and update_data["image_url"] != db_scene.image_url
     for key, value in update_data.items():
         setattr(db_scene, key, value)
+    if image_changed:
+        # Thumbnails of the old image no longer apply; new ones are built in the background
+        db_scene.thumbnails = None
     
+    db_scene.revision = bump_project_revision(db, db_scene.project_id)
     db.commit()
     db.refresh(db_scene)
+    publish_project_event(db_scene.project_id, "scene.updated", SceneResponse.model_validate(db_scene).model_dump(mode="json"), db_scene.revision)
+    if image_changed and db_scene.image_url:
+        queue_scene_thumbnails(db_scene.id, db_scene.image_url)
     return db_scene
 
 @router.delete("/{scene_id}")
 def delete_scene(scene_id: str, db: Session = Depends(get_db)):
-    """Delete a scene"""
-    db_scene = db.query(Scene).filter(Scene.id == scene_id).first()
-    if not db_scene:
+    """Delete a scene; its image is deleted in the background unless another scene uses it"""
+    row = db.execute(select(Scene.project_id, Scene.image_url).where(Scene.id == scene_id)).first()
+    if row is None:
         raise HTTPException(status_code=404, detail="Scene not found")
-    
-    db.delete(db_scene)
+    project_id, image_url = row
+
+    revision = bump_project_revision(db, project_id)
+    # Connections can't outlive either end, so remove them along with the scene
+    connection_ids = list(db.scalars(
+        select(Connection.id).where((Connection.from_scene_id == scene_id) | (Connection.to_scene_id == scene_id))
+    ))
+    if connection_ids:
+        db.execute(delete(Connection).where(Connection.id.in_(connection_ids)))
+        record_deletes(db, project_id, "connection", connection_ids, revision)
+    record_deletes(db, project_id, "scene", [scene_id], revision)
+    db.execute(delete(Scene).where(Scene.id == scene_id))
     db.commit()
+    publish_project_event(project_id, "scene.deleted", {"id": scene_id, "connection_ids": connection_ids}, revision)
+    image_gc.queue_scene_cleanup(image_url)
     return {"message": "Scene deleted successfully"}
 
@@ -0,0 +1,145 @@
+"""Async versions of routes/scenes.py, mounted instead of it when DB_ASYNC=true"""
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from database import get_async_db
+from models.scene import Scene
+from models.connection import Connection
+from routes.scenes import SceneCreate, SceneUpdate, SceneBulkLayoutUpdate, SceneResponse, parse_viewport, fast_scenes_query
+from utils.revisions import bump_project_revision, record_deletes
+from utils.scene_layout import apply_layout_updates
+from utils.image_pipeline import queue_scene_thumbnails
+from utils.pubsub import publish_project_event_async
+from utils import fast_response, image_gc, scene_viewport
+import uuid
+
+router = APIRouter()
+
+async def publish_scenes_updated(scenes: List[Scene], origin: str = None):
+    """Broadcast a batch of committed scene changes, one event per project"""
+    by_project = {}
+    for scene in scenes:
+        by_project.setdefault(scene.project_id, []).append(scene)
+    for project_id, project_scenes in by_project.items():
+        await publish_project_event_async(
+            project_id,
+            "scenes.updated",
+            [SceneResponse.model_validate(scene).model_dump(mode="json") for scene in project_scenes],
+            max(scene.revision for scene in project_scenes),
+            origin,
+        )
+
+@router.get("/", response_model=List[SceneResponse])
+async def get_scenes(
+    request: Request,
+    project_id: str,
+    bbox: Optional[str] = Query(None, description="min_x,min_y,max_x,max_y"),
+    detail: str = Query("full", pattern="^(full|summary)$"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Get the scenes of a project, or only those overlapping `bbox` (see routes/scenes.py)"""
+    viewport = parse_viewport(bbox)
+    if detail == "summary":
+        return fast_response.render(request, await db.run_sync(scene_viewport.get_scenes, project_id, viewport, detail))
+    if fast_response.use_fast_path(request):
+        query = fast_scenes_query(db.bind.dialect.name, project_id, viewport)
+        return fast_response.render_rows(request, SceneResponse, (await db.execute(query)).mappings())
+    return await db.run_sync(scene_viewport.get_scenes, project_id, viewport)
+
+@router.get("/{scene_id}", response_model=SceneResponse)
+async def get_scene(scene_id: str, db: AsyncSession = Depends(get_async_db)):
+    """Get a single scene"""
+    scene = await db.get(Scene, scene_id)
+    if not scene:
+        raise HTTPException(status_code=404, detail="Scene not found")
+    return scene
+
+@router.post("/", response_model=SceneResponse)
+async def create_scene(scene: SceneCreate, db: AsyncSession = Depends(get_async_db)):
+    """Create a new scene"""
+    db_scene = Scene(
+        id=str(uuid.uuid4()),
+        project_id=scene.project_id,
+        prompt_text=scene.prompt_text,
+        caption=scene.caption,
+        image_url=scene.image_url,
+        x=scene.x,
+        y=scene.y,
+        width=scene.width,
+        height=scene.height
+    )
+    db_scene.revision = await db.run_sync(bump_project_revision, scene.project_id)
+    db.add(db_scene)
+    await db.commit()
+    await db.refresh(db_scene)
+    await publish_project_event_async(db_scene.project_id, "scene.created", SceneResponse.model_validate(db_scene).model_dump(mode="json"), db_scene.revision)
+    if db_scene.image_url:
+        queue_scene_thumbnails(db_scene.id, db_scene.image_url)
+    return db_scene
+
+@router.patch("/bulk", response_model=List[SceneResponse])
+async def update_scene_layouts(layout: SceneBulkLayoutUpdate, db: AsyncSession = Depends(get_async_db)):
+    """Update positions/sizes of many scenes in one transaction and return the changed scenes"""
+    updates = {}
+    for item in layout.scenes:
+        updates.setdefault(item.id, {}).update(item.model_dump(exclude_unset=True, exclude={"id"}))
+    if not updates:
+        return []
+
+    try:
+        changed_ids = await db.run_sync(apply_layout_updates, updates, layout.project_id)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=f"Scenes not found: {', '.join(e.args[0])}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not changed_ids:
+        return []
+    await db.commit()
+    changed_scenes = (await db.scalars(select(Scene).where(Scene.id.in_(changed_ids)))).all()
+    await publish_scenes_updated(changed_scenes)
+    return changed_scenes
+
+@router.patch("/{scene_id}", response_model=SceneResponse)
+async def update_scene(scene_id: str, scene: SceneUpdate, db: AsyncSession = Depends(get_async_db)):
+    """Update a scene"""
+    db_scene = await db.get(Scene, scene_id)
+    if not db_scene:
+        raise HTTPException(status_code=404, detail="Scene not found")
+
+    update_data = scene.model_dump(exclude_unset=True)
+    image_changed = "image_url" in update_data and update_data["image_url"] != db_scene.image_url
+    for key, value in update_data.items():
+        setattr(db_scene, key, value)
+    if image_changed:
+        db_scene.thumbnails = None
+
+    db_scene.revision = await db.run_sync(bump_project_revision, db_scene.project_id)
+    await db.commit()
+    await db.refresh(db_scene)
+    await publish_project_event_async(db_scene.project_id, "scene.updated", SceneResponse.model_validate(db_scene).model_dump(mode="json"), db_scene.revision)
+    if image_changed and db_scene.image_url:
+        queue_scene_thumbnails(db_scene.id, db_scene.image_url)
+    return db_scene
+
+@router.delete("/{scene_id}")
+async def delete_scene(scene_id: str, db: AsyncSession = Depends(get_async_db)):
+    """Delete a scene; its image is deleted in the background unless another scene uses it"""
+    row = (await db.execute(select(Scene.project_id, Scene.image_url).where(Scene.id == scene_id))).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Scene not found")
+    project_id, image_url = row
+
+    revision = await db.run_sync(bump_project_revision, project_id)
+    connection_ids = (await db.scalars(
+        select(Connection.id).where((Connection.from_scene_id == scene_id) | (Connection.to_scene_id == scene_id))
+    )).all()
+    if connection_ids:
+        await db.execute(delete(Connection).where(Connection.id.in_(connection_ids)))
+        await db.run_sync(record_deletes, project_id, "connection", list(connection_ids), revision)
+    await db.run_sync(record_deletes, project_id, "scene", [scene_id], revision)
+    await db.execute(delete(Scene).where(Scene.id == scene_id))
+    await db.commit()
+    await publish_project_event_async(project_id, "scene.deleted", {"id": scene_id, "connection_ids": list(connection_ids)}, revision)
+    image_gc.queue_scene_cleanup(image_url)
+    return {"message": "Scene deleted successfully"}
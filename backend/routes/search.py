@@ -0,0 +1,51 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy.orm import Session
+from typing import Dict, List, Optional
+from pydantic import BaseModel
+from database import get_db
+from models.project import Project
+from utils import scene_search
+from utils.scene_search import SEARCH_PAGE_SIZE, SEARCH_PAGE_SIZE_MAX, SEARCH_MAX_OFFSET
+
+router = APIRouter()
+
+class SceneSearchResult(BaseModel):
+    id: str
+    project_id: str
+    project_title: str
+    prompt_text: str
+    caption: Optional[str]
+    image_url: Optional[str]
+    thumbnails: Optional[Dict[str, Dict[str, str]]] = None
+    score: float
+
+@router.get("/scenes", response_model=List[SceneSearchResult])
+def search_scenes(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200),
+    project_id: Optional[str] = None,
+    limit: int = Query(SEARCH_PAGE_SIZE, ge=1, le=SEARCH_PAGE_SIZE_MAX),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """Search scene prompts and captions, best match first
+
+    Searches every project unless `project_id` is given. On Postgres `q`
+    takes web-search syntax ("quoted phrases", -excluded words, or) and
+    tolerates typos. Follow the X-Next-Cursor header with `cursor` for more.
+    """
+    try:
+        offset = scene_search.decode_cursor(cursor) if cursor else 0
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not scene_search.query_words(q):
+        return []
+    if project_id and db.get(Project, project_id) is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    rows = db.execute(scene_search.search_query(db, q, project_id, limit, offset)).mappings().all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        if offset + limit <= SEARCH_MAX_OFFSET:
+            response.headers["X-Next-Cursor"] = scene_search.encode_cursor(offset + limit)
+    return [dict(row) for row in rows]
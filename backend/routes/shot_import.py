@@ -0,0 +1,77 @@
+from fastapi import APIRouter, HTTPException, Query, Request
+from pydantic import BaseModel
+from typing import Literal, Optional
+from database import SessionLocal
+from utils import shot_import
+from utils.pubsub import publish_project_event
+import anyio
+import io
+
+router = APIRouter()
+
+class ShotImportResponse(BaseModel):
+    project_id: str
+    scene_count: int
+    connection_count: int
+    revision: int
+    seconds: float
+
+class _RequestBody(io.RawIOBase):
+    """Blocking reader over a request body, for a worker thread started by anyio.to_thread
+
+    Chunks are pulled from the event loop only as the reader asks for them,
+    so a large upload is never held in memory at once.
+    """
+
+    def __init__(self, request: Request):
+        self._chunks = request.stream().__aiter__()
+        self._buffer = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._buffer:
+            try:
+                self._buffer = anyio.from_thread.run(self._chunks.__anext__)
+            except StopAsyncIteration:
+                return 0
+        size = min(len(buffer), len(self._buffer))
+        buffer[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+def _run_import(project_id: str, body: io.RawIOBase, fmt: str, chain: bool) -> Optional[dict]:
+    db = SessionLocal()
+    try:
+        return shot_import.import_shot_list(db, project_id, io.BufferedReader(body), fmt, chain)
+    finally:
+        db.close()
+
+@router.post("/{project_id}/import", response_model=ShotImportResponse)
+async def import_shot_list(
+    project_id: str,
+    request: Request,
+    format: Optional[Literal["jsonl", "csv"]] = None,
+    chain: bool = Query(True, description="Connect each shot to the one before it"),
+):
+    """Add scenes to a project from a JSON Lines or CSV shot list in the request body
+
+    Each row needs `prompt_text` (or `prompt`) and may set `caption`,
+    `image_url`, `x`, `y`, `width`, `height` and `connection_label`. The
+    format comes from `format`, else the Content-Type (`text/csv` for CSV).
+    Nothing is imported if any row is invalid; the response lists the first
+    problems by line.
+    """
+    fmt = format or ("csv" if "csv" in request.headers.get("content-type", "") else "jsonl")
+    try:
+        result = await anyio.to_thread.run_sync(_run_import, project_id, _RequestBody(request), fmt, chain)
+    except shot_import.ShotImportError as e:
+        raise HTTPException(status_code=422, detail={"message": "Shot list has invalid rows; nothing was imported", "errors": e.errors})
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Shot list must be UTF-8")
+    if result is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    # One event rather than thousands of scene payloads; clients catch up through /changes
+    publish_project_event(project_id, "scenes.imported", {"scene_count": result["scene_count"], "connection_count": result["connection_count"]}, result["revision"])
+    return result
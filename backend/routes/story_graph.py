@@ -0,0 +1,62 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy.orm import Session
+from typing import List
+from pydantic import BaseModel
+from database import get_db
+from models.project import Project
+from routes.projects import is_not_modified
+from utils import story_graph
+
+router = APIRouter()
+
+class StoryGraphResponse(BaseModel):
+    revision: int
+    order: List[str]
+    has_cycles: bool
+    cycles: List[List[str]]
+    starts: List[str]
+    ends: List[str]
+    branches: List[str]
+    merges: List[str]
+    isolated: List[str]
+    unreachable: List[str]
+
+class StoryPathResponse(BaseModel):
+    revision: int
+    path: List[str]
+
+def load_project_graph(db: Session, project_id: str) -> story_graph.StoryGraph:
+    revision = db.query(Project.revision).filter(Project.id == project_id).scalar()
+    if revision is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return story_graph.get_graph(db, project_id, revision)
+
+@router.get("/{project_id}/graph", response_model=StoryGraphResponse)
+def get_story_graph(project_id: str, request: Request, db: Session = Depends(get_db)):
+    """Get the narrative structure implied by a project's connections
+
+    `order` lists every scene so each comes after the scenes leading to it
+    (scenes in a loop are kept together); ties go to the earlier created scene.
+    `unreachable` are connected scenes that no start scene leads to.
+    """
+    graph = load_project_graph(db, project_id)
+    with graph.lock:
+        etag = f'"{project_id}:{graph.revision}:graph"'
+        if is_not_modified(request, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+        body = graph.body()
+    return Response(content=body, media_type="application/json", headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+@router.get("/{project_id}/graph/path", response_model=StoryPathResponse)
+def get_story_path(project_id: str, from_scene_id: str, to_scene_id: str, db: Session = Depends(get_db)):
+    """Get the shortest chain of connections from one scene to another"""
+    graph = load_project_graph(db, project_id)
+    with graph.lock:
+        for scene_id in (from_scene_id, to_scene_id):
+            if scene_id not in graph.scenes:
+                raise HTTPException(status_code=404, detail=f"Scene not found: {scene_id}")
+        path = graph.shortest_path(from_scene_id, to_scene_id)
+        revision = graph.revision
+    if path is None:
+        raise HTTPException(status_code=404, detail="No path between these scenes")
+    return {"revision": revision, "path": path}
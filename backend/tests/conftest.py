@@ -0,0 +1,58 @@
+"""Test settings: a throwaway SQLite database and local storage, set before the app is imported
+
+Set TEST_POSTGRES_URL (a server URL whose user may create databases) to run
+the `database_url` tests against Postgres as well as SQLite.
+"""
+import os
+import tempfile
+import uuid
+
+WORK_DIR = tempfile.mkdtemp(prefix="storyboard-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{WORK_DIR}/test.db"
+os.environ["STORAGE_BACKEND"] = "local"
+os.environ["LOCAL_STORAGE_DIR"] = os.path.join(WORK_DIR, "local_s3")
+os.environ["MEDIA_CACHE_DIR"] = os.path.join(WORK_DIR, "media_cache")
+os.environ["MEDIA_SPOOL_DIR"] = os.path.join(WORK_DIR, "media_spool")
+os.environ["IMAGE_PROVIDER"] = "stub"
+os.environ["CLIENT_WARMUP"] = "false"
+os.environ["IMAGE_GC_ENABLED"] = "false"
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+
+
+@pytest.fixture(scope="session")
+def app():
+    from database.init_db import init_db
+    init_db()
+    from main import app
+    return app
+
+
+@pytest.fixture(scope="session")
+def client(app):
+    from fastapi.testclient import TestClient
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture(params=["sqlite", "postgresql"])
+def database_url(request, tmp_path):
+    """An empty database of each kind, dropped afterwards"""
+    if request.param == "sqlite":
+        yield f"sqlite:///{tmp_path}/test.db"
+        return
+    server_url = os.getenv("TEST_POSTGRES_URL")
+    if not server_url:
+        pytest.skip("TEST_POSTGRES_URL is not set")
+    name = f"storyboard_test_{uuid.uuid4().hex[:12]}"
+    admin = create_engine(server_url, isolation_level="AUTOCOMMIT")
+    with admin.connect() as connection:
+        connection.execute(text(f'CREATE DATABASE "{name}"'))
+    try:
+        yield make_url(server_url).set(database=name).render_as_string(hide_password=False)
+    finally:
+        with admin.connect() as connection:
+            connection.execute(text(f'DROP DATABASE IF EXISTS "{name}" WITH (FORCE)'))
+        admin.dispose()
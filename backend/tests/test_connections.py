@@ -0,0 +1,29 @@
+import uuid
+import pytest
+from utils import story_graph
+
+
+def make_board(client, scenes: int = 3):
+    project_id = client.post("/api/projects/", json={"title": "Connections"}).json()["id"]
+    scene_ids = [client.post("/api/scenes/", json={"project_id": project_id, "prompt_text": f"Scene {i}"}).json()["id"]
+                 for i in range(scenes)]
+    return project_id, scene_ids
+
+
+@pytest.mark.parametrize("allow_cycles", [True, False])
+def test_unknown_project_is_404(client, monkeypatch, allow_cycles):
+    monkeypatch.setattr(story_graph, "STORY_GRAPH_ALLOW_CYCLES", allow_cycles)
+    _, (first, second, _) = make_board(client)
+    response = client.post("/api/connections/", json={
+        "project_id": str(uuid.uuid4()), "from_scene_id": first, "to_scene_id": second,
+    })
+    assert response.status_code == 404
+
+
+def test_cycle_is_rejected_when_cycles_are_off(client, monkeypatch):
+    monkeypatch.setattr(story_graph, "STORY_GRAPH_ALLOW_CYCLES", False)
+    project_id, (first, second, third) = make_board(client)
+    for from_id, to_id in ((first, second), (second, third)):
+        assert client.post("/api/connections/", json={"project_id": project_id, "from_scene_id": from_id, "to_scene_id": to_id}).status_code == 200
+    response = client.post("/api/connections/", json={"project_id": project_id, "from_scene_id": third, "to_scene_id": first})
+    assert response.status_code == 409
@@ -0,0 +1,70 @@
+import uuid
+from sqlalchemy import func, select
+from database import SessionLocal
+from models.connection import Connection
+from models.scene import Scene
+from utils import image_gc, s3
+
+
+def make_board(client, image_urls):
+    """A project with a scene per image URL, chained in order, plus a connection from the last back to the first"""
+    project_id = client.post("/api/projects/", json={"title": "Delete"}).json()["id"]
+    scene_ids = [client.post("/api/scenes/", json={"project_id": project_id, "prompt_text": f"Scene {i}", "image_url": url}).json()["id"]
+                 for i, url in enumerate(image_urls)]
+    for from_id, to_id in list(zip(scene_ids, scene_ids[1:])) + [(scene_ids[-1], scene_ids[0])]:
+        client.post("/api/connections/", json={"project_id": project_id, "from_scene_id": from_id, "to_scene_id": to_id})
+    return project_id, scene_ids
+
+
+def count(model, project_id: str) -> int:
+    db = SessionLocal()
+    try:
+        return db.scalar(select(func.count()).select_from(model).where(model.project_id == project_id))
+    finally:
+        db.close()
+
+
+def test_scene_delete_removes_its_connections_both_ways(client):
+    project_id, (first, middle, last) = make_board(client, [None] * 3)
+    since = client.get(f"/api/projects/{project_id}/changes").json()["revision"]
+    assert client.delete(f"/api/scenes/{middle}").status_code == 200
+    assert client.delete(f"/api/scenes/{middle}").status_code == 404
+
+    connections = client.get("/api/connections/", params={"project_id": project_id}).json()
+    assert [(c["from_scene_id"], c["to_scene_id"]) for c in connections] == [(last, first)]
+    deleted = client.get(f"/api/projects/{project_id}/changes", params={"since": since}).json()["deleted"]
+    assert sorted(item["entity_type"] for item in deleted) == ["connection", "connection", "scene"]
+
+
+def test_project_delete_removes_every_row(client):
+    project_id, _ = make_board(client, [None] * 4)
+    assert client.delete(f"/api/projects/{project_id}").status_code == 200
+    assert (count(Scene, project_id), count(Connection, project_id)) == (0, 0)
+    assert client.get(f"/api/projects/{project_id}/full").status_code == 404
+    assert client.delete(f"/api/projects/{project_id}").status_code == 404
+
+
+def test_image_gc_dry_run_reports_without_deleting(client):
+    prefix = f"{uuid.uuid4()}/"
+    used, shared, orphan = (f"{prefix}{name}" for name in ("used", "shared", "orphan"))
+    keys = [key for base in (used, shared, orphan) for key in (f"{base}.png", f"{base}_w256.webp")]
+    for key in keys:
+        s3.get_s3_client().put_object(Bucket=s3.BUCKET_NAME, Key=key, Body=b"x" * 10)
+    _, (scene_id,) = make_board(client, [s3.get_public_url(f"{used}.png")])
+    # Another project still shows the shared image, through the /media URL form
+    make_board(client, [s3.media_url(f"{shared}.png")])
+    client.delete(f"/api/scenes/{scene_id}")
+
+    # Fresh objects are left alone by a sweep
+    swept = image_gc.collect(prefix, dry_run=True)
+    assert (swept["scanned"], swept["kept"], swept["too_new"], swept["deleted"]) == (6, 2, 4, 0)
+
+    report = image_gc.collect(prefix, dry_run=True, min_age_seconds=0)
+    assert report["dry_run"] is True
+    assert (report["scanned"], report["kept"], report["deleted"], report["deleted_bytes"]) == (6, 2, 4, 40)
+    assert sorted(report["sample"]) == sorted(f"{base}{suffix}" for base in (used, orphan) for suffix in (".png", "_w256.webp"))
+    assert all(s3.object_exists(key) for key in keys)
+
+    collected = image_gc.collect(prefix, min_age_seconds=0)
+    assert collected["deleted"] == 4
+    assert [key for key in keys if s3.object_exists(key)] == [f"{shared}.png", f"{shared}_w256.webp"]
@@ -0,0 +1,84 @@
+import uuid
+from sqlalchemy import insert
+from database import SessionLocal
+from models.connection import Connection
+from models.project import Project
+from models.scene import Scene
+from utils import s3
+
+
+def make_board(scene_ids, thumbnails=None):
+    """A project whose scenes have the given ids, chained in order; returns the project id"""
+    project_id = str(uuid.uuid4())
+    db = SessionLocal()
+    try:
+        db.add(Project(id=project_id, title="Board"))
+        db.flush()
+        db.execute(insert(Scene), [
+            {"id": scene_id, "project_id": project_id, "prompt_text": f"Scene {i}", "x": i * 350.0, "revision": 0,
+             "image_url": f"https://example.com/{project_id}/{i}.png", "thumbnails": thumbnails}
+            for i, scene_id in enumerate(scene_ids)
+        ])
+        db.execute(insert(Connection), [
+            {"id": f"{from_id}>{to_id}", "project_id": project_id, "from_scene_id": from_id, "to_scene_id": to_id, "revision": 0}
+            for from_id, to_id in zip(scene_ids, scene_ids[1:])
+        ])
+        db.commit()
+    finally:
+        db.close()
+    return project_id
+
+
+def board(client, project_id):
+    return client.get(f"/api/projects/{project_id}/full").json()
+
+
+def test_duplicate_remaps_connections_to_the_new_scenes(client):
+    # Short ids: a copy must not derive its ids from a fixed-length slice of these
+    source_id = make_board([f"s{i}-{uuid.uuid4().hex[:4]}" for i in range(4)], {"webp": {"256": "https://example.com/t.webp"}})
+    response = client.post(f"/api/projects/{source_id}/duplicate", json={"title": "Copy"})
+    assert response.status_code == 200
+    copy = response.json()
+    assert (copy["title"], copy["scene_count"], copy["connection_count"]) == ("Copy", 4, 3)
+
+    source, duplicate = board(client, source_id), board(client, copy["id"])
+    source_ids = {scene["id"] for scene in source["scenes"]}
+    new_ids = {scene["x"]: scene["id"] for scene in duplicate["scenes"]}
+    assert not source_ids & set(new_ids.values())
+    assert [scene["thumbnails"] for scene in duplicate["scenes"]] == [scene["thumbnails"] for scene in source["scenes"]]
+    old_ids = {scene["id"]: scene["x"] for scene in source["scenes"]}
+    expected = sorted((new_ids[old_ids[c["from_scene_id"]]], new_ids[old_ids[c["to_scene_id"]]]) for c in source["connections"])
+    assert sorted((c["from_scene_id"], c["to_scene_id"]) for c in duplicate["connections"]) == expected
+    assert not {c["id"] for c in source["connections"]} & {c["id"] for c in duplicate["connections"]}
+
+
+def test_duplicating_twice_gives_distinct_ids(client):
+    source_id = make_board([uuid.uuid4().hex[:2], uuid.uuid4().hex[:2]])
+    first = client.post(f"/api/projects/{source_id}/duplicate", json={}).json()
+    second = client.post(f"/api/projects/{source_id}/duplicate", json={"include_images": False}).json()
+    first_ids = {scene["id"] for scene in board(client, first["id"])["scenes"]}
+    second_scenes = board(client, second["id"])["scenes"]
+    assert len(first_ids) == 2 and not first_ids & {scene["id"] for scene in second_scenes}
+    assert all(scene["image_url"] is None and scene["thumbnails"] is None for scene in second_scenes)
+
+
+def test_copy_images_points_the_copy_at_its_own_objects(client):
+    project_id = str(uuid.uuid4())
+    key, thumbnail_key = f"{project_id}/image.png", f"{project_id}/image_w256.webp"
+    for object_key in (key, thumbnail_key):
+        s3.get_s3_client().put_object(Bucket=s3.BUCKET_NAME, Key=object_key, Body=b"image")
+    db = SessionLocal()
+    try:
+        db.add(Project(id=project_id, title="Board"))
+        db.flush()
+        db.add(Scene(id=uuid.uuid4().hex[:6], project_id=project_id, prompt_text="a", image_url=s3.get_public_url(key),
+                     thumbnails={"webp": {"256": s3.get_public_url(thumbnail_key)}}))
+        db.commit()
+    finally:
+        db.close()
+
+    copy = client.post(f"/api/projects/{project_id}/duplicate", json={"copy_images": True}).json()
+    [scene] = board(client, copy["id"])["scenes"]
+    assert scene["image_url"] == s3.get_public_url(f"{copy['id']}/image.png")
+    assert scene["thumbnails"] == {"webp": {"256": s3.get_public_url(f"{copy['id']}/image_w256.webp")}}
+    assert s3.object_exists(f"{copy['id']}/image.png") and s3.object_exists(f"{copy['id']}/image_w256.webp")
@@ -0,0 +1,118 @@
+"""The hot project/scene queries must be served by indexes, not whole-table scans of scenes or connections
+
+Runs EXPLAIN (Postgres) or EXPLAIN QUERY PLAN (SQLite) on a small migrated
+database. Postgres would happily scan tables this small, so sequential scans
+are priced out (enable_seqscan = off): one left in a plan means no index fits.
+"""
+import json
+import os
+import subprocess
+import sys
+import uuid
+import pytest
+from sqlalchemy import create_engine, delete, insert, select, text
+from sqlalchemy.dialects import postgresql
+from models.connection import Connection
+from models.project import Project
+from models.scene import Scene
+from routes.connections import fast_connections_query
+from routes.projects import project_list_query
+from utils import scene_viewport
+from utils.project_snapshot import postgres_snapshot_query
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HOT_TABLES = {"scenes", "connections"}
+PROJECTS = 30
+SCENES_PER_PROJECT = 10
+
+
+def seed(engine):
+    projects, scenes, connections = [], [], []
+    for i in range(PROJECTS):
+        project_id = str(uuid.uuid4())
+        projects.append({"id": project_id, "title": f"Project {i}", "revision": 0})
+        scene_ids = [str(uuid.uuid4()) for _ in range(SCENES_PER_PROJECT)]
+        for j, scene_id in enumerate(scene_ids):
+            scenes.append({"id": scene_id, "project_id": project_id, "prompt_text": f"Scene {j}", "revision": 0,
+                           "image_url": f"https://example.com/{project_id}/{j}.png"})
+        connections += [{"id": str(uuid.uuid4()), "project_id": project_id, "from_scene_id": scene_ids[j],
+                         "to_scene_id": scene_ids[j + 1], "revision": 0} for j in range(SCENES_PER_PROJECT - 1)]
+    with engine.begin() as connection:
+        for model, rows in ((Project, projects), (Scene, scenes), (Connection, connections)):
+            connection.execute(insert(model), rows)
+        connection.execute(text("ANALYZE"))
+    return projects[PROJECTS // 2]["id"], scenes[len(scenes) // 2]
+
+
+def hot_queries(dialect: str, project_id: str, scene: dict):
+    scene_id = scene["id"]
+    queries = [
+        ("project list with stats", project_list_query(dialect, 50, None, None, None, True)),
+        ("scene list", scene_viewport.scenes_query(dialect, project_id)),
+        ("connection list", fast_connections_query(project_id)),
+        ("snapshot scenes", select(Scene.__table__).where(Scene.project_id == project_id).order_by(Scene.created_at)),
+        ("snapshot connections", select(Connection.__table__).where(Connection.project_id == project_id).order_by(Connection.created_at)),
+        ("scene delete: its connections", select(Connection.id).where(
+            (Connection.from_scene_id == scene_id) | (Connection.to_scene_id == scene_id)
+        )),
+        ("scene delete: the scene", delete(Scene).where(Scene.id == scene_id)),
+        ("scene delete: image still used", select(Scene.image_url).where(Scene.image_url.in_([scene["image_url"]])).distinct()),
+    ]
+    if dialect == "postgresql":
+        queries.append(("snapshot (single query)", postgres_snapshot_query(project_id)))
+    return queries
+
+
+def plan_postgres(connection, sql: str):
+    """(scan nodes, sequential scans of the hot tables) in a query's plan"""
+    plan = connection.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    nodes, scans = [], []
+
+    def walk(node):
+        if "Relation Name" in node:
+            described = f"{node['Node Type']} on {node['Relation Name']}"
+            nodes.append(described)
+            if node["Node Type"] == "Seq Scan" and node["Relation Name"] in HOT_TABLES:
+                scans.append(described)
+        for child in node.get("Plans", []):
+            walk(child)
+
+    walk(plan[0]["Plan"])
+    return nodes, scans
+
+
+def plan_sqlite(connection, sql: str):
+    details = [row[-1] for row in connection.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+    # SEARCH seeks through an index; SCAN walks the whole table (or a whole index)
+    scans = [detail for detail in details if detail.startswith("SCAN") and detail.split()[1] in HOT_TABLES]
+    return details, scans
+
+
+@pytest.fixture
+def engine(database_url):
+    # Migrations read DATABASE_URL at import, so they run in their own process
+    result = subprocess.run([sys.executable, "-c", "from database.init_db import init_db; init_db()"], cwd=BACKEND_DIR,
+                            env={**os.environ, "DATABASE_URL": database_url}, capture_output=True, text=True)
+    assert result.returncode == 0, result.stdout + result.stderr
+    engine = create_engine(database_url)
+    yield engine
+    engine.dispose()
+
+
+def test_hot_queries_use_indexes(engine):
+    project_id, scene = seed(engine)
+    dialect = engine.dialect.name
+    explain = plan_postgres if dialect == "postgresql" else plan_sqlite
+    failures = []
+    with engine.connect() as connection:
+        if dialect == "postgresql":
+            connection.execute(text("SET enable_seqscan = off"))
+        for label, query in hot_queries(dialect, project_id, scene):
+            sql = str(query.compile(dialect=postgresql.dialect() if dialect == "postgresql" else engine.dialect,
+                                    compile_kwargs={"literal_binds": True}))
+            nodes, scans = explain(connection, sql)
+            if scans:
+                failures.append(f"{label}: {'; '.join(nodes)}")
+    assert not failures, "whole-table scans:\n" + "\n".join(failures)
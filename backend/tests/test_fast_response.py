@@ -0,0 +1,125 @@
+"""FAST_RESPONSES and MessagePack must not change what list and snapshot responses say
+
+JSON from the fast path has to be byte-identical to the response model path,
+including floats orjson would write differently (1e+20, 1e-07) and non-ASCII
+text; MessagePack has to decode to the same document.
+"""
+import json
+import uuid
+from datetime import datetime, timedelta, timezone
+import pytest
+from sqlalchemy import insert
+from database import SessionLocal
+from models.connection import Connection
+from models.project import Project
+from models.scene import Scene
+from utils import fast_response
+
+msgpack = pytest.importorskip("msgpack")
+MSGPACK = {"Accept": "application/msgpack"}
+
+
+@pytest.fixture(scope="module")
+def project_ids(client):
+    db = SessionLocal()
+    try:
+        board_id, exotic_id = str(uuid.uuid4()), str(uuid.uuid4())
+        db.add(Project(id=board_id, title="Fast path ✦ «storyboard»"))
+        db.add(Project(id=exotic_id, title="Exotic floats"))
+        db.flush()
+        created_at = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        scenes = [{
+            "id": str(uuid.uuid4()),
+            "project_id": board_id,
+            "prompt_text": f"Shot {i + 1}: the detective crosses the square — “night”, 雨",
+            "caption": f"Scene {i}" if i % 3 == 0 else None,
+            "image_url": f"https://example.com/images/{i}.png",
+            "thumbnails": {"webp": {"256": f"https://example.com/thumbs/{i}_w256.webp"}} if i % 2 else None,
+            "x": (i % 10) * 350.0 + 0.25,
+            "y": float(i // 10 * 250),
+            "width": 300.0,
+            "height": 200.0,
+            "created_at": created_at + timedelta(microseconds=i),
+            "revision": i,
+        } for i in range(60)]
+        db.execute(insert(Scene), scenes)
+        db.execute(insert(Connection), [{
+            "id": str(uuid.uuid4()),
+            "project_id": board_id,
+            "from_scene_id": scenes[i]["id"],
+            "to_scene_id": scenes[i + 1]["id"],
+            "label": "cut" if i % 2 else None,
+            "created_at": created_at + timedelta(microseconds=i),
+        } for i in range(59)])
+        for x, y in ((1e20, 1e-7), (0.0, -0.0), (123456789.125, 5e-324)):
+            db.add(Scene(id=str(uuid.uuid4()), project_id=exotic_id, prompt_text="far away", x=x, y=y))
+        db.commit()
+    finally:
+        db.close()
+    return board_id, exotic_id
+
+
+@pytest.fixture
+def fast_responses(monkeypatch):
+    def set_fast(enabled: bool):
+        monkeypatch.setattr(fast_response, "FAST_RESPONSES", enabled)
+    return set_fast
+
+
+LIST_URLS = [
+    "/api/scenes/?project_id={board}",
+    "/api/scenes/?project_id={board}&bbox=0,0,1000,600",
+    "/api/scenes/?project_id={board}&detail=summary",
+    "/api/scenes/?project_id={exotic}",
+    "/api/connections/?project_id={board}",
+    "/api/projects/",
+    "/api/projects/?limit=1",
+    "/api/projects/?include_stats=true",
+]
+
+
+@pytest.mark.parametrize("url", LIST_URLS)
+def test_list_json_is_byte_identical(client, project_ids, fast_responses, url):
+    url = url.format(board=project_ids[0], exotic=project_ids[1])
+    fast_responses(False)
+    default = client.get(url)
+    fast_responses(True)
+    fast = client.get(url)
+    assert default.status_code == fast.status_code == 200
+    assert fast.content == default.content
+    assert fast.headers.get("x-next-cursor") == default.headers.get("x-next-cursor")
+    assert fast.headers["content-type"] == default.headers["content-type"]
+
+
+@pytest.mark.parametrize("url", LIST_URLS)
+def test_list_msgpack_matches_json(client, project_ids, fast_responses, url):
+    url = url.format(board=project_ids[0], exotic=project_ids[1])
+    fast_responses(False)
+    default = client.get(url)
+    packed = client.get(url, headers=MSGPACK)
+    assert packed.headers["content-type"] == "application/msgpack"
+    assert msgpack.unpackb(packed.content) == json.loads(default.content)
+
+
+def test_snapshot_json_is_byte_identical(client, project_ids, fast_responses):
+    url = f"/api/projects/{project_ids[0]}/full"
+    fast_responses(False)
+    default = client.get(url)
+    fast_responses(True)
+    fast = client.get(url)
+    assert default.status_code == fast.status_code == 200
+    assert fast.content == default.content
+    assert fast.headers["etag"] == default.headers["etag"]
+
+
+def test_snapshot_msgpack_matches_json(client, project_ids):
+    url = f"/api/projects/{project_ids[0]}/full"
+    default = client.get(url)
+    packed = client.get(url, headers=MSGPACK)
+    assert packed.status_code == 200
+    assert packed.headers["content-type"] == "application/msgpack"
+    assert msgpack.unpackb(packed.content) == json.loads(default.content)
+    # Each encoding has its own ETag, so a cached JSON copy is never revalidated as MessagePack
+    assert packed.headers["etag"] != default.headers["etag"]
+    assert client.get(url, headers={**MSGPACK, "If-None-Match": packed.headers["etag"]}).status_code == 304
+    assert client.get(url, headers={**MSGPACK, "If-None-Match": default.headers["etag"]}).status_code == 200
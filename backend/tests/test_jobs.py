@@ -0,0 +1,38 @@
+import time
+from utils.jobs import JOB_FAILED, JOB_PARTIAL, JOB_SUCCEEDED, JobQueue
+
+
+def run_batch(outcomes):
+    queue = JobQueue(max_workers=2)
+
+    def item(succeeds):
+        def fn():
+            if not succeeds:
+                raise RuntimeError("provider error")
+            return {"ok": True}
+        return fn
+
+    batch = queue.submit_batch("test", {}, [(str(i), item(succeeds)) for i, succeeds in enumerate(outcomes)], max_parallel=2)
+    deadline = time.time() + 5
+    while not batch.finished and time.time() < deadline:
+        time.sleep(0.01)
+    queue.shutdown(wait=True)
+    return batch
+
+
+def test_batch_where_every_item_fails_is_failed():
+    batch = run_batch([False, False, False])
+    assert batch.status == JOB_FAILED
+    assert batch.result == {"succeeded": 0, "failed": 3}
+    assert batch.error
+
+
+def test_batch_with_some_failures_is_partial():
+    batch = run_batch([True, False, True])
+    assert batch.status == JOB_PARTIAL
+    assert batch.result == {"succeeded": 2, "failed": 1}
+
+
+def test_batch_without_failures_succeeds():
+    assert run_batch([True, True]).status == JOB_SUCCEEDED
+    assert run_batch([]).status == JOB_SUCCEEDED
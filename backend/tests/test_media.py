@@ -0,0 +1,68 @@
+import os
+import pytest
+from utils import media, s3
+
+BODY = os.urandom(1000)
+
+
+@pytest.fixture(scope="module")
+def key(client):
+    key = "media-test/image.png"
+    s3.get_s3_client().put_object(Bucket=s3.BUCKET_NAME, Key=key, Body=BODY, ContentType="image/png")
+    return key
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=900-", (900, 999)),
+    ("bytes=990-5000", (990, 999)),
+    ("bytes=-10", (990, 999)),
+    ("bytes=-5000", (0, 999)),
+    ("bytes=10-5", None),
+    ("bytes=0-1,5-6", None),
+    ("items=0-1", None),
+])
+def test_byte_range(header, expected):
+    assert media._byte_range(header, len(BODY)) == expected
+
+
+@pytest.mark.parametrize("header, size", [("bytes=1000-", 1000), ("bytes=-0", 1000), ("bytes=-10", 0)])
+def test_unsatisfiable_byte_range(header, size):
+    with pytest.raises(ValueError):
+        media._byte_range(header, size)
+
+
+def test_inverted_range_sends_whole_file(client, key):
+    response = client.get(f"/media/{key}", headers={"Range": "bytes=10-5"})
+    assert response.status_code == 200
+    assert response.headers["content-length"] == str(len(BODY))
+    assert "content-range" not in response.headers
+    assert response.content == BODY
+
+
+def test_range_request(client, key):
+    response = client.get(f"/media/{key}", headers={"Range": "bytes=100-199"})
+    assert response.status_code == 206
+    assert response.headers["content-range"] == f"bytes 100-199/{len(BODY)}"
+    assert response.headers["content-length"] == "100"
+    assert response.content == BODY[100:200]
+
+
+def test_range_past_the_end_is_416(client, key):
+    response = client.get(f"/media/{key}", headers={"Range": "bytes=5000-"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(BODY)}"
+
+
+def test_etag_revalidation(client, key):
+    response = client.get(f"/media/{key}")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/png"
+    assert response.content == BODY
+    revalidated = client.get(f"/media/{key}", headers={"If-None-Match": response.headers["etag"]})
+    assert revalidated.status_code == 304
+
+
+def test_missing_and_escaping_keys(client):
+    assert client.get("/media/media-test/missing.png").status_code == 404
+    assert client.get("/media/media-test/..%2F..%2Fsecret").status_code == 400
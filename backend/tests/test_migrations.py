@@ -0,0 +1,124 @@
+"""init_db on databases that predate migrations: stamped at the revision they match, then upgraded to head
+
+init_db runs in a subprocess per database, since the engine is built from
+DATABASE_URL at import.
+"""
+import os
+import subprocess
+import sys
+import pytest
+from sqlalchemy import Column, DateTime, Float, ForeignKey, Integer, MetaData, String, Table, create_engine, inspect, text
+from sqlalchemy.sql import func
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAD = "0008_scene_bounds_by_project"
+
+
+def baseline_metadata(image_cache: bool = False) -> MetaData:
+    """The tables create_all() made from the original models (and the image cache added before migrations)"""
+    metadata = MetaData()
+    Table("users", metadata,
+          Column("id", String, primary_key=True, index=True),
+          Column("email", String, unique=True, index=True, nullable=False),
+          Column("password_hash", String, nullable=False),
+          Column("created_at", DateTime(timezone=True), server_default=func.now()))
+    Table("projects", metadata,
+          Column("id", String, primary_key=True, index=True),
+          Column("title", String, nullable=False),
+          Column("created_at", DateTime(timezone=True), server_default=func.now()),
+          Column("updated_at", DateTime(timezone=True), server_default=func.now()))
+    Table("scenes", metadata,
+          Column("id", String, primary_key=True, index=True),
+          Column("project_id", String, ForeignKey("projects.id"), nullable=False),
+          Column("prompt_text", String, nullable=False),
+          Column("caption", String),
+          Column("image_url", String),
+          Column("x", Float), Column("y", Float), Column("width", Float), Column("height", Float),
+          Column("created_at", DateTime(timezone=True), server_default=func.now()))
+    Table("connections", metadata,
+          Column("id", String, primary_key=True, index=True),
+          Column("project_id", String, ForeignKey("projects.id"), nullable=False),
+          Column("from_scene_id", String, ForeignKey("scenes.id"), nullable=False),
+          Column("to_scene_id", String, ForeignKey("scenes.id"), nullable=False),
+          Column("label", String),
+          Column("created_at", DateTime(timezone=True), server_default=func.now()))
+    if image_cache:
+        Table("image_cache", metadata,
+              Column("key", String, primary_key=True),
+              Column("provider", String, nullable=False),
+              Column("model", String, nullable=False),
+              Column("size", String, nullable=False),
+              Column("quality", String, nullable=False),
+              Column("prompt", String, nullable=False),
+              Column("s3_key", String, nullable=False),
+              Column("image_url", String, nullable=False),
+              Column("hit_count", Integer, default=0, nullable=False),
+              Column("created_at", DateTime(timezone=True), server_default=func.now()),
+              Column("last_used_at", DateTime(timezone=True), server_default=func.now(), index=True))
+    return metadata
+
+
+def run(code: str, url: str):
+    env = {**os.environ, "DATABASE_URL": url}
+    result = subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stdout + result.stderr
+    return result.stdout
+
+
+def init_db(url: str) -> str:
+    return run("from database.init_db import init_db; init_db()", url)
+
+
+def seed(engine):
+    with engine.begin() as connection:
+        connection.execute(text("INSERT INTO projects (id, title) VALUES ('p1', 'Board')"))
+        connection.execute(text("INSERT INTO scenes (id, project_id, prompt_text) VALUES ('s1', 'p1', 'a'), ('s2', 'p1', 'b')"))
+        connection.execute(text(
+            "INSERT INTO connections (id, project_id, from_scene_id, to_scene_id) VALUES ('c1', 'p1', 's1', 's2')"
+        ))
+
+
+def assert_at_head(engine):
+    inspector = inspect(engine)
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT version_num FROM alembic_version")).scalar() == HEAD
+    assert {"tombstones", "image_cache"} <= set(inspector.get_table_names())
+    for table in ("projects", "scenes", "connections"):
+        assert "revision" in {column["name"] for column in inspector.get_columns(table)}
+    foreign_keys = inspector.get_foreign_keys("scenes")
+    assert [fk["options"].get("ondelete") for fk in foreign_keys] == ["CASCADE"]
+    # Rows survive the rebuilds, and deleting the project now cascades
+    with engine.begin() as connection:
+        if engine.dialect.name == "sqlite":
+            connection.execute(text("PRAGMA foreign_keys=ON"))
+        assert connection.execute(text("SELECT count(*) FROM connections")).scalar() == 1
+        connection.execute(text("DELETE FROM projects WHERE id = 'p1'"))
+        assert connection.execute(text("SELECT count(*) FROM scenes")).scalar() == 0
+
+
+@pytest.mark.parametrize("image_cache", [False, True], ids=["baseline", "baseline+image_cache"])
+def test_create_all_baseline_upgrades_to_head(database_url, image_cache):
+    engine = create_engine(database_url)
+    try:
+        baseline_metadata(image_cache).create_all(engine)
+        seed(engine)
+        output = init_db(database_url)
+        assert "marking it as 0001_baseline" in output
+        assert_at_head(engine)
+    finally:
+        engine.dispose()
+
+
+def test_unversioned_0002_schema_is_stamped_0002(database_url):
+    engine = create_engine(database_url)
+    try:
+        run("from alembic import command; from database.init_db import alembic_config; "
+            "command.upgrade(alembic_config(), '0002_revisions_image_cache')", database_url)
+        with engine.begin() as connection:
+            connection.execute(text("DROP TABLE alembic_version"))
+        seed(engine)
+        output = init_db(database_url)
+        assert "marking it as 0002_revisions_image_cache" in output
+        assert_at_head(engine)
+    finally:
+        engine.dispose()
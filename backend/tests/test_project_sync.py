@@ -0,0 +1,55 @@
+import uuid
+
+
+def make_board(client):
+    """A project with two connected scenes; returns (project_id, scene ids, connection id)"""
+    project_id = client.post("/api/projects/", json={"title": "Sync"}).json()["id"]
+    scene_ids = [client.post("/api/scenes/", json={"project_id": project_id, "prompt_text": f"Scene {i}"}).json()["id"]
+                 for i in range(2)]
+    connection_id = client.post("/api/connections/", json={
+        "project_id": project_id, "from_scene_id": scene_ids[0], "to_scene_id": scene_ids[1],
+    }).json()["id"]
+    return project_id, scene_ids, connection_id
+
+
+def test_changes_since_a_revision_include_writes_and_tombstones(client):
+    project_id, (kept, deleted), connection_id = make_board(client)
+    since = client.get(f"/api/projects/{project_id}/changes").json()["revision"]
+
+    client.patch(f"/api/scenes/{kept}", json={"caption": "Opening"})
+    client.delete(f"/api/scenes/{deleted}")
+
+    changes = client.get(f"/api/projects/{project_id}/changes", params={"since": since}).json()
+    assert changes["revision"] == since + 2
+    assert [(scene["id"], scene["caption"]) for scene in changes["scenes"]] == [(kept, "Opening")]
+    assert changes["connections"] == []
+    assert sorted((item["entity_type"], item["entity_id"]) for item in changes["deleted"]) == [
+        ("connection", connection_id), ("scene", deleted),
+    ]
+    assert {item["revision"] for item in changes["deleted"]} == {since + 2}
+
+    # Caught up: nothing but the revision
+    caught_up = client.get(f"/api/projects/{project_id}/changes", params={"since": changes["revision"]}).json()
+    assert caught_up == {"revision": changes["revision"], "project": None, "scenes": [], "connections": [], "deleted": []}
+
+
+def test_changes_reject_unknown_projects_and_future_cursors(client):
+    project_id, _, _ = make_board(client)
+    revision = client.get(f"/api/projects/{project_id}/changes").json()["revision"]
+    assert client.get(f"/api/projects/{project_id}/changes", params={"since": revision + 1}).status_code == 409
+    assert client.get(f"/api/projects/{uuid.uuid4()}/changes").status_code == 404
+
+
+def test_snapshot_etag_answers_if_none_match_until_the_next_write(client):
+    project_id, (scene_id, _), _ = make_board(client)
+    first = client.get(f"/api/projects/{project_id}/full")
+    etag = first.headers["etag"]
+    not_modified = client.get(f"/api/projects/{project_id}/full", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+
+    client.patch(f"/api/scenes/{scene_id}", json={"caption": "Changed"})
+    changed = client.get(f"/api/projects/{project_id}/full", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert changed.json()["revision"] == first.json()["revision"] + 1
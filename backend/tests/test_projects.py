@@ -0,0 +1,75 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import insert
+from database import SessionLocal
+from models.project import Project
+from models.scene import Scene
+
+
+def make_projects(titles, updated_at):
+    """Projects with the given titles and updated_at values; returns their ids"""
+    rows = [{"id": str(uuid.uuid4()), "title": title, "updated_at": when, "revision": 0} for title, when in zip(titles, updated_at)]
+    db = SessionLocal()
+    try:
+        db.execute(insert(Project), rows)
+        db.commit()
+    finally:
+        db.close()
+    return [row["id"] for row in rows]
+
+
+def list_pages(client, params):
+    pages, cursor = [], None
+    while True:
+        response = client.get("/api/projects/", params={**params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200
+        pages.append(response.json())
+        cursor = response.headers.get("x-next-cursor")
+        if not cursor:
+            return pages
+
+
+def test_keyset_pages_have_no_duplicates_or_gaps(client):
+    token = uuid.uuid4().hex[:8]
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    # Ties on updated_at are broken by id
+    updated_at = [start, start, start, start + timedelta(milliseconds=1), start + timedelta(seconds=1),
+                  start + timedelta(seconds=1), start + timedelta(days=1)]
+    ids = make_projects([f"{token} {i}" for i in range(len(updated_at))], updated_at)
+
+    pages = list_pages(client, {"prefix": token, "limit": 3})
+    assert [len(page) for page in pages] == [3, 3, 1]
+    listed = [project["id"] for page in pages for project in page]
+    expected = [project_id for _, project_id in sorted(zip(updated_at, ids), reverse=True)]
+    assert listed == expected
+
+
+def test_a_page_is_stable_while_earlier_projects_change(client):
+    token = uuid.uuid4().hex[:8]
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    make_projects([f"{token} {i}" for i in range(4)], [start + timedelta(minutes=i) for i in range(4)])
+    first = client.get("/api/projects/", params={"prefix": token, "limit": 2})
+    # Touching a project on the first page moves it to the top, not onto the next page
+    client.put(f"/api/projects/{first.json()[1]['id']}", json={"title": f"{token} renamed"})
+    rest = client.get("/api/projects/", params={"prefix": token, "limit": 2, "cursor": first.headers["x-next-cursor"]}).json()
+    assert not {project["id"] for project in first.json()} & {project["id"] for project in rest}
+    assert len(rest) == 2
+
+
+def test_filters_stats_and_invalid_cursor(client):
+    token = uuid.uuid4().hex[:8]
+    project_id, _ = make_projects([f"{token} Harbor_100%", f"{token} harbor"], [datetime(2024, 1, 2, tzinfo=timezone.utc)] * 2)
+    db = SessionLocal()
+    try:
+        db.add(Scene(id=str(uuid.uuid4()), project_id=project_id, prompt_text="a", image_url="https://example.com/cover.png"))
+        db.commit()
+    finally:
+        db.close()
+
+    # LIKE wildcards in the query are matched literally
+    found = client.get("/api/projects/", params={"q": f"{token} harbor_100%", "include_stats": "true"}).json()
+    assert [(project["id"], project["scene_count"], project["connection_count"], project["cover_image_url"]) for project in found] == [
+        (project_id, 1, 0, "https://example.com/cover.png"),
+    ]
+    assert "scene_count" not in client.get("/api/projects/", params={"prefix": token}).json()[0]
+    assert client.get("/api/projects/", params={"cursor": "not-a-cursor"}).status_code == 400
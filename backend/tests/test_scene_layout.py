@@ -0,0 +1,90 @@
+import uuid
+from sqlalchemy import event, insert
+from database import SessionLocal, engine
+from models.project import Project
+from models.scene import Scene
+from utils.scene_layout import apply_layout_updates
+
+
+def make_projects(count: int):
+    """Projects with one scene each; returns [(project_id, scene_id)]"""
+    boards = [(str(uuid.uuid4()), str(uuid.uuid4())) for _ in range(count)]
+    db = SessionLocal()
+    try:
+        db.execute(insert(Project), [{"id": project_id, "title": "Layout", "revision": 0} for project_id, _ in boards])
+        db.execute(insert(Scene), [{"id": scene_id, "project_id": project_id, "prompt_text": "a", "x": 0.0, "y": 0.0, "revision": 0}
+                                   for project_id, scene_id in boards])
+        db.commit()
+    finally:
+        db.close()
+    return boards
+
+
+def test_projects_are_bumped_in_id_order(app):
+    boards = make_projects(4)
+    bumped = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("UPDATE projects"):
+            bumped.append(parameters[-1])
+
+    event.listen(engine, "before_cursor_execute", record)
+    db = SessionLocal()
+    try:
+        # Scenes listed in reverse project order
+        apply_layout_updates(db, {scene_id: {"x": 10.0} for _, scene_id in sorted(boards, reverse=True)})
+        db.commit()
+    finally:
+        db.close()
+        event.remove(engine, "before_cursor_execute", record)
+    assert bumped == sorted(project_id for project_id, _ in boards)
+
+
+def make_board(client, scenes: int = 3):
+    project_id = client.post("/api/projects/", json={"title": "Layout"}).json()["id"]
+    scene_ids = [client.post("/api/scenes/", json={"project_id": project_id, "prompt_text": f"Scene {i}", "x": 0, "y": 0}).json()["id"]
+                 for i in range(scenes)]
+    return project_id, scene_ids
+
+
+def project_revision(client, project_id: str) -> int:
+    return client.get(f"/api/projects/{project_id}/full").json()["revision"]
+
+
+def test_bulk_patch_bumps_the_revision_once_and_returns_changed_scenes(client):
+    project_id, (first, second, third) = make_board(client)
+    revision = project_revision(client, project_id)
+    response = client.patch("/api/scenes/bulk", json={"project_id": project_id, "scenes": [
+        {"id": first, "x": 100, "y": 50},
+        {"id": second, "width": 640},
+        {"id": third, "x": 0},  # unchanged
+    ]})
+    assert response.status_code == 200
+    changed = {scene["id"]: scene for scene in response.json()}
+    assert set(changed) == {first, second}
+    assert (changed[first]["x"], changed[first]["y"], changed[second]["width"]) == (100, 50, 640)
+    assert {scene["revision"] for scene in changed.values()} == {revision + 1}
+    assert project_revision(client, project_id) == revision + 1
+
+    # Nothing changed: no new revision
+    assert client.patch("/api/scenes/bulk", json={"scenes": [{"id": first, "x": 100}]}).json() == []
+    assert project_revision(client, project_id) == revision + 1
+
+
+def test_bulk_patch_rejects_unknown_and_foreign_scenes_without_writing(client):
+    project_id, (first, second, _) = make_board(client)
+    other_project_id, (other,) = make_board(client, 1)
+    revision = project_revision(client, project_id)
+
+    unknown = str(uuid.uuid4())
+    response = client.patch("/api/scenes/bulk", json={"scenes": [{"id": first, "x": 10}, {"id": unknown, "x": 10}]})
+    assert response.status_code == 404
+    assert unknown in response.json()["detail"]
+
+    response = client.patch("/api/scenes/bulk", json={"project_id": project_id, "scenes": [{"id": second, "x": 10}, {"id": other, "x": 10}]})
+    assert response.status_code == 400
+
+    scenes = client.get(f"/api/scenes/?project_id={project_id}").json()
+    assert all(scene["x"] == 0 for scene in scenes)
+    assert project_revision(client, project_id) == revision
+    assert project_revision(client, other_project_id) == 1
@@ -0,0 +1,73 @@
+import uuid
+from sqlalchemy import insert
+from database import SessionLocal
+from models.project import Project
+from models.scene import Scene
+from utils import scene_search
+
+
+def make_project(prompts):
+    """A project with one scene per (prompt, caption); returns its id and the scene ids in order"""
+    project_id = str(uuid.uuid4())
+    scenes = [{"id": str(uuid.uuid4()), "project_id": project_id, "prompt_text": prompt, "caption": caption, "revision": 0}
+              for prompt, caption in prompts]
+    db = SessionLocal()
+    try:
+        db.add(Project(id=project_id, title="Search"))
+        db.flush()
+        db.execute(insert(Scene), scenes)
+        db.commit()
+    finally:
+        db.close()
+    return project_id, [scene["id"] for scene in scenes]
+
+
+def search_pages(client, params):
+    pages, cursor = [], None
+    while True:
+        response = client.get("/api/search/scenes", params={**params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200
+        pages.append([result["id"] for result in response.json()])
+        cursor = response.headers.get("x-next-cursor")
+        if not cursor:
+            return pages
+
+
+def test_candidates_are_the_lowest_ids_on_every_page(client, monkeypatch):
+    monkeypatch.setattr(scene_search, "SEARCH_RANK_CANDIDATES", 5)
+    project_id, scene_ids = make_project([("lighthouse " * (i % 3 + 1), None) for i in range(12)])
+    params = {"q": "lighthouse", "project_id": project_id, "limit": 2}
+    pages = search_pages(client, params)
+    found = [scene_id for page in pages for scene_id in page]
+    assert sorted(found) == sorted(scene_ids)[:5]
+    assert search_pages(client, params) == pages
+
+
+def test_portable_search_ranks_prompt_matches_above_caption_matches(client):
+    project_id, (both_in_prompt, split, in_caption, _) = make_project([
+        ("The LIGHTHOUSE in a storm", None),
+        ("A lighthouse at dusk", "storm coming"),
+        ("Harbor", "Lighthouse, storm"),
+        ("A lighthouse", None),  # misses "storm"
+    ])
+    results = client.get("/api/search/scenes", params={"q": "lighthouse storm", "project_id": project_id}).json()
+    assert [(result["id"], result["score"]) for result in results] == [(both_in_prompt, 4.0), (split, 3.0), (in_caption, 2.0)]
+    assert {result["project_title"] for result in results} == {"Search"}
+
+
+def test_search_cursor_pages_through_every_result_once(client):
+    project_id, scene_ids = make_project([("storm " + "over the bay " * i, "storm" if i % 2 else None) for i in range(7)])
+    pages = search_pages(client, {"q": "storm", "project_id": project_id, "limit": 3})
+    assert [len(page) for page in pages] == [3, 3, 1]
+    found = [scene_id for page in pages for scene_id in page]
+    assert sorted(found) == sorted(scene_ids)
+    # Captioned scenes score higher, then ids break ties
+    with_caption = sorted(scene_ids[i] for i in range(7) if i % 2)
+    assert found == with_caption + sorted(set(scene_ids) - set(with_caption))
+
+
+def test_search_rejects_bad_cursors_and_unknown_projects(client):
+    assert client.get("/api/search/scenes", params={"q": "storm", "cursor": "nope"}).status_code == 400
+    assert client.get("/api/search/scenes", params={"q": "storm", "cursor": scene_search.encode_cursor(-1)}).status_code == 400
+    assert client.get("/api/search/scenes", params={"q": "storm", "project_id": str(uuid.uuid4())}).status_code == 404
+    assert client.get("/api/search/scenes", params={"q": "?!"}).json() == []
@@ -0,0 +1,73 @@
+import json
+import uuid
+from utils import shot_import
+
+
+def make_project(client) -> str:
+    return client.post("/api/projects/", json={"title": "Import"}).json()["id"]
+
+
+def jsonl(*rows) -> str:
+    return "\n".join(row if isinstance(row, str) else json.dumps(row) for row in rows) + "\n"
+
+
+def board(client, project_id):
+    return client.get(f"/api/projects/{project_id}/full").json()
+
+
+def test_jsonl_import_chains_shots_in_file_order(client):
+    project_id = make_project(client)
+    body = jsonl({"prompt_text": "Wide shot of the harbor"}, "", {"prompt": "Close on the keeper", "connection_label": "cut"},
+                 {"prompt_text": "The lamp", "caption": "Ending", "x": 5, "y": 7, "shot": 3})
+    response = client.post(f"/api/projects/{project_id}/import", content=body)
+    assert response.status_code == 200
+    result = response.json()
+    assert (result["scene_count"], result["connection_count"]) == (3, 2)
+
+    imported = board(client, project_id)
+    assert imported["revision"] == result["revision"]
+    scenes = imported["scenes"]
+    assert [scene["prompt_text"] for scene in scenes] == ["Wide shot of the harbor", "Close on the keeper", "The lamp"]
+    assert [(scene["x"], scene["y"]) for scene in scenes] == [(0.0, 0.0), (350.0, 0.0), (5.0, 7.0)]
+    chain = sorted((c["from_scene_id"], c["to_scene_id"], c["label"]) for c in imported["connections"])
+    assert chain == sorted([(scenes[0]["id"], scenes[1]["id"], "cut"), (scenes[1]["id"], scenes[2]["id"], None)])
+
+
+def test_csv_import_without_chaining(client):
+    project_id = make_project(client)
+    body = "prompt_text,caption,width\nFirst shot,,400\nSecond shot,Night,\n"
+    response = client.post(f"/api/projects/{project_id}/import", params={"chain": "false"}, content=body,
+                           headers={"Content-Type": "text/csv"})
+    assert response.status_code == 200
+    assert (response.json()["scene_count"], response.json()["connection_count"]) == (2, 0)
+    scenes = board(client, project_id)["scenes"]
+    assert [(scene["caption"], scene["width"]) for scene in scenes] == [(None, 400.0), ("Night", 300.0)]
+
+
+def test_invalid_rows_are_reported_by_line_and_nothing_is_imported(client, monkeypatch):
+    # Small batches, so valid rows before the bad ones have already been written
+    monkeypatch.setattr(shot_import, "IMPORT_BATCH_SIZE", 2)
+    project_id = make_project(client)
+    revision = board(client, project_id)["revision"]
+    body = jsonl({"prompt_text": "One"}, {"prompt_text": "Two"}, {"prompt_text": "Three"},
+                 "{not json", {"prompt_text": "   "}, {"prompt_text": "Six", "x": "left"})
+    response = client.post(f"/api/projects/{project_id}/import", content=body)
+    assert response.status_code == 422
+    errors = response.json()["detail"]["errors"]
+    assert [error["line"] for error in errors] == [4, 5, 6]
+    assert errors[0]["error"].startswith("invalid JSON")
+    assert "blank" in errors[1]["error"]
+    assert errors[2]["error"].startswith("x:")
+
+    after = board(client, project_id)
+    assert (after["scenes"], after["connections"], after["revision"]) == ([], [], revision)
+
+
+def test_import_limits_and_unknown_project(client, monkeypatch):
+    assert client.post(f"/api/projects/{uuid.uuid4()}/import", content=jsonl({"prompt_text": "a"})).status_code == 404
+    monkeypatch.setattr(shot_import, "IMPORT_MAX_ROWS", 2)
+    project_id = make_project(client)
+    response = client.post(f"/api/projects/{project_id}/import", content=jsonl(*({"prompt_text": str(i)} for i in range(3))))
+    assert response.status_code == 422
+    assert board(client, project_id)["scenes"] == []
+    assert client.post(f"/api/projects/{project_id}/import", content=b"\xff\xfe").status_code == 400
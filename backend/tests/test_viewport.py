@@ -0,0 +1,73 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+import pytest
+from sqlalchemy import insert
+from database import SessionLocal
+from models.project import Project
+from models.scene import Scene
+
+LONG_PROMPT = "The keeper climbs the spiral stair, lamp in hand, while the storm tears at the shutters of the old lighthouse"
+
+
+@pytest.fixture(scope="module")
+def board(client):
+    """A project with four scenes laid out as (name, x, y, width, height); returns (project id, {name: id})"""
+    project_id = str(uuid.uuid4())
+    layout = [("left", 0, 0, 100, 100), ("right", 200, 0, 100, 100), ("below", 0, 150, 100, 100), ("far", 5000, 5000, 50, 50)]
+    ids = {name: str(uuid.uuid4()) for name, *_ in layout}
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    db = SessionLocal()
+    try:
+        db.add(Project(id=project_id, title="Viewport"))
+        db.flush()
+        db.execute(insert(Scene), [{
+            "id": ids[name], "project_id": project_id, "prompt_text": LONG_PROMPT if name == "left" else name,
+            "caption": "Far away" if name == "far" else None, "image_url": f"https://example.com/{name}.png",
+            "thumbnails": {"webp": {"512": f"https://example.com/{name}_512.webp", "128": f"https://example.com/{name}_128.webp"}}
+            if name == "right" else None,
+            "x": x, "y": y, "width": width, "height": height, "created_at": start + timedelta(seconds=i), "revision": 1,
+        } for i, (name, x, y, width, height) in enumerate(layout)])
+        db.commit()
+    finally:
+        db.close()
+    return project_id, ids
+
+
+def scene_ids(client, project_id, **params):
+    response = client.get("/api/scenes/", params={"project_id": project_id, **params})
+    assert response.status_code == 200
+    return [scene["id"] for scene in response.json()]
+
+
+def test_bbox_returns_overlapping_scenes_oldest_first(client, board):
+    project_id, ids = board
+    assert scene_ids(client, project_id) == [ids["left"], ids["right"], ids["below"], ids["far"]]
+    assert scene_ids(client, project_id, bbox="50,50,250,60") == [ids["left"], ids["right"]]
+    assert scene_ids(client, project_id, bbox="4000,4000,6000,6000") == [ids["far"]]
+    assert scene_ids(client, project_id, bbox="120,110,180,140") == []
+
+
+def test_bbox_edges_count_as_overlapping(client, board):
+    project_id, ids = board
+    # x = 100 is the right edge of "left" and 200 the left edge of "right"
+    assert scene_ids(client, project_id, bbox="100,0,100,0") == [ids["left"]]
+    assert scene_ids(client, project_id, bbox="100,0,200,0") == [ids["left"], ids["right"]]
+    assert scene_ids(client, project_id, bbox="0,100,0,150") == [ids["left"], ids["below"]]
+
+
+def test_summary_detail(client, board):
+    project_id, ids = board
+    response = client.get("/api/scenes/", params={"project_id": project_id, "bbox": "0,0,300,100", "detail": "summary"})
+    left, right = response.json()
+    assert set(left) == {"id", "x", "y", "width", "height", "label", "thumbnail_url", "revision"}
+    assert (left["id"], left["x"], left["width"], left["revision"]) == (ids["left"], 0, 100, 1)
+    assert len(left["label"]) == 80 and left["label"].endswith("…") and LONG_PROMPT.startswith(left["label"][:-1])
+    assert left["thumbnail_url"] == "https://example.com/left.png"
+    assert (right["label"], right["thumbnail_url"]) == ("right", "https://example.com/right_128.webp")
+    far = client.get("/api/scenes/", params={"project_id": project_id, "bbox": "4000,4000,6000,6000", "detail": "summary"}).json()
+    assert far[0]["label"] == "Far away"
+
+
+@pytest.mark.parametrize("bbox", ["1,2,3", "a,b,c,d", "10,0,0,10", "0,0,inf,10"])
+def test_invalid_bbox_is_400(client, board, bbox):
+    assert client.get("/api/scenes/", params={"project_id": board[0], "bbox": bbox}).status_code == 400
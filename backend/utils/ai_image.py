@@ -1,42 +1,131 @@
-import openai
 import os
-import requests
+import io
+import base64
+import random
+import struct
+import zlib
+import time
+from typing import Callable, Dict, List, Optional
 from dotenv import load_dotenv
+from utils import clients
 
 load_dotenv()
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 STABILITY_API_KEY = os.getenv("STABILITY_API_KEY")
+# Set IMAGE_PROVIDER=stub to generate placeholder PNGs locally (dev/tests, no API keys needed)
+IMAGE_PROVIDER = os.getenv("IMAGE_PROVIDER", "").lower()
+# Comma separated providers to try in order, e.g. "openai,stability" (default: IMAGE_PROVIDER, then those with keys)
+IMAGE_PROVIDERS = os.getenv("IMAGE_PROVIDERS", "").lower()
+# Simulated provider latency for the stub provider (load tests), in milliseconds
+IMAGE_STUB_LATENCY_MS = float(os.getenv("IMAGE_STUB_LATENCY_MS", "0"))
+# Extra local providers as name=latency_ms[:error_rate[:slow_rate]], e.g. "flaky=300:0.2,laggy=300:0:0.05"
+IMAGE_FAKE_PROVIDERS = os.getenv("IMAGE_FAKE_PROVIDERS", "")
+# Longest a single provider call may take before it counts as a failure
+IMAGE_PROVIDER_TIMEOUT_SECONDS = float(os.getenv("IMAGE_PROVIDER_TIMEOUT_SECONDS", "90"))
+OPENAI_IMAGE_MODEL = os.getenv("OPENAI_IMAGE_MODEL", "dall-e-3")
+IMAGE_SIZE = os.getenv("IMAGE_SIZE", "1024x1024")
+IMAGE_QUALITY = os.getenv("IMAGE_QUALITY", "standard")
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "16"))
+# How long idle connections to the OpenAI API stay open for reuse
+HTTP_KEEPALIVE_SECONDS = float(os.getenv("HTTP_KEEPALIVE_SECONDS", "60"))
+DOWNLOAD_TIMEOUT_SECONDS = float(os.getenv("DOWNLOAD_TIMEOUT_SECONDS", "60"))
 
-def generate_image_with_openai(prompt: str) -> str:
+def _create_http_session():
+    import requests
+    from requests.adapters import HTTPAdapter
+    # Shared session so image downloads reuse pooled keep-alive connections
+    session = requests.Session()
+    session.mount("https://", HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE))
+    session.mount("http://", HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE))
+    return session
+
+def _create_openai_client():
+    import httpx
+    import openai
+    # The router does the retrying, so the client's own retries are off
+    return openai.OpenAI(
+        api_key=OPENAI_API_KEY,
+        max_retries=0,
+        http_client=httpx.Client(
+            timeout=IMAGE_PROVIDER_TIMEOUT_SECONDS,
+            limits=httpx.Limits(
+                max_connections=HTTP_POOL_SIZE, max_keepalive_connections=HTTP_POOL_SIZE, keepalive_expiry=HTTP_KEEPALIVE_SECONDS,
+            ),
+        ),
+    )
+
+_http_session = clients.register("http", _create_http_session, close=lambda session: session.close())
+# Only registered with a key, so warm-up doesn't import openai for nothing
+_openai_client = clients.register("openai", _create_openai_client, close=lambda client: client.close()) if OPENAI_API_KEY else None
+
+def get_http_session():
+    return _http_session.get()
+
+class ProviderError(Exception):
+    """A failed provider call; `retryable` errors (timeouts, 429s, 5xx) are worth trying again"""
+
+    def __init__(self, provider: str, message: str, retryable: bool = False, retry_after: Optional[float] = None):
+        super().__init__(f"{provider}: {message}")
+        self.provider = provider
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+class GeneratedImage:
+    """What a provider returned: a URL to fetch the image from, or the image bytes themselves"""
+
+    def __init__(self, provider: str, url: Optional[str] = None, data: Optional[bytes] = None, content_type: str = "image/png"):
+        self.provider = provider
+        self.url = url
+        self.data = data
+        self.content_type = content_type
+
+    def as_url(self) -> str:
+        """The image as a URL, inlining bytes as a data URL"""
+        if self.url is not None:
+            return self.url
+        return f"data:{self.content_type};base64,{base64.b64encode(self.data).decode('ascii')}"
+
+def _retry_after(headers) -> Optional[float]:
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+def generate_image_with_openai(prompt: str, timeout: float = IMAGE_PROVIDER_TIMEOUT_SECONDS) -> GeneratedImage:
     """Generate image using OpenAI DALL-E API"""
+    if _openai_client is None:
+        raise ProviderError("openai", "OPENAI_API_KEY not set")
+    client = _openai_client.get()
+    import openai
     try:
-        if not OPENAI_API_KEY:
-            raise Exception("OPENAI_API_KEY not set")
-        
-        client = openai.OpenAI(api_key=OPENAI_API_KEY)
-        response = client.images.generate(
-            model="dall-e-3",
+        response = client.with_options(timeout=timeout).images.generate(
+            model=OPENAI_IMAGE_MODEL,
             prompt=prompt,
-            size="1024x1024",
-            quality="standard",
+            size=IMAGE_SIZE,
+            quality=IMAGE_QUALITY,
             n=1,
         )
-        return response.data[0].url
+    except openai.RateLimitError as e:
+        raise ProviderError("openai", f"rate limited: {str(e)}", retryable=True, retry_after=_retry_after(e.response.headers))
+    except (openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError) as e:
+        raise ProviderError("openai", str(e), retryable=True)
     except Exception as e:
-        raise Exception(f"Failed to generate image: {str(e)}")
+        # Content policy rejections, bad keys and the like fail the same way every time
+        raise ProviderError("openai", str(e))
+    return GeneratedImage("openai", url=response.data[0].url)
 
-def generate_image_with_stability(prompt: str) -> str:
-    """Generate image using Stability AI API (free tier available)"""
+def generate_image_with_stability(prompt: str, timeout: float = IMAGE_PROVIDER_TIMEOUT_SECONDS) -> GeneratedImage:
+    """Generate image using Stability AI API (free tier available); the PNG comes back in the response body"""
+    if not STABILITY_API_KEY:
+        raise ProviderError("stability", "STABILITY_API_KEY not set")
+    session = get_http_session()
+    import requests
     try:
-        api_key = STABILITY_API_KEY
-        if not api_key:
-            raise Exception("STABILITY_API_KEY not set")
-        
-        response = requests.post(
+        response = session.post(
             "https://api.stability.ai/v2beta/stable-image/generate/core",
             headers={
-                "Authorization": f"Bearer {api_key}",
+                "Authorization": f"Bearer {STABILITY_API_KEY}",
                 "Accept": "image/*"
             },
             files={"none": ""},
@@ -44,43 +133,162 @@ def generate_image_with_stability(prompt: str) -> str:
                 "prompt": prompt,
                 "output_format": "png",
                 "aspect_ratio": "1:1"
-            }
+            },
+            timeout=timeout,
         )
-        
-        if response.status_code != 200:
-            raise Exception(f"Stability API error: {response.status_code} - {response.text}")
-        
-        # Save to temporary location or return as data URL
-        # For now, we'll need to upload it somewhere or return base64
-        # This is a simplified version - you may need to adjust based on Stability API response
-        raise Exception("Stability AI integration needs completion - use OpenAI for now")
-    except Exception as e:
-        raise Exception(f"Failed to generate image with Stability AI: {str(e)}")
-
-def generate_image(prompt: str) -> str:
-    """Generate image using available service (OpenAI or Stability AI)"""
-    # Try OpenAI first if key is available
-    if OPENAI_API_KEY:
-        try:
-            return generate_image_with_openai(prompt)
-        except Exception as e:
-            print(f"OpenAI failed: {e}")
-    
-    # Fallback to Stability AI if configured
-    if STABILITY_API_KEY:
-        try:
-            return generate_image_with_stability(prompt)
-        except Exception as e:
-            print(f"Stability AI failed: {e}")
-    
-    raise Exception("No image generation service configured. Set OPENAI_API_KEY or STABILITY_API_KEY")
+    except (requests.Timeout, requests.ConnectionError) as e:
+        raise ProviderError("stability", str(e), retryable=True)
+    if response.status_code != 200:
+        raise ProviderError(
+            "stability", f"API error: {response.status_code} - {response.text[:200]}",
+            retryable=response.status_code == 429 or response.status_code >= 500,
+            retry_after=_retry_after(response.headers),
+        )
+    return GeneratedImage("stability", data=response.content, content_type=response.headers.get("Content-Type", "image/png"))
+
+def _stub_png(prompt: str, size: int = 64) -> bytes:
+    """Build a small solid-colour PNG whose colour is derived from the prompt"""
+    digest = zlib.crc32(prompt.encode("utf-8"))
+    pixel = bytes([(digest >> 16) & 0xFF, (digest >> 8) & 0xFF, digest & 0xFF])
+    raw = b"".join(b"\x00" + pixel * size for _ in range(size))
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+
+    header = struct.pack(">IIBBBBB", size, size, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(raw)) + chunk(b"IEND", b"")
+
+class FakeProvider:
+    """A local provider that makes placeholder PNGs after a delay and fails some of the time
+
+    The stub provider is one with no failures; IMAGE_FAKE_PROVIDERS adds more,
+    so retries, breakers and hedging can be exercised without API keys.
+    """
+
+    def __init__(self, name: str, latency_ms: float = 0.0, error_rate: float = 0.0, slow_rate: float = 0.0):
+        self.name = name
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.slow_rate = slow_rate
+
+    def __call__(self, prompt: str, timeout: float = IMAGE_PROVIDER_TIMEOUT_SECONDS) -> GeneratedImage:
+        # Latency varies by +/-50% around the configured value, and slow_rate of calls take 10x as long
+        delay = self.latency_ms / 1000 * random.uniform(0.5, 1.5)
+        if self.slow_rate and random.random() < self.slow_rate:
+            delay *= 10
+        if delay > timeout:
+            time.sleep(timeout)
+            raise ProviderError(self.name, f"timed out after {timeout:.1f}s", retryable=True)
+        if delay > 0:
+            time.sleep(delay)
+        if self.error_rate and random.random() < self.error_rate:
+            raise ProviderError(self.name, "simulated 503", retryable=True)
+        return GeneratedImage(self.name, data=_stub_png(prompt))
+
+def _parse_fake_providers(spec: str) -> Dict[str, FakeProvider]:
+    providers = {}
+    for part in spec.split(","):
+        if "=" in part:
+            name, settings = part.split("=", 1)
+            values = [float(value or 0) for value in settings.split(":")[:3]]
+            providers[name.strip().lower()] = FakeProvider(name.strip().lower(), *values)
+    return providers
+
+generate_image_with_stub = FakeProvider("stub", IMAGE_STUB_LATENCY_MS)
+
+PROVIDERS: Dict[str, Callable[..., GeneratedImage]] = {
+    "openai": generate_image_with_openai,
+    "stability": generate_image_with_stability,
+    "stub": generate_image_with_stub,
+    **_parse_fake_providers(IMAGE_FAKE_PROVIDERS),
+}
+
+def get_provider_order(preferred: Optional[str] = None) -> List[str]:
+    """Providers to try for a generation, most preferred first"""
+    if IMAGE_PROVIDERS:
+        names = IMAGE_PROVIDERS.split(",")
+    elif isinstance(PROVIDERS.get(IMAGE_PROVIDER), FakeProvider):
+        # A local provider is used on its own, never falling back to a paid one
+        names = [IMAGE_PROVIDER]
+    else:
+        names = [IMAGE_PROVIDER] + [name for name, key in (("openai", OPENAI_API_KEY), ("stability", STABILITY_API_KEY)) if key]
+    order = []
+    for name in [preferred or ""] + [name.strip() for name in names]:
+        if name in PROVIDERS and name not in order:
+            order.append(name)
+    return order
+
+def get_active_provider() -> str:
+    """Return the name of the provider generate_image will try first"""
+    order = get_provider_order()
+    return order[0] if order else "none"
+
+def get_generation_params(provider: str) -> dict:
+    """Return the settings that determine what image a provider produces for a prompt"""
+    if isinstance(PROVIDERS.get(provider), FakeProvider):
+        return {"provider": provider, "model": "stub", "size": "64x64", "quality": "standard"}
+    if provider == "stability":
+        return {"provider": "stability", "model": "stable-image-core", "size": "1:1", "quality": "standard"}
+    return {"provider": provider, "model": OPENAI_IMAGE_MODEL, "size": IMAGE_SIZE, "quality": IMAGE_QUALITY}
 
 def download_image(url: str) -> bytes:
     """Download image from URL and return as bytes"""
     try:
-        response = requests.get(url)
+        if url.startswith("data:"):
+            # Inline images (e.g. from the stub provider) carry their own bytes
+            return base64.b64decode(url.split(",", 1)[1])
+        response = get_http_session().get(url, timeout=DOWNLOAD_TIMEOUT_SECONDS)
         response.raise_for_status()
         return response.content
     except Exception as e:
         raise Exception(f"Failed to download image: {str(e)}")
 
+class _ResponseStream(io.RawIOBase):
+    """Readable view of a streamed response that hands its connection back to the pool on close"""
+
+    def __init__(self, response: "requests.Response"):
+        self._response = response
+        self._exhausted = False
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._response.raw.read(None if size is None or size < 0 else size)
+        if not data:
+            self._exhausted = True
+        return data
+
+    def readinto(self, buffer) -> int:
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            if self._exhausted:
+                self._response.raw.release_conn()
+            else:
+                # Abandoned mid-body: the connection can't be reused
+                self._response.close()
+        super().close()
+
+def open_image_stream(url: str):
+    """Open an image URL for streaming and return (file-like object, content type)
+
+    The caller must close the returned object. Nothing is buffered beyond what
+    the reader asks for, so large images never have to fit in memory at once.
+    """
+    try:
+        if url.startswith("data:"):
+            header, encoded = url.split(",", 1)
+            content_type = header[len("data:"):].split(";")[0] or "image/png"
+            return io.BytesIO(base64.b64decode(encoded)), content_type
+        response = get_http_session().get(url, stream=True, timeout=DOWNLOAD_TIMEOUT_SECONDS)
+        response.raise_for_status()
+        # Let urllib3 undo any transfer encoding (gzip etc.) as we read
+        response.raw.decode_content = True
+        return _ResponseStream(response), response.headers.get("Content-Type", "image/png")
+    except Exception as e:
+        raise Exception(f"Failed to download image: {str(e)}")
+
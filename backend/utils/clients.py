@@ -0,0 +1,94 @@
+"""Process-wide network clients, built on first use
+
+The S3, OpenAI and image download clients are expensive to import and
+construct (boto3 and openai alone take over a second to import), so modules
+register a factory here instead of building them at import time. Each client
+is created once, under a lock, and then shared by every thread so its
+connection pool and keep-alive connections are reused. main.py warms the
+registry up in the background on startup and closes it on shutdown.
+"""
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Build clients in a background thread when the app starts, so the first request doesn't pay for it
+CLIENT_WARMUP = os.getenv("CLIENT_WARMUP", "true").lower() == "true"
+
+
+class LazyClient:
+    """A client built by `factory` the first time it is needed"""
+
+    def __init__(self, name: str, factory: Callable[[], object], close: Optional[Callable[[object], None]] = None):
+        self.name = name
+        self._factory = factory
+        self._close = close
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def built(self) -> bool:
+        return self._client is not None
+
+    def get(self):
+        client = self._client
+        if client is None:
+            with self._lock:
+                if self._client is None:
+                    started = time.perf_counter()
+                    self._client = self._factory()
+                    print(f"🔌 Created {self.name} client in {(time.perf_counter() - started) * 1000:.0f} ms")
+                client = self._client
+        return client
+
+    def close(self):
+        with self._lock:
+            client, self._client = self._client, None
+        if client is not None and self._close is not None:
+            try:
+                self._close(client)
+            except Exception as e:
+                print(f"⚠️  WARNING: Failed to close {self.name} client: {str(e)}")
+
+
+_registry: Dict[str, LazyClient] = {}
+_registry_lock = threading.Lock()
+
+
+def register(name: str, factory: Callable[[], object], close: Optional[Callable[[object], None]] = None) -> LazyClient:
+    """Register a client factory; returns the LazyClient to call `.get()` on"""
+    with _registry_lock:
+        if name not in _registry:
+            _registry[name] = LazyClient(name, factory, close)
+        return _registry[name]
+
+
+def warm_up():
+    """Build every registered client that isn't built yet, logging rather than raising failures"""
+    with _registry_lock:
+        lazy_clients = list(_registry.values())
+    for lazy_client in lazy_clients:
+        try:
+            lazy_client.get()
+        except Exception as e:
+            print(f"⚠️  WARNING: Failed to create {lazy_client.name} client: {str(e)}")
+
+
+def start_warm_up() -> Optional[threading.Thread]:
+    """warm_up() on a daemon thread, if CLIENT_WARMUP is on"""
+    if not CLIENT_WARMUP:
+        return None
+    thread = threading.Thread(target=warm_up, name="client-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def close_all():
+    """Close every built client and its pooled connections"""
+    with _registry_lock:
+        lazy_clients = list(_registry.values())
+    for lazy_client in lazy_clients:
+        lazy_client.close()
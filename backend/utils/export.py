@@ -0,0 +1,296 @@
+import io
+import json
+import os
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+from dotenv import load_dotenv
+from PIL import Image
+from utils.ai_image import download_image
+from utils.s3 import get_s3_client, BUCKET_NAME, key_for_url
+
+load_dotenv()
+
+# Threads shared by all exports for fetching and re-encoding images
+EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", "8"))
+# Images fetched ahead of the writer per export; bounds an export's memory to this many images
+EXPORT_PREFETCH = int(os.getenv("EXPORT_PREFETCH", "8"))
+# Longest side in pixels of images placed on PDF pages (512 is ~150 dpi at contact sheet size)
+EXPORT_PDF_IMAGE_SIZE = int(os.getenv("EXPORT_PDF_IMAGE_SIZE", "512"))
+EXPORT_JPEG_QUALITY = int(os.getenv("EXPORT_JPEG_QUALITY", "80"))
+
+# US Letter landscape, in points
+PAGE_WIDTH, PAGE_HEIGHT = 792, 612
+MARGIN = 36
+COLUMNS, ROWS = 3, 2
+GUTTER = 18
+HEADER_HEIGHT = 24
+CAPTION_HEIGHT = 34
+
+EXTENSIONS = {"image/png": ".png", "image/jpeg": ".jpg", "image/webp": ".webp", "image/avif": ".avif", "image/gif": ".gif"}
+
+_executor = ThreadPoolExecutor(max_workers=EXPORT_WORKERS, thread_name_prefix="export")
+
+
+def fetch_image(url: str) -> bytes:
+    """Bytes of a scene image, straight from the bucket when it is ours"""
+    s3_key = key_for_url(url)
+    if s3_key is None:
+        return download_image(url)
+    response = get_s3_client().get_object(Bucket=BUCKET_NAME, Key=s3_key)
+    try:
+        return response["Body"].read()
+    finally:
+        response["Body"].close()
+
+
+def prefetch(items: Iterable, fn: Callable) -> Iterator:
+    """fn(item) for each item, in order, with up to EXPORT_PREFETCH calls running ahead"""
+    pending = deque()
+    try:
+        for item in items:
+            pending.append(_executor.submit(fn, item))
+            if len(pending) >= EXPORT_PREFETCH:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        # Client went away mid-download: don't fetch the rest
+        for future in pending:
+            future.cancel()
+
+
+def _image_extension(url: str) -> str:
+    if url.startswith("data:"):
+        return EXTENSIONS.get(url[len("data:"):].split(";")[0], ".png")
+    extension = os.path.splitext(url.split("?")[0])[1].lower()
+    return extension if extension in EXTENSIONS.values() or extension == ".jpeg" else ".png"
+
+
+def _safe(fn: Callable) -> Callable:
+    """Wrap a per-scene fetch so one broken image becomes (None, error) instead of ending the export"""
+    def run(scene: dict):
+        if not scene.get("image_url"):
+            return None, None
+        try:
+            return fn(scene), None
+        except Exception as e:
+            print(f"⚠️  WARNING: Export could not fetch image for scene {scene['id']}: {str(e)}")
+            return None, str(e)
+    return run
+
+
+# --- PDF contact sheets ---
+
+def _pdf_source_url(scene: dict) -> str:
+    """Smallest stored thumbnail that is still big enough for the page, else the original"""
+    thumbnails = (scene.get("thumbnails") or {}).get("webp") or {}
+    widths = sorted(int(width) for width in thumbnails if int(width) >= EXPORT_PDF_IMAGE_SIZE)
+    return thumbnails[str(widths[0])] if widths else scene["image_url"]
+
+
+def _pdf_image(scene: dict) -> Tuple[bytes, int, int]:
+    """Downscaled JPEG (data, width, height) of a scene image for a PDF page"""
+    with Image.open(io.BytesIO(fetch_image(_pdf_source_url(scene)))) as image:
+        # JPEG originals decode straight at reduced scale
+        image.draft("RGB", (EXPORT_PDF_IMAGE_SIZE, EXPORT_PDF_IMAGE_SIZE))
+        if image.mode in ("RGBA", "LA", "P"):
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, "white")
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+        elif image.mode != "RGB":
+            image = image.convert("RGB")
+        image.thumbnail((EXPORT_PDF_IMAGE_SIZE, EXPORT_PDF_IMAGE_SIZE), Image.Resampling.LANCZOS)
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=EXPORT_JPEG_QUALITY)
+        return buffer.getvalue(), image.width, image.height
+
+
+def _pdf_text(text: str) -> bytes:
+    """A PDF string literal for Helvetica (WinAnsi), with unsupported characters as '?'"""
+    data = " ".join(text.split()).encode("cp1252", "replace")
+    return b"(" + data.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+
+def _fit(text: str, width: float, size: float) -> str:
+    # Helvetica averages about half an em per character
+    limit = max(4, int(width / (size * 0.5)))
+    return text if len(text) <= limit else text[:limit - 1].rstrip() + "…"
+
+
+class PdfWriter:
+    """Writes a PDF front to back
+
+    Each page goes out as soon as it is added; only the object offsets are
+    kept until the page tree, xref table and trailer are written at the end.
+    """
+
+    CATALOG, PAGES, FONT = 1, 2, 3
+
+    def __init__(self):
+        self.offsets = {}
+        self.position = 0
+        self.next_id = 4
+        self.page_ids: List[int] = []
+
+    def _allocate(self) -> int:
+        self.next_id += 1
+        return self.next_id - 1
+
+    def _object(self, number: int, body: bytes) -> bytes:
+        data = b"%d 0 obj\n%s\nendobj\n" % (number, body)
+        self.offsets[number] = self.position
+        self.position += len(data)
+        return data
+
+    def _stream(self, number: int, dictionary: bytes, data: bytes) -> bytes:
+        return self._object(number, b"<<%s/Length %d>>\nstream\n%s\nendstream" % (dictionary, len(data), data))
+
+    def start(self) -> bytes:
+        header = b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n"
+        self.position = len(header)
+        return header + self._object(self.FONT, b"<</Type/Font/Subtype/Type1/BaseFont/Helvetica/Encoding/WinAnsiEncoding>>")
+
+    def page(self, content: bytes, images: List[Tuple[bytes, int, int]]) -> bytes:
+        chunks, names = [], []
+        for number, (data, width, height) in enumerate(images):
+            image_id = self._allocate()
+            names.append(b"/Im%d %d 0 R" % (number, image_id))
+            chunks.append(self._stream(
+                image_id,
+                b"/Type/XObject/Subtype/Image/Width %d/Height %d/ColorSpace/DeviceRGB/BitsPerComponent 8/Filter/DCTDecode" % (width, height),
+                data,
+            ))
+        content_id = self._allocate()
+        chunks.append(self._stream(content_id, b"", content))
+        page_id = self._allocate()
+        self.page_ids.append(page_id)
+        chunks.append(self._object(page_id, (
+            b"<</Type/Page/Parent %d 0 R/MediaBox[0 0 %d %d]/Contents %d 0 R"
+            b"/Resources<</Font<</F1 %d 0 R>>/XObject<<%s>>>>>>"
+        ) % (self.PAGES, PAGE_WIDTH, PAGE_HEIGHT, content_id, self.FONT, b"".join(names))))
+        return b"".join(chunks)
+
+    def finish(self, title: str) -> bytes:
+        kids = b" ".join(b"%d 0 R" % page_id for page_id in self.page_ids)
+        chunks = [
+            self._object(self.PAGES, b"<</Type/Pages/Kids[%s]/Count %d>>" % (kids, len(self.page_ids))),
+            self._object(self.CATALOG, b"<</Type/Catalog/Pages %d 0 R>>" % self.PAGES),
+        ]
+        info_id = self._allocate()
+        chunks.append(self._object(info_id, b"<</Title%s/Producer(Storyboard API)>>" % _pdf_text(title)))
+        xref_offset = self.position
+        entries = [b"0000000000 65535 f \n"] + [b"%010d 00000 n \n" % self.offsets[number] for number in range(1, self.next_id)]
+        chunks.append(b"xref\n0 %d\n%s" % (self.next_id, b"".join(entries)))
+        chunks.append(b"trailer\n<</Size %d/Root %d 0 R/Info %d 0 R>>\nstartxref\n%d\n%%%%EOF\n" % (self.next_id, self.CATALOG, info_id, xref_offset))
+        return b"".join(chunks)
+
+
+def _page_content(title: str, page_number: int, page_count: int, cells: List[Tuple[int, dict, Optional[Tuple[bytes, int, int]], Optional[str]]]) -> Tuple[bytes, List]:
+    """Content stream and images for one contact sheet page of (number, scene, image, error) cells"""
+    cell_width = (PAGE_WIDTH - 2 * MARGIN - (COLUMNS - 1) * GUTTER) / COLUMNS
+    cell_height = (PAGE_HEIGHT - 2 * MARGIN - HEADER_HEIGHT - (ROWS - 1) * GUTTER) / ROWS
+    box_height = cell_height - CAPTION_HEIGHT
+    ops = [
+        b"BT /F1 14 Tf %d %d Td %s Tj ET" % (MARGIN, PAGE_HEIGHT - MARGIN - 14, _pdf_text(_fit(title, PAGE_WIDTH / 2, 14))),
+        b"BT /F1 9 Tf %d %d Td %s Tj ET" % (PAGE_WIDTH - MARGIN - 60, PAGE_HEIGHT - MARGIN - 14, _pdf_text(f"Page {page_number} of {page_count}")),
+    ]
+    images = []
+    for slot, (number, scene, image, error) in enumerate(cells):
+        left = MARGIN + (slot % COLUMNS) * (cell_width + GUTTER)
+        top = PAGE_HEIGHT - MARGIN - HEADER_HEIGHT - (slot // COLUMNS) * (cell_height + GUTTER)
+        box_bottom = top - box_height
+        if image is not None:
+            _, width, height = image
+            scale = min(cell_width / width, box_height / height)
+            draw_width, draw_height = width * scale, height * scale
+            x = left + (cell_width - draw_width) / 2
+            y = box_bottom + (box_height - draw_height) / 2
+            ops.append(b"q %.2f 0 0 %.2f %.2f %.2f cm /Im%d Do Q" % (draw_width, draw_height, x, y, len(images)))
+            images.append(image)
+        else:
+            label = "Image unavailable" if error else "No image"
+            ops.append(b"q 0.92 g %.2f %.2f %.2f %.2f re f Q" % (left, box_bottom, cell_width, box_height))
+            ops.append(b"q 0.5 g BT /F1 10 Tf %.2f %.2f Td %s Tj ET Q" % (left + 8, box_bottom + box_height / 2, _pdf_text(label)))
+        caption = scene.get("caption") or scene.get("prompt_text") or ""
+        ops.append(b"BT /F1 10 Tf %.2f %.2f Td %s Tj ET" % (left, box_bottom - 13, _pdf_text(f"{number}.")))
+        ops.append(b"BT /F1 9 Tf %.2f %.2f Td %s Tj ET" % (left + 20, box_bottom - 13, _pdf_text(_fit(caption, cell_width - 20, 9))))
+        if scene.get("caption") and scene.get("prompt_text"):
+            ops.append(b"q 0.4 g BT /F1 7 Tf %.2f %.2f Td %s Tj ET Q" % (left + 20, box_bottom - 25, _pdf_text(_fit(scene["prompt_text"], cell_width - 20, 7))))
+    return b"\n".join(ops), images
+
+
+def stream_pdf(project: dict, scenes: List[dict]) -> Iterator[bytes]:
+    """Contact sheet PDF of scenes in the given order, COLUMNS x ROWS per page, yielded page by page"""
+    per_page = COLUMNS * ROWS
+    page_count = max(1, -(-len(scenes) // per_page))
+    writer = PdfWriter()
+    yield writer.start()
+    cells = []
+    for number, (scene, (image, error)) in enumerate(zip(scenes, prefetch(scenes, _safe(_pdf_image))), start=1):
+        cells.append((number, scene, image, error))
+        if len(cells) == per_page:
+            yield writer.page(*_page_content(project["title"], len(writer.page_ids) + 1, page_count, cells))
+            cells = []
+    if cells or not writer.page_ids:
+        yield writer.page(*_page_content(project["title"], len(writer.page_ids) + 1, page_count, cells))
+    yield writer.finish(project["title"])
+
+
+# --- ZIP of originals ---
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that buffers what zipfile writes until it is taken
+
+    It can't seek, so zipfile writes sizes in data descriptors after each
+    entry instead of going back to patch headers.
+    """
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_zip(project: dict, scenes: List[dict], connections: List[dict]) -> Iterator[bytes]:
+    """ZIP of original scene images in the given order plus manifest.json, yielded entry by entry"""
+    sink = _ChunkSink()
+    archive = zipfile.ZipFile(sink, "w", zipfile.ZIP_STORED)
+    now = datetime.now().timetuple()[:6]
+    manifest_scenes = []
+    for number, (scene, (data, error)) in enumerate(zip(scenes, prefetch(scenes, _safe(lambda s: fetch_image(s["image_url"])))), start=1):
+        entry = {"number": number, **scene, "file": None}
+        if data is not None:
+            entry["file"] = f"images/{number:04d}-{scene['id']}{_image_extension(scene['image_url'])}"
+            # Images are already compressed; storing them keeps the export I/O-bound
+            archive.writestr(zipfile.ZipInfo(entry["file"], now), data)
+            yield sink.take()
+        elif error:
+            entry["error"] = error
+        manifest_scenes.append(entry)
+    manifest = {"project": project, "scenes": manifest_scenes, "connections": connections}
+    archive.writestr(zipfile.ZipInfo("manifest.json", now), json.dumps(manifest, indent=2), compress_type=zipfile.ZIP_DEFLATED)
+    archive.close()
+    yield sink.take()
+
+
+def shutdown():
+    _executor.shutdown(wait=False, cancel_futures=True)
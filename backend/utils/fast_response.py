@@ -0,0 +1,149 @@
+"""Fast path for large list and snapshot responses
+
+By default FastAPI validates every row of a list through the route's pydantic
+response_model and encodes the result with the stdlib json module; on a large
+board that costs more than the query. With FAST_RESPONSES on, list routes read
+plain column rows instead, shape them into dicts in the response model's field
+order (datetimes as isoformat(), as the models' serializers do) and encode them
+with orjson. The JSON is byte-identical to the default path: when a float would
+be written differently by orjson (exponent notation, NaN) the response goes
+through the stdlib encoder instead.
+
+Clients that send `Accept: application/msgpack` get MessagePack, with or
+without FAST_RESPONSES, if the msgpack package is installed.
+"""
+import json
+import os
+import typing
+from datetime import datetime
+from functools import lru_cache
+from typing import Iterable, List, Mapping, Optional, Tuple, Type
+from dotenv import load_dotenv
+from fastapi import Request, Response
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # stdlib json writes the same bytes, only slower
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # clients asking for MessagePack get JSON
+    msgpack = None
+
+load_dotenv()
+
+# Serve list responses from plain rows encoded with orjson instead of validating each row with pydantic
+FAST_RESPONSES = os.getenv("FAST_RESPONSES", "false").lower() == "true"
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+
+# Python writes floats outside this range in exponent notation differently from orjson (1e+16 vs 1e16)
+PLAIN_FLOAT_MIN, PLAIN_FLOAT_MAX = 1e-4, 1e16
+
+
+def wants_msgpack(request: Request) -> bool:
+    """Whether the Accept header asks for MessagePack (and we can produce it)"""
+    if msgpack is None:
+        return False
+    for item in request.headers.get("accept", "").split(","):
+        media_type, _, params = item.partition(";")
+        if media_type.strip().lower() in MSGPACK_MEDIA_TYPES:
+            return params.replace(" ", "") not in ("q=0", "q=0.0")
+    return False
+
+
+def use_fast_path(request: Request) -> bool:
+    return FAST_RESPONSES or wants_msgpack(request)
+
+
+def _is(annotation, kind) -> bool:
+    return annotation is kind or kind in typing.get_args(annotation)
+
+
+@lru_cache(maxsize=None)
+def _model_shape(model: Type[BaseModel]) -> Tuple[Tuple[str, ...], Tuple[str, ...], Tuple[str, ...]]:
+    """(field names in order, datetime fields, float fields) of a response model"""
+    fields = model.model_fields
+    return (
+        tuple(fields),
+        tuple(name for name, field in fields.items() if _is(field.annotation, datetime)),
+        tuple(name for name, field in fields.items() if _is(field.annotation, float)),
+    )
+
+
+def model_columns(model: Type[BaseModel], table) -> list:
+    """The table's columns for each field of a response model, to select rows for shape_rows"""
+    return [table.c[name] for name in _model_shape(model)[0] if name in table.c]
+
+
+def _plain_float(value) -> bool:
+    return value == 0 or PLAIN_FLOAT_MIN <= abs(value) < PLAIN_FLOAT_MAX
+
+
+def shape_rows(model: Type[BaseModel], rows: Iterable[Mapping]) -> Tuple[List[dict], bool]:
+    """Rows as dicts the way `model` would serialize them, without validating them
+
+    Only the model's fields present in the rows are kept, as with
+    response_model_exclude_unset. Also returns whether every float can be
+    written by orjson exactly as the stdlib encoder would.
+    """
+    fields, datetime_fields, float_fields = _model_shape(model)
+    items, plain = [], True
+    keys = None
+    for row in rows:
+        if keys is None:
+            keys = [name for name in fields if name in row]
+            datetime_keys = [name for name in datetime_fields if name in row]
+            float_keys = [name for name in float_fields if name in row]
+        item = {name: row[name] for name in keys}
+        for name in datetime_keys:
+            value = item[name]
+            if value is not None:
+                item[name] = value.isoformat()
+        for name in float_keys:
+            value = item[name]
+            if value is None:
+                continue
+            if type(value) is not float:
+                # pydantic writes ints in float fields as floats
+                value = item[name] = float(value)
+            if plain and not _plain_float(value):
+                plain = False
+        items.append(item)
+    return items, plain
+
+
+def dumps_json(content, plain_floats: bool = True) -> bytes:
+    """The bytes FastAPI's JSONResponse would send; orjson unless a float would come out differently"""
+    if orjson is not None and plain_floats:
+        try:
+            return orjson.dumps(content)
+        except (orjson.JSONEncodeError, TypeError):
+            pass
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def dumps_msgpack(content) -> bytes:
+    return msgpack.packb(content, use_bin_type=True)
+
+
+def render(request: Request, content, plain_floats: bool = True, headers: Optional[Mapping[str, str]] = None) -> Response:
+    """MessagePack if the client asked for it, else JSON"""
+    headers = {**(headers or {}), "Vary": "Accept"}
+    if wants_msgpack(request):
+        return Response(content=dumps_msgpack(content), media_type=MSGPACK_MEDIA_TYPES[0], headers=headers)
+    return Response(content=dumps_json(content, plain_floats), media_type=JSON_MEDIA_TYPE, headers=headers)
+
+
+def render_rows(request: Request, model: Type[BaseModel], rows: Iterable[Mapping], headers: Optional[Mapping[str, str]] = None) -> Response:
+    """A list response of `model` built straight from rows"""
+    items, plain_floats = shape_rows(model, rows)
+    return render(request, items, plain_floats, headers)
+
+
+def json_to_msgpack(body: bytes) -> bytes:
+    """Re-encode a JSON document (e.g. a cached snapshot) as MessagePack"""
+    return dumps_msgpack(orjson.loads(body) if orjson is not None else json.loads(body))
@@ -0,0 +1,111 @@
+import hashlib
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from dotenv import load_dotenv
+from database import SessionLocal
+from models.image_cache import ImageCacheEntry
+
+load_dotenv()
+
+IMAGE_CACHE_ENABLED = os.getenv("IMAGE_CACHE_ENABLED", "true").lower() == "true"
+# Entries older than this are treated as misses (0 disables expiry)
+IMAGE_CACHE_TTL_SECONDS = int(os.getenv("IMAGE_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+# Least recently used entries beyond this count are evicted (0 disables the limit)
+IMAGE_CACHE_MAX_ENTRIES = int(os.getenv("IMAGE_CACHE_MAX_ENTRIES", "10000"))
+
+_stats = {"hits": 0, "misses": 0, "bypasses": 0, "stores": 0, "evictions": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(name: str, amount: int = 1):
+    with _stats_lock:
+        _stats[name] += amount
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapse whitespace and case so trivially different prompts share an entry"""
+    return " ".join(prompt.split()).casefold()
+
+
+def cache_key(provider: str, model: str, size: str, quality: str, prompt: str) -> str:
+    """Content address for a generation request"""
+    material = "\x1f".join([provider, model, size, quality, normalize_prompt(prompt)])
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def _is_expired(entry: ImageCacheEntry, now: datetime) -> bool:
+    if not IMAGE_CACHE_TTL_SECONDS or entry.created_at is None:
+        return False
+    created_at = entry.created_at
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    return now - created_at > timedelta(seconds=IMAGE_CACHE_TTL_SECONDS)
+
+
+def lookup(key: str) -> Optional[str]:
+    """Return the cached image URL for key, or None on a miss"""
+    db = SessionLocal()
+    try:
+        entry = db.query(ImageCacheEntry).filter(ImageCacheEntry.key == key).first()
+        now = datetime.now(timezone.utc)
+        if entry is None or _is_expired(entry, now):
+            if entry is not None:
+                db.delete(entry)
+                db.commit()
+                _count("evictions")
+            _count("misses")
+            return None
+        entry.hit_count = (entry.hit_count or 0) + 1
+        entry.last_used_at = now
+        db.commit()
+        _count("hits")
+        return entry.image_url
+    finally:
+        db.close()
+
+
+def store(key: str, params: dict, prompt: str, s3_key: str, image_url: str):
+    """Record an uploaded image for key and evict least recently used entries over the limit"""
+    db = SessionLocal()
+    try:
+        now = datetime.now(timezone.utc)
+        entry = db.query(ImageCacheEntry).filter(ImageCacheEntry.key == key).first()
+        if entry is None:
+            entry = ImageCacheEntry(key=key, hit_count=0, **params, prompt=prompt)
+            db.add(entry)
+        entry.s3_key = s3_key
+        entry.image_url = image_url
+        entry.created_at = now
+        entry.last_used_at = now
+        db.commit()
+        _count("stores")
+
+        if IMAGE_CACHE_MAX_ENTRIES:
+            overflow = db.query(ImageCacheEntry.key).order_by(ImageCacheEntry.last_used_at.desc()).offset(IMAGE_CACHE_MAX_ENTRIES)
+            evicted = db.query(ImageCacheEntry).filter(ImageCacheEntry.key.in_(overflow.scalar_subquery())).delete(synchronize_session=False)
+            db.commit()
+            if evicted:
+                _count("evictions", evicted)
+    finally:
+        db.close()
+
+
+def record_bypass():
+    _count("bypasses")
+
+
+def get_stats() -> dict:
+    """Hit/miss counters for this process plus the current number of entries"""
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+    db = SessionLocal()
+    try:
+        stats["entries"] = db.query(ImageCacheEntry).count()
+    finally:
+        db.close()
+    stats["enabled"] = IMAGE_CACHE_ENABLED
+    return stats
@@ -0,0 +1,206 @@
+"""Garbage collection of stored images that no scene refers to any more
+
+Images are stored under their project's prefix ({project_id}/{uuid}.png, with
+thumbnails at {project_id}/{uuid}_w{width}.{format}), but scenes of other
+projects can point at them too: duplicates share the source's images, and
+cache hits reuse another project's upload. So an original is kept while any
+scene's image_url points at it, and its thumbnails are kept with it. Anything
+else under the collected prefix is deleted with DeleteObjects, after the
+image_cache entries for it are dropped so the cache doesn't hand it out again.
+
+Objects are listed and checked a page (up to 1000 keys) at a time, so memory
+doesn't grow with the bucket. Sweeps skip objects younger than
+IMAGE_GC_MIN_AGE_SECONDS, because a generated image is uploaded before the
+client saves the scene that uses it.
+"""
+import os
+import re
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+from dotenv import load_dotenv
+from sqlalchemy import delete, or_, select
+from sqlalchemy.orm import Session
+from database import SessionLocal
+from models.image_cache import ImageCacheEntry
+from models.project import Project
+from models.scene import Scene
+from utils import media, s3
+from utils.jobs import job_queue
+
+load_dotenv()
+
+# Delete images nothing refers to when projects and scenes are deleted
+IMAGE_GC_ENABLED = os.getenv("IMAGE_GC_ENABLED", "true").lower() == "true"
+# Sweeps keep unreferenced objects younger than this (images generated for scenes not saved yet)
+IMAGE_GC_MIN_AGE_SECONDS = int(os.getenv("IMAGE_GC_MIN_AGE_SECONDS", "86400"))
+REPORT_SAMPLE_SIZE = 20
+
+# {base}_w{width}.{format}, as written by utils/thumbnails.derivative_key
+DERIVATIVE_KEY = re.compile(r"^(.+)_w\d+\.[a-z0-9]+$")
+
+
+def original_base(key: str) -> str:
+    """The key without its extension or thumbnail suffix, shared by an original and its thumbnails"""
+    match = DERIVATIVE_KEY.match(key)
+    return match.group(1) if match else os.path.splitext(key)[0]
+
+
+def key_directory(image_url: Optional[str]) -> Optional[str]:
+    """The "{project_id}/" prefix an image URL is stored under, or None for URLs outside the bucket"""
+    key = s3.key_for_url(image_url)
+    if key is None or "/" not in key:
+        return None
+    return key.rsplit("/", 1)[0] + "/"
+
+
+class GCReport:
+    """What one collection found and deleted (or would delete, on a dry run)"""
+
+    def __init__(self, prefix: str, dry_run: bool):
+        self.prefix = prefix
+        self.dry_run = dry_run
+        self.scanned = 0
+        self.kept = 0
+        self.too_new = 0
+        self.deleted = 0
+        self.deleted_bytes = 0
+        self.cache_entries_deleted = 0
+        self.errors: List[dict] = []
+        self.sample: List[str] = []
+        self.started_at = time.perf_counter()
+
+    def to_dict(self) -> dict:
+        return {
+            "prefix": self.prefix,
+            "dry_run": self.dry_run,
+            "scanned": self.scanned,
+            "kept": self.kept,
+            "too_new": self.too_new,
+            "deleted": self.deleted,
+            "deleted_bytes": self.deleted_bytes,
+            "cache_entries_deleted": self.cache_entries_deleted,
+            "errors": self.errors[:REPORT_SAMPLE_SIZE],
+            "sample": self.sample,
+            "seconds": round(time.perf_counter() - self.started_at, 3),
+        }
+
+
+def _referenced_originals(db: Session, keys: List[str]) -> set:
+    """Which of these keys some scene's image_url points at (one indexed query)"""
+    if not keys:
+        return set()
+    urls = {url: key for key in keys for url in s3.object_urls(key)}
+    rows = db.scalars(select(Scene.image_url).where(Scene.image_url.in_(list(urls))).distinct())
+    return {urls[url] for url in rows}
+
+
+def _base_referenced(db: Session, base: str) -> bool:
+    """For thumbnails whose original wasn't listed with them: does a scene use any {base}.* image?"""
+    condition = or_(*(Scene.image_url.startswith(url + ".", autoescape=True) for url in s3.object_urls(base)))
+    return db.scalar(select(Scene.id).where(condition).limit(1)) is not None
+
+
+def _delete(db: Session, objects: List[dict], report: GCReport):
+    keys = [obj["Key"] for obj in objects]
+    sizes = {obj["Key"]: obj.get("Size", 0) for obj in objects}
+    if report.dry_run:
+        deleted = keys
+    else:
+        # Drop cache entries first, so a generation can't be handed an image that is about to go
+        result = db.execute(delete(ImageCacheEntry).where(ImageCacheEntry.s3_key.in_(keys)))
+        db.commit()
+        report.cache_entries_deleted += result.rowcount or 0
+        deleted, errors = s3.delete_objects(keys)
+        media.cache.discard(deleted)
+        report.errors.extend({"key": error.get("Key"), "error": error.get("Message") or error.get("Code")} for error in errors)
+    report.deleted += len(deleted)
+    report.deleted_bytes += sum(sizes[key] for key in deleted)
+    report.sample.extend(deleted[:REPORT_SAMPLE_SIZE - len(report.sample)])
+
+
+def collect(prefix: str, dry_run: bool = False, min_age_seconds: int = IMAGE_GC_MIN_AGE_SECONDS) -> dict:
+    """Delete the objects under `prefix` that no scene refers to; returns a report"""
+    report = GCReport(prefix, dry_run)
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=min_age_seconds)
+    # Listing is in key order, so an original comes just before its thumbnails, possibly on the previous page
+    previous: Dict[str, bool] = {}
+    for page in s3.list_object_pages(prefix):
+        db = SessionLocal()
+        try:
+            originals = [obj["Key"] for obj in page if not DERIVATIVE_KEY.match(obj["Key"])]
+            referenced = _referenced_originals(db, originals)
+            keep = {original_base(key): key in referenced for key in originals}
+            doomed = []
+            for obj in page:
+                report.scanned += 1
+                base = original_base(obj["Key"])
+                if base not in keep:
+                    keep[base] = previous[base] if base in previous else _base_referenced(db, base)
+                if keep[base]:
+                    report.kept += 1
+                elif min_age_seconds and obj["LastModified"] > cutoff:
+                    report.too_new += 1
+                else:
+                    doomed.append(obj)
+            if doomed:
+                _delete(db, doomed, report)
+            previous = keep
+        finally:
+            db.close()
+
+    result = report.to_dict()
+    action = "Would delete" if dry_run else "Deleted"
+    print(f"🗑️  {action} {result['deleted']} of {result['scanned']} objects under '{prefix}' "
+          f"({result['deleted_bytes'] / 1e6:.1f} MB) in {result['seconds']:.2f}s")
+    return result
+
+
+def project_image_directories(db: Session, project_id: str) -> List[str]:
+    """Prefixes other than the project's own that its scenes' images are stored under (shared images)"""
+    directories = set()
+    rows = db.execute(
+        select(Scene.image_url).where(Scene.project_id == project_id, Scene.image_url.isnot(None)).execution_options(yield_per=1000)
+    ).scalars()
+    for image_url in rows:
+        directory = key_directory(image_url)
+        if directory is not None:
+            directories.add(directory)
+    directories.discard(f"{project_id}/")
+    return sorted(directories)
+
+
+def collect_project(project_id: str, shared_directories: List[str], dry_run: bool = False) -> dict:
+    """Collect a deleted project's prefix, then the other prefixes its scenes used images from
+
+    Nothing can be added to a deleted project, so the prefixes of deleted
+    projects are collected whatever the objects' age; live projects' prefixes
+    are swept as usual.
+    """
+    db = SessionLocal()
+    try:
+        live = set(db.scalars(select(Project.id).where(Project.id.in_([directory[:-1] for directory in shared_directories]))))
+    finally:
+        db.close()
+    reports = [collect(f"{project_id}/", dry_run, min_age_seconds=0)]
+    for directory in shared_directories:
+        min_age_seconds = IMAGE_GC_MIN_AGE_SECONDS if directory[:-1] in live else 0
+        reports.append(collect(directory, dry_run, min_age_seconds))
+    return {"reports": reports}
+
+
+def queue_project_cleanup(project_id: str, shared_directories: List[str]):
+    """Collect a deleted project's images in the background"""
+    if not IMAGE_GC_ENABLED:
+        return
+    job_queue.submit("image_gc", {"project_id": project_id}, lambda: collect_project(project_id, shared_directories))
+
+
+def queue_scene_cleanup(image_url: Optional[str]):
+    """Delete a deleted scene's image and thumbnails in the background, unless another scene uses them"""
+    key = s3.key_for_url(image_url)
+    if not IMAGE_GC_ENABLED or key is None:
+        return
+    # The prefix matches the original and its thumbnails only ({uuid}.png, {uuid}_w256.webp, ...)
+    prefix = original_base(key)
+    job_queue.submit("image_gc", {"image_url": image_url}, lambda: collect(prefix, min_age_seconds=0))
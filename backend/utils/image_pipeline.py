@@ -0,0 +1,139 @@
+from typing import Optional
+from database import SessionLocal
+from models.scene import Scene
+from utils.ai_image import open_image_stream, get_active_provider, get_generation_params
+from utils.provider_router import router as provider_router
+from utils.s3 import upload_stream_to_s3
+from utils.jobs import job_queue
+from utils.revisions import bump_project_revision
+from utils.pubsub import publish_project_event
+from utils.thumbnails import thumbnails_for_url
+from utils import image_cache, media, metrics
+import io
+import time
+import uuid
+
+def generate_and_store(prompt: str, project_id: str, provider: str = None, bypass_cache: bool = False) -> str:
+    """Run generate -> download -> upload for a prompt and return the image URL"""
+    provider = provider or get_active_provider()
+    params = get_generation_params(provider)
+    key = image_cache.cache_key(params["provider"], params["model"], params["size"], params["quality"], prompt)
+    if image_cache.IMAGE_CACHE_ENABLED:
+        if bypass_cache:
+            image_cache.record_bypass()
+        else:
+            try:
+                with metrics.time_stage("cache_lookup"):
+                    cached_url = image_cache.lookup(key)
+            except Exception as cache_error:
+                print(f"⚠️  WARNING: Image cache lookup failed: {str(cache_error)}")
+                cached_url = None
+            if cached_url:
+                print(f"♻️  Image cache hit for prompt: {prompt[:50]}...")
+                metrics.IMAGE_GENERATIONS.inc(provider, "cache_hit")
+                return cached_url
+
+    print(f"🎨 Generating image for prompt: {prompt[:50]}...")
+    # The router handles rate limits, retries and falling back to (or hedging with) other providers
+    try:
+        image = provider_router.generate(prompt, provider)
+    except Exception:
+        metrics.IMAGE_GENERATIONS.inc(provider, "provider_error")
+        raise
+    if image.provider != provider:
+        # Cache under the settings of the provider that actually made the image
+        provider = image.provider
+        params = get_generation_params(provider)
+        key = image_cache.cache_key(params["provider"], params["model"], params["size"], params["quality"], prompt)
+    if image.data is not None:
+        print(f"✅ Image generated by {provider}: {len(image.data)} bytes")
+    else:
+        print(f"✅ Image generated by {provider}: {image.url[:80]}...")
+
+    # Try to upload to S3; if that fails keep the image on local disk rather than hand out the provider's URL
+    filename = f"{project_id}/{uuid.uuid4()}.png"
+    try:
+        opening = time.perf_counter()
+        if image.data is not None:
+            # The provider sent the image itself, so there is nothing to download
+            print(f"☁️  Uploading image to S3: {filename}")
+            stream, content_type = io.BytesIO(image.data), image.content_type
+        else:
+            # Stream the image straight from the provider into S3 without buffering it whole
+            print(f"☁️  Streaming image to S3: {filename}")
+            stream, content_type = open_image_stream(image.url)
+        opened_seconds = time.perf_counter() - opening
+        try:
+            s3_url, transfer = upload_stream_to_s3(stream, filename, content_type)
+        finally:
+            stream.close()
+        # Download and upload overlap while streaming; split the time by who was waited on
+        if image.data is None:
+            metrics.observe_stage("download", opened_seconds + transfer["read_seconds"])
+        metrics.observe_stage("s3_upload", transfer["seconds"] - transfer["read_seconds"])
+        metrics.IMAGE_GENERATIONS.inc(provider, "stored")
+
+        if image_cache.IMAGE_CACHE_ENABLED:
+            # Only cache durable S3 copies, never the expiring provider URL
+            try:
+                image_cache.store(key, params, prompt, filename, s3_url)
+            except Exception as cache_error:
+                print(f"⚠️  WARNING: Failed to cache image: {str(cache_error)}")
+        return s3_url
+    except Exception as s3_error:
+        print(f"⚠️  WARNING: S3 upload failed: {str(s3_error)}")
+
+    # Provider URLs expire, so spool the image and serve it from /media until a retry uploads it
+    try:
+        stream = io.BytesIO(image.data) if image.data is not None else open_image_stream(image.url)[0]
+        try:
+            media_url = media.spool(stream, filename)
+        finally:
+            stream.close()
+        metrics.IMAGE_GENERATIONS.inc(provider, "spooled")
+        return media_url
+    except Exception as spool_error:
+        # Last resort: the provider's URL (or the image inline), which works until it expires
+        print(f"⚠️  WARNING: Spooling the image failed: {str(spool_error)}")
+        print(f"⚠️  Using the provider's image directly (temporary): {image.as_url()[:80]}")
+        metrics.IMAGE_GENERATIONS.inc(provider, "s3_fallback")
+        import traceback
+        traceback.print_exc()
+        return image.as_url()
+
+def build_thumbnails(image_url: str, force: bool = False) -> Optional[dict]:
+    """thumbnails_for_url that logs failures instead of raising: a scene without thumbnails falls back to the original"""
+    try:
+        with metrics.time_stage("thumbnails"):
+            return thumbnails_for_url(image_url, force)
+    except Exception as e:
+        print(f"⚠️  WARNING: Failed to build thumbnails for {image_url[:80]}: {str(e)}")
+        return None
+
+def store_scene_thumbnails(scene_id: str, image_url: str, force: bool = False) -> Optional[dict]:
+    """Build thumbnails for a scene's image and record them, unless the image was replaced meanwhile"""
+    thumbnails = build_thumbnails(image_url, force)
+    if thumbnails is None:
+        return None
+    db = SessionLocal()
+    try:
+        project_id = db.query(Scene.project_id).filter(Scene.id == scene_id, Scene.image_url == image_url).scalar()
+        if project_id is None:
+            return None
+        revision = bump_project_revision(db, project_id)
+        db.query(Scene).filter(Scene.id == scene_id, Scene.image_url == image_url).update(
+            {Scene.thumbnails: thumbnails, Scene.revision: revision}, synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+    publish_project_event(project_id, "scene.thumbnails_updated", {"id": scene_id, "thumbnails": thumbnails}, revision)
+    return thumbnails
+
+def queue_scene_thumbnails(scene_id: str, image_url: str):
+    """Build a scene's thumbnails in the background after its image_url was set by a client"""
+    job_queue.submit(
+        "scene_thumbnails",
+        {"scene_id": scene_id, "image_url": image_url},
+        lambda: {"thumbnails": store_scene_thumbnails(scene_id, image_url)},
+    )
@@ -0,0 +1,213 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+
+IMAGE_JOB_WORKERS = int(os.getenv("IMAGE_JOB_WORKERS", "8"))
+# Comma separated provider=limit pairs, e.g. "openai=4,stability=2"
+IMAGE_PROVIDER_CONCURRENCY = os.getenv("IMAGE_PROVIDER_CONCURRENCY", "openai=4,stability=2,stub=8")
+IMAGE_JOB_RETENTION_SECONDS = int(os.getenv("IMAGE_JOB_RETENTION_SECONDS", "3600"))
+IMAGE_BATCH_PARALLELISM = int(os.getenv("IMAGE_BATCH_PARALLELISM", "8"))
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+# A batch where some items succeeded and some failed
+JOB_PARTIAL = "partial"
+FINISHED_STATES = (JOB_SUCCEEDED, JOB_FAILED, JOB_PARTIAL)
+
+
+def _parse_limits(spec: str) -> Dict[str, int]:
+    limits = {}
+    for part in spec.split(","):
+        if "=" in part:
+            name, value = part.split("=", 1)
+            limits[name.strip().lower()] = max(1, int(value))
+    return limits
+
+
+_provider_limits = _parse_limits(IMAGE_PROVIDER_CONCURRENCY)
+_provider_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+_provider_lock = threading.Lock()
+
+
+@contextmanager
+def provider_slot(provider: str):
+    """Hold one of the provider's concurrency slots for the duration of the block"""
+    with _provider_lock:
+        semaphore = _provider_semaphores.get(provider)
+        if semaphore is None:
+            semaphore = threading.BoundedSemaphore(_provider_limits.get(provider, IMAGE_JOB_WORKERS))
+            _provider_semaphores[provider] = semaphore
+    with semaphore:
+        yield
+
+
+class Job:
+    """A unit of background work and its observable state"""
+
+    def __init__(self, kind: str, payload: dict):
+        self.id = str(uuid.uuid4())
+        self.kind = kind
+        self.payload = payload
+        self.status = JOB_QUEUED
+        self.result: Optional[dict] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class BatchJob(Job):
+    """A job that fans out over many items and tracks per-item progress"""
+
+    def __init__(self, kind: str, payload: dict, item_ids: List[str], max_parallel: int):
+        super().__init__(kind, payload)
+        self.max_parallel = max_parallel
+        self.items = {item_id: {"status": JOB_QUEUED, "result": None, "error": None} for item_id in item_ids}
+        self.pending: List[Tuple[str, Callable[[], dict]]] = []
+        self.lock = threading.Lock()
+
+    def progress(self) -> dict:
+        counts = {JOB_QUEUED: 0, JOB_RUNNING: 0, JOB_SUCCEEDED: 0, JOB_FAILED: 0}
+        for item in self.items.values():
+            counts[item["status"]] += 1
+        return {"total": len(self.items), **counts}
+
+    def to_dict(self) -> dict:
+        with self.lock:
+            return {
+                **super().to_dict(),
+                "progress": self.progress(),
+                "items": {item_id: dict(item) for item_id, item in self.items.items()},
+            }
+
+
+class JobQueue:
+    """Bounded thread pool that runs jobs in the background and keeps their status"""
+
+    def __init__(self, max_workers: int = IMAGE_JOB_WORKERS, retention_seconds: int = IMAGE_JOB_RETENTION_SECONDS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="image-job")
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._retention_seconds = retention_seconds
+
+    def submit(self, kind: str, payload: dict, fn: Callable[[], dict]) -> Job:
+        """Queue fn to run in the pool and return its Job immediately"""
+        job = Job(kind, payload)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job, fn)
+        return job
+
+    def submit_batch(self, kind: str, payload: dict, items: List[Tuple[str, Callable[[], dict]]],
+                     max_parallel: int = IMAGE_BATCH_PARALLELISM) -> BatchJob:
+        """Run many (item_id, fn) pairs with at most max_parallel in flight and return the BatchJob"""
+        batch = BatchJob(kind, payload, [item_id for item_id, _ in items], max(1, max_parallel))
+        batch.pending = list(reversed(items))
+        batch.status = JOB_RUNNING
+        batch.started_at = time.time()
+        with self._lock:
+            self._prune()
+            self._jobs[batch.id] = batch
+        if not items:
+            self._finish_batch(batch)
+        # Items are dispatched lazily so a large batch never floods the shared pool
+        for _ in range(min(batch.max_parallel, len(items))):
+            self._dispatch_next(batch)
+        return batch
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def shutdown(self, wait: bool = False):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _run(self, job: Job, fn: Callable[[], dict]):
+        job.status = JOB_RUNNING
+        job.started_at = time.time()
+        try:
+            job.result = fn()
+            job.status = JOB_SUCCEEDED
+        except Exception as e:
+            print(f"❌ Job {job.id} failed: {str(e)}")
+            job.error = str(e)
+            job.status = JOB_FAILED
+        finally:
+            job.finished_at = time.time()
+
+    def _dispatch_next(self, batch: BatchJob):
+        with batch.lock:
+            if not batch.pending:
+                return
+            item_id, fn = batch.pending.pop()
+        self._executor.submit(self._run_batch_item, batch, item_id, fn)
+
+    def _run_batch_item(self, batch: BatchJob, item_id: str, fn: Callable[[], dict]):
+        item = batch.items[item_id]
+        with batch.lock:
+            item["status"] = JOB_RUNNING
+        try:
+            result = fn()
+            with batch.lock:
+                item["result"] = result
+                item["status"] = JOB_SUCCEEDED
+        except Exception as e:
+            print(f"❌ Batch {batch.id} item {item_id} failed: {str(e)}")
+            with batch.lock:
+                item["error"] = str(e)
+                item["status"] = JOB_FAILED
+        self._dispatch_next(batch)
+        with batch.lock:
+            done = all(entry["status"] in FINISHED_STATES for entry in batch.items.values())
+        if done:
+            self._finish_batch(batch)
+
+    def _finish_batch(self, batch: BatchJob):
+        with batch.lock:
+            if batch.finished:
+                return
+            progress = batch.progress()
+            batch.result = {"succeeded": progress[JOB_SUCCEEDED], "failed": progress[JOB_FAILED]}
+            batch.finished_at = time.time()
+            if not progress[JOB_FAILED]:
+                batch.status = JOB_SUCCEEDED
+            elif progress[JOB_SUCCEEDED]:
+                batch.status = JOB_PARTIAL
+            else:
+                batch.status = JOB_FAILED
+                batch.error = f"All {progress[JOB_FAILED]} items failed"
+
+    def _prune(self):
+        cutoff = time.time() - self._retention_seconds
+        expired = [job_id for job_id, job in self._jobs.items() if job.finished and job.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+
+job_queue = JobQueue()
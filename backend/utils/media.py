@@ -0,0 +1,376 @@
+"""Serving stored images from this API: /media/{key} backed by a bounded on-disk cache
+
+An object is looked up in this order:
+1. the spool, where images go when their upload to the bucket failed, until a
+   retry uploads them (so a scene never has to keep a provider's expiring URL)
+2. the local storage directory, with STORAGE_BACKEND=local (fully offline)
+3. the cache, MEDIA_CACHE_DIR, filled from the bucket on a miss and trimmed
+   to MEDIA_CACHE_MAX_BYTES by evicting the least recently served objects
+
+Files are written to a temporary name and renamed into place, so their size
+and mtime only change when their bytes do; the ETag is built from those.
+"""
+import email.utils
+import mimetypes
+import os
+import re
+import shutil
+import stat
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import anyio
+from dotenv import load_dotenv
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+from utils import metrics, s3
+from utils.jobs import job_queue
+
+load_dotenv()
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Copies of bucket objects served by /media, least recently served evicted first
+MEDIA_CACHE_DIR = os.getenv("MEDIA_CACHE_DIR", os.path.join(BACKEND_DIR, "media_cache"))
+MEDIA_CACHE_MAX_BYTES = int(os.getenv("MEDIA_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+# Images whose upload failed wait here (served by /media) until they are uploaded
+MEDIA_SPOOL_DIR = os.getenv("MEDIA_SPOOL_DIR", os.path.join(BACKEND_DIR, "media_spool"))
+# Cache-Control max-age for /media responses; clients revalidate with the ETag after that
+MEDIA_MAX_AGE_SECONDS = int(os.getenv("MEDIA_MAX_AGE_SECONDS", "86400"))
+
+CHUNK_SIZE = 64 * 1024
+RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def _path_in(root: str, key: str) -> str:
+    """The file for a key under root; raises ValueError for keys that would escape it"""
+    path = os.path.normpath(os.path.join(root, key))
+    if not path.startswith(os.path.normpath(root) + os.sep):
+        raise ValueError(f"Invalid object key: {key}")
+    return path
+
+
+def _write_atomically(path: str, fill: Callable) -> int:
+    """Write a file through fill(file) under a temporary name, then rename it into place; returns its size"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, temporary = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".part-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            fill(f)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+    return os.path.getsize(path)
+
+
+class MediaCache:
+    """Bucket objects kept on disk, evicted least recently served first once over max_bytes
+
+    The recency order lives in this process and is rebuilt from file mtimes
+    on first use. Workers sharing the directory each keep their own order, so
+    the total can run over the budget by what the others added since.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._bytes = 0
+        self._loaded = False
+        self._lock = threading.Lock()
+        # One download per key at a time; later requests wait and read the file it wrote
+        self._fetching: Dict[str, threading.Lock] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _load(self):
+        found = []
+        for directory, _, filenames in os.walk(self.directory):
+            for filename in filenames:
+                path = os.path.join(directory, filename)
+                if filename.startswith(".part-"):
+                    # Being written by another worker (or left by one that died mid-download)
+                    continue
+                info = os.stat(path)
+                key = os.path.relpath(path, self.directory).replace(os.sep, "/")
+                found.append((info.st_mtime, key, info.st_size))
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._bytes += size
+        self._loaded = True
+
+    def _add(self, key: str, size: int):
+        """Record a file just written and evict the oldest others until under budget (lock held)"""
+        self._bytes += size - self._entries.pop(key, 0)
+        self._entries[key] = size
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            oldest, oldest_size = self._entries.popitem(last=False)
+            self._bytes -= oldest_size
+            self.evictions += 1
+            try:
+                os.unlink(_path_in(self.directory, oldest))
+            except FileNotFoundError:
+                pass
+
+    def lookup(self, key: str) -> Optional[str]:
+        """Path of the cached copy, marked as just used, or None"""
+        path = _path_in(self.directory, key)
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            if key in self._entries and os.path.isfile(path):
+                self._entries.move_to_end(key)
+                return path
+            if os.path.isfile(path):
+                # Written by another worker
+                self._add(key, os.path.getsize(path))
+                return path
+            if key in self._entries:
+                # Evicted by another worker
+                self._bytes -= self._entries.pop(key)
+        return None
+
+    def fetch(self, key: str, fill: Callable) -> str:
+        """Path of the cached copy, written through fill(file) on a miss"""
+        path = self.lookup(key)
+        if path is not None:
+            self.hits += 1
+            return path
+        with self._lock:
+            fetching = self._fetching.setdefault(key, threading.Lock())
+        with fetching:
+            path = self.lookup(key)
+            if path is not None:
+                self.hits += 1
+                return path
+            self.misses += 1
+            try:
+                size = _write_atomically(_path_in(self.directory, key), fill)
+            finally:
+                with self._lock:
+                    self._fetching.pop(key, None)
+            with self._lock:
+                self._add(key, size)
+        return _path_in(self.directory, key)
+
+    def adopt(self, key: str, source: str):
+        """Move a file we already have (an uploaded spool file) into the cache"""
+        path = _path_in(self.directory, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        shutil.move(source, path)
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            else:
+                self._add(key, os.path.getsize(path))
+
+    def discard(self, keys: Iterable[str]):
+        """Drop cached copies of objects deleted from the bucket"""
+        with self._lock:
+            for key in keys:
+                self._bytes -= self._entries.pop(key, 0)
+                try:
+                    os.unlink(_path_in(self.directory, key))
+                except (FileNotFoundError, ValueError):
+                    pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+cache = MediaCache(MEDIA_CACHE_DIR, MEDIA_CACHE_MAX_BYTES)
+
+
+def _download(key: str):
+    def fill(f):
+        response = s3.get_s3_client().get_object(Bucket=s3.BUCKET_NAME, Key=key)
+        try:
+            shutil.copyfileobj(response["Body"], f, CHUNK_SIZE)
+        finally:
+            response["Body"].close()
+    return fill
+
+
+def resolve(key: str) -> Optional[str]:
+    """Path of a file holding the object's bytes, or None if it doesn't exist; raises ValueError for bad keys"""
+    spooled = _path_in(MEDIA_SPOOL_DIR, key)
+    if os.path.isfile(spooled):
+        metrics.MEDIA_REQUESTS.inc("spool")
+        return spooled
+    if s3.STORAGE_BACKEND == "local":
+        path = _path_in(os.path.join(s3.LOCAL_STORAGE_DIR, s3.BUCKET_NAME), key)
+        metrics.MEDIA_REQUESTS.inc("local" if os.path.isfile(path) else "missing")
+        return path if os.path.isfile(path) else None
+    from botocore.exceptions import ClientError
+    hits = cache.hits
+    try:
+        path = cache.fetch(key, _download(key))
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+            metrics.MEDIA_REQUESTS.inc("missing")
+            return None
+        raise
+    metrics.MEDIA_REQUESTS.inc("cache" if cache.hits > hits else "origin")
+    return path
+
+
+def spool(stream, key: str) -> str:
+    """Keep an image whose upload failed on local disk, queue another upload and return its /media URL"""
+    size = _write_atomically(_path_in(MEDIA_SPOOL_DIR, key), lambda f: shutil.copyfileobj(stream, f, CHUNK_SIZE))
+    print(f"📥 Spooled {key} ({size} bytes) for a later upload; serving it from /media meanwhile")
+    queue_spool_upload([key])
+    return s3.media_url(key)
+
+
+def spooled_keys() -> List[str]:
+    keys = []
+    for directory, _, filenames in os.walk(MEDIA_SPOOL_DIR):
+        for filename in filenames:
+            if not filename.startswith(".part-"):
+                keys.append(os.path.relpath(os.path.join(directory, filename), MEDIA_SPOOL_DIR).replace(os.sep, "/"))
+    return sorted(keys)
+
+
+def upload_spooled(keys: List[str]) -> dict:
+    """Upload spooled images to the bucket, moving each into the cache once it is there"""
+    uploaded, failed = 0, 0
+    for key in keys:
+        path = _path_in(MEDIA_SPOOL_DIR, key)
+        if not os.path.isfile(path):
+            continue
+        try:
+            with open(path, "rb") as f:
+                s3.upload_stream_to_s3(f, key, mimetypes.guess_type(key)[0] or "application/octet-stream")
+        except Exception as e:
+            print(f"⚠️  WARNING: Spooled image {key} is still not uploaded: {str(e)}")
+            failed += 1
+            continue
+        try:
+            if s3.STORAGE_BACKEND == "local":
+                os.unlink(path)
+            else:
+                cache.adopt(key, path)
+        except FileNotFoundError:
+            # Another retry got there first
+            continue
+        uploaded += 1
+    return {"uploaded": uploaded, "failed": failed}
+
+
+def queue_spool_upload(keys: Optional[List[str]] = None):
+    """Upload spooled images in the background (all of them if keys is None)"""
+    keys = spooled_keys() if keys is None else keys
+    if keys:
+        job_queue.submit("media_upload", {"keys": len(keys)}, lambda: upload_spooled(keys))
+
+
+def etag_for(info: os.stat_result) -> str:
+    """Strong ETag: files are only ever replaced whole, so size and mtime change with the bytes"""
+    return f'"{info.st_size:x}-{info.st_mtime_ns:x}"'
+
+
+def _byte_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """(first, last) byte of a single `bytes=` range, None for the whole file; raises ValueError if unsatisfiable
+
+    Multiple ranges, and invalid ones such as `bytes=10-5`, are answered with
+    the whole file, as HTTP says to ignore a Range header it can't use.
+    """
+    match = RANGE.match(header.replace(" ", ""))
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        if int(last) == 0 or size == 0:
+            raise ValueError("empty suffix range")
+        return max(0, size - int(last)), size - 1
+    if last and int(last) < int(first):
+        return None
+    if int(first) >= size:
+        raise ValueError("range starts past the end")
+    return int(first), min(int(last), size - 1) if last else size - 1
+
+
+class MediaFileResponse(Response):
+    """A file, or one byte range of it, streamed from disk
+
+    Servers that offer the ASGI pathsend extension send whole files
+    themselves (sendfile); otherwise the file is read CHUNK_SIZE at a time off
+    the event loop.
+    """
+
+    def __init__(self, path: str, status_code: int, headers: dict, first: int, length: int, media_type: str):
+        super().__init__(status_code=status_code, headers=headers, media_type=media_type)
+        self.path = path
+        self.first = first
+        self.length = length
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope["method"].upper() == "HEAD" or self.length == 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        if self.status_code == 200 and "http.response.pathsend" in scope.get("extensions", {}):
+            await send({"type": "http.response.pathsend", "path": self.path})
+            return
+        remaining = self.length
+        async with await anyio.open_file(self.path, "rb") as f:
+            await f.seek(self.first)
+            while remaining > 0:
+                chunk = await f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+        if remaining > 0:
+            # The file shrank under us; end the body rather than hang the client
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+def file_response(path: str, key: str, request_headers) -> Response:
+    """Response for a resolved object: 304 for a matching If-None-Match, 206 for a Range, else the whole file"""
+    try:
+        info = os.stat(path)
+    except FileNotFoundError:
+        # Evicted between resolve and here
+        return Response(status_code=404)
+    if not stat.S_ISREG(info.st_mode):
+        return Response(status_code=404)
+    etag = etag_for(info)
+    headers = {
+        "etag": etag,
+        "last-modified": email.utils.formatdate(info.st_mtime, usegmt=True),
+        "cache-control": f"public, max-age={MEDIA_MAX_AGE_SECONDS}",
+        "accept-ranges": "bytes",
+    }
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]):
+        return Response(status_code=304, headers=headers)
+
+    media_type = mimetypes.guess_type(key)[0] or "application/octet-stream"
+    size = info.st_size
+    byte_range = None
+    range_header = request_headers.get("range")
+    # If-Range: only honour the range if the client's copy is still this one
+    if range_header and request_headers.get("if-range", etag) == etag:
+        try:
+            byte_range = _byte_range(range_header, size)
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "content-range": f"bytes */{size}"})
+    if byte_range is None:
+        return MediaFileResponse(path, 200, {**headers, "content-length": str(size)}, 0, size, media_type)
+    first, last = byte_range
+    headers.update({"content-length": str(last - first + 1), "content-range": f"bytes {first}-{last}/{size}"})
+    return MediaFileResponse(path, 206, headers, first, last - first + 1, media_type)
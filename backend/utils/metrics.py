@@ -0,0 +1,289 @@
+"""In-process metrics, served in the Prometheus text format at /metrics
+
+Values are kept per worker process, like the snapshot and story graph caches:
+scrape each uvicorn worker (or run one worker per container).
+"""
+import bisect
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from dotenv import load_dotenv
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+
+load_dotenv()
+
+# Set to false to skip the request middleware and query hooks entirely
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+# Answer requests sent with `X-Profile: 1` with a Server-Timing header (DB, provider, download, upload) and a log line
+REQUEST_PROFILING = os.getenv("REQUEST_PROFILING", "false").lower() == "true"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+QUERY_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0, 5.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 500)
+
+_registry: List["Metric"] = []
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+class Metric:
+    """A named family of values keyed by label values, registered for /metrics"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._values: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            values = list(self._values.items())
+        for label_values, value in values:
+            yield f"{self.name}{_labels(self.label_names, label_values)} {_number(value)}"
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *label_values: str, amount: float = 1.0):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+class Gauge(Metric):
+    """A value that goes up and down, or is read from `collect` at scrape time"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (),
+                 collect: Optional[Callable[[], Iterable[Tuple[Tuple[str, ...], float]]]] = None):
+        super().__init__(name, help, labels)
+        self._collect = collect
+
+    def inc(self, *label_values: str, amount: float = 1.0):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def dec(self, *label_values: str, amount: float = 1.0):
+        self.inc(*label_values, amount=-amount)
+
+    def samples(self) -> Iterable[str]:
+        if self._collect is None:
+            yield from super().samples()
+            return
+        for label_values, value in self._collect():
+            yield f"{self.name}{_labels(self.label_names, label_values)} {_number(value)}"
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *label_values: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(label_values)
+            if state is None:
+                # Per-bucket counts (the last one is +Inf) and the sum
+                state = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            values = [(label_values, list(state[0]), state[1]) for label_values, state in self._values.items()]
+        for label_values, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{_number(bound)}"'
+                yield f"{self.name}_bucket{_labels(self.label_names, label_values, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.label_names, label_values)} {_number(total)}"
+            yield f"{self.name}_count{_labels(self.label_names, label_values)} {cumulative}"
+
+def render() -> str:
+    """Every registered metric in the Prometheus text exposition format"""
+    return "\n".join(metric.render() for metric in _registry) + "\n"
+
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Time to handle a request, by route template", ("method", "route", "status"),
+)
+REQUESTS_IN_FLIGHT = Gauge("http_requests_in_flight", "Requests being handled right now")
+REQUEST_QUERIES = Histogram(
+    "http_request_db_queries", "SQL statements executed per request", ("method", "route"), QUERY_COUNT_BUCKETS,
+)
+QUERY_SECONDS = Histogram("db_query_duration_seconds", "Time spent executing one SQL statement", ("engine",), QUERY_LATENCY_BUCKETS)
+IMAGE_STAGE_SECONDS = Histogram(
+    "image_generation_stage_seconds",
+    "Time spent in each stage of generating and storing an image (cache_lookup, provider_wait, provider, download, s3_upload, thumbnails)",
+    ("stage",),
+)
+IMAGE_GENERATIONS = Counter(
+    "image_generations_total", "Images requested from generate_and_store, by provider and outcome", ("provider", "outcome"),
+)
+MEDIA_REQUESTS = Counter(
+    "media_requests_total", "Objects served by /media, by where they came from (spool, local, cache, origin, missing)", ("source",),
+)
+IMAGE_PROVIDER_CALLS = Counter(
+    "image_provider_calls_total",
+    "Image provider calls by outcome (ok, error, retryable_error, retry, rate_limited, circuit_open, hedged, hedge_won)",
+    ("provider", "outcome"),
+)
+
+class RequestStats:
+    """What one request spent its time on, filled in by the query hooks and stage timers"""
+
+    __slots__ = ("queries", "db_seconds", "stages")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.stages: Dict[str, float] = {}
+
+# Set by the middleware; sync handlers see it too because the threadpool copies the context
+_request_stats: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar("request_stats", default=None)
+
+def observe_stage(stage: str, seconds: float):
+    IMAGE_STAGE_SECONDS.observe(seconds, stage)
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.stages[stage] = stats.stages.get(stage, 0.0) + seconds
+
+@contextmanager
+def time_stage(stage: str):
+    """Record how long the block takes as one stage of image generation"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - started)
+
+_engines: List[Tuple[str, object]] = []
+
+def instrument_engine(engine, name: str):
+    """Count and time every statement run on a (sync) engine and report its pool at scrape time"""
+    _engines.append((name, engine))
+    if not METRICS_ENABLED:
+        return
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info["metrics_query_started"] = time.perf_counter()
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.pop("metrics_query_started", None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        QUERY_SECONDS.observe(elapsed, name)
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_seconds += elapsed
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+
+def _pool_samples():
+    for name, engine in _engines:
+        pool = engine.pool
+        # Other pools (e.g. in-memory SQLite's) don't track connections
+        if not isinstance(pool, QueuePool):
+            continue
+        yield (name, "checked_out"), pool.checkedout()
+        yield (name, "idle"), pool.checkedin()
+        yield (name, "overflow"), max(0, pool.overflow())
+
+def _pool_size_samples():
+    for name, engine in _engines:
+        if isinstance(engine.pool, QueuePool):
+            yield (name,), engine.pool.size()
+
+def _session_slot_samples():
+    from database import session_slot_stats
+    available, waiting = session_slot_stats()
+    yield ("available",), available
+    yield ("waiting",), waiting
+
+def _media_cache_samples():
+    from utils.media import cache
+    stats = cache.stats()
+    yield ("bytes",), stats["bytes"]
+    yield ("entries",), stats["entries"]
+
+Gauge("db_pool_connections", "Pooled database connections by state", ("engine", "state"), collect=_pool_samples)
+Gauge("db_pool_size", "Connections the pool keeps open", ("engine",), collect=_pool_size_samples)
+Gauge("db_session_slots", "Database session slots free, and requests queued for one", ("state",), collect=_session_slot_samples)
+Gauge("media_cache_size", "Bytes and objects in the /media disk cache", ("unit",), collect=_media_cache_samples)
+
+def _server_timing(stats: RequestStats, elapsed: float) -> str:
+    entries = [f"app;dur={elapsed * 1000:.1f}", f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.queries} queries"']
+    entries.extend(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in stats.stages.items())
+    return ", ".join(entries)
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, in-flight requests and queries per request for each route
+
+    Routes are labelled by their template (`/api/scenes/{scene_id}`), not the
+    concrete path, so the number of series stays fixed.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        profile = REQUEST_PROFILING and (b"x-profile", b"1") in scope["headers"]
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if profile:
+                    timing = _server_timing(stats, time.perf_counter() - started)
+                    message["headers"] = list(message.get("headers", [])) + [(b"server-timing", timing.encode("latin-1"))]
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            REQUESTS_IN_FLIGHT.dec()
+            _request_stats.reset(token)
+            # Set on the scope by the router once a route matched
+            route = getattr(scope.get("route"), "path", "unmatched")
+            REQUEST_SECONDS.observe(elapsed, scope["method"], route, str(status))
+            REQUEST_QUERIES.observe(stats.queries, scope["method"], route)
+            if profile:
+                print(f"⏱️  {scope['method']} {scope['path']} {status}: {_server_timing(stats, elapsed)}")
@@ -0,0 +1,127 @@
+from typing import List, Optional, Tuple
+from sqlalchemy import JSON, String, Text, cast, func, insert, literal, null, select, type_coerce
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Session
+from models.project import Project
+from models.scene import Scene
+from models.connection import Connection
+from utils.s3 import key_for_url, object_urls
+import uuid
+
+def _remapped_id(salt: str, column):
+    """SQL for a copied row's new id on Postgres, derived from its source id
+
+    The mapping is deterministic per copy, so connections remap their scene
+    ids with the same expression and no old -> new table is needed.
+    """
+    return cast(cast(func.md5(literal(salt) + column), UUID), String)
+
+def _copy_rows(db: Session, table, project_id: str, overrides: dict, new_ids: Optional[dict] = None) -> int:
+    """Copy a project's rows of `table` with `overrides` (SQL per column) and return how many
+
+    Without `new_ids` this is one INSERT ... SELECT. `new_ids` maps id columns
+    to functions of the source value; those rows are read and inserted from Python.
+    """
+    columns = [column.name for column in table.columns]
+    query = select(*[overrides.get(name, table.c[name]).label(name) for name in columns]).where(table.c.project_id == project_id)
+    if not new_ids:
+        return db.execute(insert(table).from_select(columns, query)).rowcount
+    rows = [dict(row) for row in db.execute(query).mappings()]
+    for row in rows:
+        for name, new_id in new_ids.items():
+            row[name] = new_id(row[name])
+    if rows:
+        db.execute(insert(table), rows)
+    return len(rows)
+
+def _rewrite_prefix(dialect_name: str, column, old_prefix: str, new_prefix: str, json: bool = False):
+    """SQL replacing one URL prefix with another inside a string or JSON column"""
+    if not json:
+        return func.replace(column, old_prefix, new_prefix)
+    rewritten = func.replace(cast(column, Text), old_prefix, new_prefix)
+    # SQLite stores JSON as text already; CAST(... AS JSON) there would give it numeric affinity
+    return cast(rewritten, JSON) if dialect_name == "postgresql" else type_coerce(rewritten, JSON)
+
+def image_copies(db: Session, project_id: str, new_project_id: str) -> List[Tuple[str, str]]:
+    """(source key, destination key) for every object of a project's images and thumbnails
+
+    Only keys under the project's own prefix are copied; images reused from
+    other projects through the image cache stay shared by reference.
+    """
+    prefix = f"{project_id}/"
+    keys = set()
+    for image_url, thumbnails in db.execute(
+        select(Scene.image_url, Scene.thumbnails).where(Scene.project_id == project_id, Scene.image_url.isnot(None))
+    ):
+        urls = [image_url] + [url for sizes in (thumbnails or {}).values() for url in sizes.values()]
+        keys.update(key for key in map(key_for_url, urls) if key and key.startswith(prefix))
+    return [(key, f"{new_project_id}/{key[len(prefix):]}") for key in sorted(keys)]
+
+def duplicate_project(
+    db: Session,
+    project_id: str,
+    new_project_id: str,
+    title: Optional[str] = None,
+    include_images: bool = True,
+    copied_images: bool = False,
+) -> Optional[dict]:
+    """Copy a project with its scenes and connections inside the caller's transaction
+
+    On Postgres scenes and connections are copied by one INSERT ... SELECT
+    each, with new ids computed in SQL, so no rows pass through Python. SQLite
+    reads the rows and inserts them with new uuids from Python. Without
+    `include_images` the copy is a template: same layout and prompts, no images.
+    With `copied_images` the image URLs are pointed at the new project's prefix
+    (the objects must have been copied already, see image_copies). Returns the
+    new project's row and counts, or None if the source doesn't exist.
+    """
+    source = db.execute(select(Project.title).where(Project.id == project_id)).first()
+    if source is None:
+        return None
+    dialect_name = db.get_bind().dialect.name
+    scenes, connections = Scene.__table__, Connection.__table__
+
+    db.execute(insert(Project).values(id=new_project_id, title=title or f"{source.title} (copy)", revision=1))
+
+    # Rows start at the new project's revision 1, so its changes feed from 0 includes them
+    scene_overrides = {"project_id": literal(new_project_id), "revision": literal(1)}
+    if not include_images:
+        scene_overrides["image_url"] = null()
+        scene_overrides["thumbnails"] = null()
+    elif copied_images:
+        image_url, thumbnails = scenes.c.image_url, scenes.c.thumbnails
+        # Bucket and /media URLs both point at the objects
+        for old_prefix, new_prefix in zip(object_urls(f"{project_id}/"), object_urls(f"{new_project_id}/")):
+            image_url = _rewrite_prefix(dialect_name, image_url, old_prefix, new_prefix)
+            thumbnails = _rewrite_prefix(dialect_name, thumbnails, old_prefix, new_prefix, json=True)
+        scene_overrides["image_url"] = image_url
+        scene_overrides["thumbnails"] = thumbnails
+    connection_overrides = {"project_id": literal(new_project_id), "revision": literal(1)}
+
+    if dialect_name == "postgresql":
+        salt = uuid.uuid4().hex
+        scene_overrides["id"] = _remapped_id(salt, scenes.c.id)
+        connection_overrides.update({
+            "id": _remapped_id(salt, connections.c.id),
+            "from_scene_id": _remapped_id(salt, connections.c.from_scene_id),
+            "to_scene_id": _remapped_id(salt, connections.c.to_scene_id),
+        })
+        scene_count = _copy_rows(db, scenes, project_id, scene_overrides)
+        connection_count = _copy_rows(db, connections, project_id, connection_overrides)
+    else:
+        # No md5() in SQLite: new ids come from Python, one old -> new map shared by scenes and connections
+        scene_ids = {}
+
+        def new_scene_id(old_id: str) -> str:
+            return scene_ids.setdefault(old_id, str(uuid.uuid4()))
+
+        scene_count = _copy_rows(db, scenes, project_id, scene_overrides, {"id": new_scene_id})
+        connection_count = _copy_rows(db, connections, project_id, connection_overrides, {
+            "id": lambda old_id: str(uuid.uuid4()),
+            "from_scene_id": new_scene_id,
+            "to_scene_id": new_scene_id,
+        })
+
+    project = db.execute(select(Project.__table__).where(Project.id == new_project_id)).mappings().one()
+    print(f"📑 Duplicated project {project_id} -> {new_project_id}: {scene_count} scenes, {connection_count} connections")
+    return {**project, "scene_count": scene_count, "connection_count": connection_count}
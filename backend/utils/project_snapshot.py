@@ -0,0 +1,113 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional, Tuple
+from dotenv import load_dotenv
+from sqlalchemy import Text, cast, func, literal_column, select
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.orm import Session
+from models.project import Project
+from models.scene import Scene
+from models.connection import Connection
+
+load_dotenv()
+
+# Number of serialized project snapshots kept in memory per process
+SNAPSHOT_CACHE_SIZE = int(os.getenv("SNAPSHOT_CACHE_SIZE", "128"))
+
+_cache: "OrderedDict[str, Tuple[int, bytes]]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def etag_for(project_id: str, revision: int, msgpack: bool = False) -> str:
+    # The MessagePack encoding of a snapshot is a different representation, so it gets its own tag
+    return f'"{project_id}:{revision}:msgpack"' if msgpack else f'"{project_id}:{revision}"'
+
+
+def get_cached(project_id: str, revision: int) -> Optional[bytes]:
+    """Return the cached snapshot body if it was built at this revision"""
+    with _cache_lock:
+        entry = _cache.get(project_id)
+        if entry is None or entry[0] != revision:
+            return None
+        _cache.move_to_end(project_id)
+        return entry[1]
+
+
+def put_cached(project_id: str, revision: int, body: bytes):
+    with _cache_lock:
+        _cache[project_id] = (revision, body)
+        _cache.move_to_end(project_id)
+        while len(_cache) > SNAPSHOT_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def invalidate(project_id: str):
+    with _cache_lock:
+        _cache.pop(project_id, None)
+
+
+def _json_pairs(table) -> list:
+    """'col', col, ... arguments for json_build_object over every column of a table"""
+    args = []
+    for column in table.columns:
+        args.extend([literal_column(f"'{column.name}'"), column])
+    return args
+
+
+def _json_list(table, order_by):
+    return (
+        select(func.coalesce(func.json_agg(aggregate_order_by(func.json_build_object(*_json_pairs(table)), order_by)), literal_column("'[]'::json")))
+        .where(table.c.project_id == Project.__table__.c.id)
+        .scalar_subquery()
+    )
+
+
+def postgres_snapshot_query(project_id: str):
+    """One round trip: Postgres assembles the whole document as JSON text"""
+    projects = Project.__table__
+    scenes = Scene.__table__
+    connections = Connection.__table__
+    args = _json_pairs(projects)
+    args.extend([literal_column("'scenes'"), _json_list(scenes, scenes.c.created_at)])
+    args.extend([literal_column("'connections'"), _json_list(connections, connections.c.created_at)])
+    return select(projects.c.revision, cast(func.json_build_object(*args), Text)).where(projects.c.id == project_id)
+
+
+def _load_postgres(db: Session, project_id: str) -> Optional[Tuple[int, bytes]]:
+    row = db.execute(postgres_snapshot_query(project_id)).first()
+    if row is None:
+        return None
+    return row[0], row[1].encode("utf-8")
+
+
+def _isoformat(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def row_to_dict(row) -> dict:
+    return {key: _isoformat(value) for key, value in row.items()}
+
+
+def load_snapshot(db: Session, project_id: str) -> Optional[Tuple[int, bytes]]:
+    """Build (revision, JSON body) for a project with its scenes and connections, or None if missing"""
+    if db.get_bind().dialect.name == "postgresql":
+        return _load_postgres(db, project_id)
+    # Portable path: plain column tuples, no ORM objects
+    project = db.execute(select(Project.__table__).where(Project.id == project_id)).mappings().first()
+    if project is None:
+        return None
+    scenes = db.execute(
+        select(Scene.__table__).where(Scene.project_id == project_id).order_by(Scene.created_at)
+    ).mappings().all()
+    connections = db.execute(
+        select(Connection.__table__).where(Connection.project_id == project_id).order_by(Connection.created_at)
+    ).mappings().all()
+    document = {
+        **row_to_dict(project),
+        "scenes": [row_to_dict(scene) for scene in scenes],
+        "connections": [row_to_dict(connection) for connection in connections],
+    }
+    return project["revision"], json.dumps(document, separators=(",", ":")).encode("utf-8")
@@ -0,0 +1,271 @@
+"""Routing image generations across providers
+
+Every provider gets a token bucket (IMAGE_PROVIDER_RATE_PER_MINUTE), its
+concurrency slots (IMAGE_PROVIDER_CONCURRENCY), a per-call timeout and a
+circuit breaker. Retryable failures (timeouts, 429s, 5xx) are retried with
+jittered exponential backoff, then the next provider in line is tried. With
+IMAGE_HEDGE_AFTER_MS set, a call still running after that long is raced
+against the next provider and whichever image arrives first is used.
+"""
+import contextvars
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Dict, List, Optional
+from dotenv import load_dotenv
+from utils.ai_image import PROVIDERS, IMAGE_PROVIDER_TIMEOUT_SECONDS, GeneratedImage, ProviderError, get_provider_order
+from utils.jobs import provider_slot
+from utils import metrics
+
+load_dotenv()
+
+# Comma separated provider=requests_per_minute pairs, e.g. "openai=50,stability=150" (unlisted providers are unlimited)
+IMAGE_PROVIDER_RATE_PER_MINUTE = os.getenv("IMAGE_PROVIDER_RATE_PER_MINUTE", "")
+# Extra attempts at a provider after a retryable failure, before moving on to the next one
+IMAGE_PROVIDER_RETRIES = int(os.getenv("IMAGE_PROVIDER_RETRIES", "2"))
+IMAGE_RETRY_BASE_SECONDS = float(os.getenv("IMAGE_RETRY_BASE_SECONDS", "0.5"))
+IMAGE_RETRY_MAX_SECONDS = float(os.getenv("IMAGE_RETRY_MAX_SECONDS", "8"))
+# Consecutive failures that open a provider's circuit, and how long it stays open before one probe call
+IMAGE_BREAKER_FAILURES = int(os.getenv("IMAGE_BREAKER_FAILURES", "5"))
+IMAGE_BREAKER_RESET_SECONDS = float(os.getenv("IMAGE_BREAKER_RESET_SECONDS", "30"))
+# Start the same generation on the next provider when a call runs this long (0 disables hedging)
+IMAGE_HEDGE_AFTER_MS = float(os.getenv("IMAGE_HEDGE_AFTER_MS", "0"))
+# Longest to queue for a rate-limited provider when another one could be tried instead
+IMAGE_RATE_LIMIT_WAIT_SECONDS = float(os.getenv("IMAGE_RATE_LIMIT_WAIT_SECONDS", "10"))
+# Overall budget for one generation across every retry and provider
+IMAGE_GENERATION_DEADLINE_SECONDS = float(os.getenv("IMAGE_GENERATION_DEADLINE_SECONDS", "180"))
+IMAGE_HEDGE_WORKERS = int(os.getenv("IMAGE_HEDGE_WORKERS", "16"))
+
+CLOSED, HALF_OPEN, OPEN = 0, 1, 2
+
+
+def _parse_rates(spec: str) -> Dict[str, float]:
+    rates = {}
+    for part in spec.split(","):
+        if "=" in part:
+            name, value = part.split("=", 1)
+            rates[name.strip().lower()] = float(value)
+    return rates
+
+
+class TokenBucket:
+    """Requests-per-minute limit that allows bursts of a tenth of a minute's allowance"""
+
+    def __init__(self, rate_per_minute: float):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1.0, rate_per_minute / 10.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, max_wait: float) -> bool:
+        """Take a token, sleeping until one is due if that is within max_wait seconds"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Tokens can go negative: each waiter reserves the next one due, so they are served in order
+            delay = max(0.0, (1.0 - self._tokens) / self.rate, self._paused_until - now)
+            if delay > max_wait:
+                return False
+            self._tokens -= 1.0
+        if delay > 0:
+            time.sleep(delay)
+        return True
+
+    def pause(self, seconds: float):
+        """Hand out no tokens for a while, e.g. when the provider answered 429 with Retry-After"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+class CircuitBreaker:
+    """Stops calling a provider after repeated failures, then lets one probe call through to test it"""
+
+    def __init__(self, failure_threshold: int = IMAGE_BREAKER_FAILURES, reset_seconds: float = IMAGE_BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead; a caller let through must report back or call release()"""
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+                self.state = HALF_OPEN
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def release(self):
+        """Give back a permission that went unused"""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self.state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    print(f"🔌 Image provider circuit opened after {self._failures} failures")
+                self.state = OPEN
+                self._opened_at = time.monotonic()
+
+
+class ProviderRouter:
+    """Generates an image with the first provider in line that can deliver one"""
+
+    def __init__(self):
+        self._rates = _parse_rates(IMAGE_PROVIDER_RATE_PER_MINUTE)
+        self._buckets: Dict[str, Optional[TokenBucket]] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _state(self, name: str):
+        with self._lock:
+            if name not in self._breakers:
+                self._breakers[name] = CircuitBreaker()
+                rate = self._rates.get(name)
+                self._buckets[name] = TokenBucket(rate) if rate else None
+            return self._breakers[name], self._buckets[name]
+
+    def breaker_states(self) -> Dict[str, int]:
+        with self._lock:
+            return {name: breaker.state for name, breaker in self._breakers.items()}
+
+    def _claim(self, name: str, max_wait: float) -> bool:
+        """Get past the provider's breaker and rate limit, counting why not if we can't"""
+        breaker, bucket = self._state(name)
+        if not breaker.allow():
+            metrics.IMAGE_PROVIDER_CALLS.inc(name, "circuit_open")
+            return False
+        waiting = time.perf_counter()
+        if bucket is not None and not bucket.acquire(max_wait):
+            breaker.release()
+            metrics.IMAGE_PROVIDER_CALLS.inc(name, "rate_limited")
+            return False
+        metrics.observe_stage("provider_wait", time.perf_counter() - waiting)
+        return True
+
+    def _call(self, name: str, prompt: str, deadline: float) -> GeneratedImage:
+        """One claimed call to one provider"""
+        breaker, bucket = self._state(name)
+        timeout = min(IMAGE_PROVIDER_TIMEOUT_SECONDS, deadline - time.monotonic())
+        try:
+            if timeout <= 0:
+                raise ProviderError(name, "generation deadline exceeded")
+            waiting = time.perf_counter()
+            with provider_slot(name):
+                metrics.observe_stage("provider_wait", time.perf_counter() - waiting)
+                with metrics.time_stage("provider"):
+                    image = PROVIDERS[name](prompt, timeout)
+        except ProviderError as e:
+            breaker.record_failure()
+            if e.retry_after and bucket is not None:
+                bucket.pause(e.retry_after)
+            metrics.IMAGE_PROVIDER_CALLS.inc(name, "retryable_error" if e.retryable else "error")
+            raise
+        except Exception as e:
+            breaker.record_failure()
+            metrics.IMAGE_PROVIDER_CALLS.inc(name, "error")
+            raise ProviderError(name, str(e))
+        breaker.record_success()
+        metrics.IMAGE_PROVIDER_CALLS.inc(name, "ok")
+        return image
+
+    def _submit(self, name: str, prompt: str, deadline: float):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=IMAGE_HEDGE_WORKERS, thread_name_prefix="image-hedge")
+        # Carry the request's metrics context into the worker thread
+        return self._executor.submit(contextvars.copy_context().run, self._call, name, prompt, deadline)
+
+    def _hedged_call(self, name: str, fallbacks: List[str], prompt: str, deadline: float) -> GeneratedImage:
+        """Call `name`, racing it against the first available fallback if it is slow"""
+        if not IMAGE_HEDGE_AFTER_MS or not fallbacks:
+            return self._call(name, prompt, deadline)
+        primary = self._submit(name, prompt, deadline)
+        try:
+            return primary.result(timeout=IMAGE_HEDGE_AFTER_MS / 1000)
+        except FutureTimeoutError:
+            pass
+        hedge_name = next((fallback for fallback in fallbacks if self._claim(fallback, max_wait=0)), None)
+        if hedge_name is None:
+            return primary.result()
+        metrics.IMAGE_PROVIDER_CALLS.inc(hedge_name, "hedged")
+        hedge = self._submit(hedge_name, prompt, deadline)
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    # The slower call keeps running on its thread; its image is discarded
+                    if future is hedge:
+                        metrics.IMAGE_PROVIDER_CALLS.inc(hedge_name, "hedge_won")
+                    return future.result()
+        # Both failed: retry (or move on) based on the primary's error
+        return primary.result()
+
+    def _backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+        # Full jitter, so retries from many workers don't arrive together
+        delay = random.uniform(0, min(IMAGE_RETRY_MAX_SECONDS, IMAGE_RETRY_BASE_SECONDS * 2 ** attempt))
+        return max(delay, retry_after or 0.0)
+
+    def generate(self, prompt: str, preferred: Optional[str] = None) -> GeneratedImage:
+        """Generate an image for a prompt, trying `preferred` first; raises once every provider has failed"""
+        order = get_provider_order(preferred)
+        if not order:
+            raise Exception("No image generation service configured. Set OPENAI_API_KEY or STABILITY_API_KEY")
+        deadline = time.monotonic() + IMAGE_GENERATION_DEADLINE_SECONDS
+        errors = []
+        for index, name in enumerate(order):
+            fallbacks = order[index + 1:]
+            for attempt in range(IMAGE_PROVIDER_RETRIES + 1):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                # Only the last provider in line is worth queueing for at length
+                if not self._claim(name, remaining if not fallbacks else min(remaining, IMAGE_RATE_LIMIT_WAIT_SECONDS)):
+                    errors.append(f"{name}: unavailable (circuit open or rate limited)")
+                    break
+                try:
+                    return self._hedged_call(name, fallbacks, prompt, deadline)
+                except ProviderError as e:
+                    print(f"⚠️  Image provider {name} failed (attempt {attempt + 1}): {str(e)}")
+                    errors.append(str(e))
+                    if not e.retryable or attempt == IMAGE_PROVIDER_RETRIES:
+                        break
+                    delay = self._backoff(attempt, e.retry_after)
+                    if fallbacks and delay > IMAGE_RATE_LIMIT_WAIT_SECONDS:
+                        break
+                    if time.monotonic() + delay >= deadline:
+                        break
+                    metrics.IMAGE_PROVIDER_CALLS.inc(name, "retry")
+                    time.sleep(delay)
+        raise Exception(f"All image providers failed: {'; '.join(errors[-4:])}")
+
+
+router = ProviderRouter()
+
+metrics.Gauge(
+    "image_provider_circuit_state", "Circuit breaker state per image provider (0 closed, 1 half-open, 2 open)", ("provider",),
+    collect=lambda: [((name,), state) for name, state in router.breaker_states().items()],
+)
@@ -0,0 +1,185 @@
+import asyncio
+import json
+import os
+import threading
+from typing import Dict, Optional, Set
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# memory:// (single process), redis://host:6379/0 (shared across workers) or fakeredis:// (Redis code path
+# against an in-process fake: like memory://, events never leave the process, so use it with one worker only)
+PUBSUB_URL = os.getenv("PUBSUB_URL", "memory://")
+# Messages buffered per subscriber before the oldest are dropped for a slow client
+PUBSUB_QUEUE_SIZE = int(os.getenv("PUBSUB_QUEUE_SIZE", "1000"))
+REDIS_CHANNEL_PREFIX = "storyboard:"
+
+
+class Subscription:
+    """Queue of messages for one subscriber, fed from any thread"""
+
+    def __init__(self, channel: str, maxsize: int = PUBSUB_QUEUE_SIZE):
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+
+    def push(self, message: dict):
+        self.loop.call_soon_threadsafe(self._put, message)
+
+    def _put(self, message: dict):
+        if self.queue.full():
+            # Slow consumer: drop the oldest message rather than grow without bound
+            self.queue.get_nowait()
+        self.queue.put_nowait(message)
+
+    async def get(self) -> dict:
+        return await self.queue.get()
+
+
+class InProcessBroker:
+    """Fans messages out to subscribers in this process"""
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self._lock = threading.Lock()
+
+    def publish(self, channel: str, message: dict):
+        """Publish from sync code (route handlers, worker threads)"""
+        self._deliver(channel, message)
+
+    async def publish_async(self, channel: str, message: dict):
+        """Publish from the event loop"""
+        self._deliver(channel, message)
+
+    async def subscribe(self, channel: str) -> Subscription:
+        subscription = Subscription(channel)
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.channel]
+
+    async def close(self):
+        pass
+
+    def _deliver(self, channel: str, message: dict):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            subscription.push(message)
+
+
+class RedisBroker(InProcessBroker):
+    """Relays messages through Redis pub/sub so every worker process sees them"""
+
+    def __init__(self, url: str):
+        super().__init__()
+        if url.startswith("fakeredis://"):
+            try:
+                import fakeredis
+            except ImportError:
+                raise Exception("PUBSUB_URL=fakeredis:// requires the fakeredis package (pip install fakeredis)")
+            # The fake server lives in this process, so other workers never see its messages
+            print("⚠️  PUBSUB_URL=fakeredis:// only delivers events within this process; use redis:// with more than one worker")
+            server = fakeredis.FakeServer()
+            self._redis = fakeredis.FakeRedis(server=server)
+            self._async_redis = fakeredis.FakeAsyncRedis(server=server)
+        else:
+            try:
+                import redis
+                import redis.asyncio
+            except ImportError:
+                raise Exception("PUBSUB_URL=redis:// requires the redis package (pip install redis)")
+            self._redis = redis.Redis.from_url(url)
+            self._async_redis = redis.asyncio.Redis.from_url(url)
+        self._listener: Optional[asyncio.Task] = None
+
+    def publish(self, channel: str, message: dict):
+        self._redis.publish(REDIS_CHANNEL_PREFIX + channel, json.dumps(message))
+
+    async def publish_async(self, channel: str, message: dict):
+        await self._async_redis.publish(REDIS_CHANNEL_PREFIX + channel, json.dumps(message))
+
+    async def subscribe(self, channel: str) -> Subscription:
+        subscription = await super().subscribe(channel)
+        if self._listener is None or self._listener.done():
+            # One Redis connection per process listens for every channel and fans out locally
+            self._listener = asyncio.create_task(self._listen())
+        return subscription
+
+    async def close(self):
+        if self._listener is not None:
+            self._listener.cancel()
+        await self._async_redis.aclose()
+        self._redis.close()
+
+    async def _listen(self):
+        pubsub = self._async_redis.pubsub()
+        await pubsub.psubscribe(REDIS_CHANNEL_PREFIX + "*")
+        try:
+            async for message in pubsub.listen():
+                if message["type"] != "pmessage":
+                    continue
+                channel = message["channel"]
+                if isinstance(channel, bytes):
+                    channel = channel.decode("utf-8")
+                self._deliver(channel[len(REDIS_CHANNEL_PREFIX):], json.loads(message["data"]))
+        finally:
+            await pubsub.aclose()
+
+
+_broker: Optional[InProcessBroker] = None
+_broker_lock = threading.Lock()
+
+
+def get_broker() -> InProcessBroker:
+    """Process-wide broker chosen by PUBSUB_URL"""
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            if PUBSUB_URL.startswith(("redis://", "rediss://", "fakeredis://")):
+                _broker = RedisBroker(PUBSUB_URL)
+            else:
+                _broker = InProcessBroker()
+        return _broker
+
+
+def project_channel(project_id: str) -> str:
+    return f"project:{project_id}"
+
+
+def publish_project_event(project_id: str, event_type: str, data: dict = None, revision: int = None, origin: str = None):
+    """Broadcast a committed change to everyone watching a project
+
+    Failures are logged and swallowed: the write has already been committed.
+    """
+    try:
+        get_broker().publish(project_channel(project_id), {
+            "type": event_type,
+            "project_id": project_id,
+            "revision": revision,
+            "origin": origin,
+            "data": data,
+        })
+    except Exception as e:
+        print(f"⚠️  WARNING: Failed to publish {event_type} for project {project_id}: {str(e)}")
+
+
+async def publish_project_event_async(project_id: str, event_type: str, data: dict = None, revision: int = None, origin: str = None):
+    """publish_project_event for async handlers; doesn't block the event loop on Redis"""
+    try:
+        await get_broker().publish_async(project_channel(project_id), {
+            "type": event_type,
+            "project_id": project_id,
+            "revision": revision,
+            "origin": origin,
+            "data": data,
+        })
+    except Exception as e:
+        print(f"⚠️  WARNING: Failed to publish {event_type} for project {project_id}: {str(e)}")
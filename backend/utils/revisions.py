@@ -0,0 +1,62 @@
+from typing import List, Optional
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+from models.project import Project
+from models.scene import Scene
+from models.connection import Connection
+from models.tombstone import Tombstone
+from utils import project_snapshot
+from utils.project_snapshot import row_to_dict
+
+def bump_project_revision(db: Session, project_id: str) -> int:
+    """Advance a project's revision inside the caller's transaction and return the new value (None if there is no such project)
+
+    The UPDATE holds the project row lock until commit, so concurrent writers to
+    one project get revisions in commit order and a changes cursor never skips a write.
+    """
+    revision = db.execute(
+        update(Project)
+        .where(Project.id == project_id)
+        .values(revision=Project.revision + 1, updated_at=func.now())
+        .returning(Project.revision)
+        .execution_options(synchronize_session=False)
+    ).scalar()
+    project_snapshot.invalidate(project_id)
+    return revision
+
+def record_deletes(db: Session, project_id: str, entity_type: str, entity_ids: List[str], revision: int):
+    """Leave tombstones for deleted scenes/connections so syncing clients can drop them"""
+    if entity_ids:
+        db.execute(insert(Tombstone), [
+            {"project_id": project_id, "entity_type": entity_type, "entity_id": entity_id, "revision": revision}
+            for entity_id in entity_ids
+        ])
+
+def load_changes(db: Session, project_id: str, since: int) -> Optional[dict]:
+    """Everything written to a project after revision `since`, or None if the project doesn't exist"""
+    project = db.execute(select(Project.__table__).where(Project.id == project_id)).mappings().first()
+    if project is None:
+        return None
+    if since >= project["revision"]:
+        # Nothing new: skip the scene/connection/tombstone scans entirely
+        return {"revision": project["revision"], "project": None, "scenes": [], "connections": [], "deleted": []}
+
+    scenes = db.execute(
+        select(Scene.__table__).where(Scene.project_id == project_id, Scene.revision > since).order_by(Scene.revision)
+    ).mappings().all()
+    connections = db.execute(
+        select(Connection.__table__).where(Connection.project_id == project_id, Connection.revision > since).order_by(Connection.revision)
+    ).mappings().all()
+    deleted = db.execute(
+        select(Tombstone.entity_type, Tombstone.entity_id, Tombstone.revision)
+        .where(Tombstone.project_id == project_id, Tombstone.revision > since)
+        .order_by(Tombstone.revision)
+    ).mappings().all()
+    return {
+        "revision": project["revision"],
+        "project": row_to_dict(project),
+        "scenes": [row_to_dict(scene) for scene in scenes],
+        "connections": [row_to_dict(connection) for connection in connections],
+        "deleted": [dict(tombstone) for tombstone in deleted],
+    }
@@ -1,37 +1,287 @@
-import boto3
 import os
-from botocore.exceptions import ClientError
+import shutil
+import time
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Iterator, List, Tuple
 from dotenv import load_dotenv
+from utils import clients
 
 load_dotenv()
 
-s3_client = boto3.client(
-    's3',
-    aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
-    aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
-    region_name=os.getenv("AWS_REGION", "us-east-1")
-)
+# STORAGE_BACKEND=local stores images on disk instead of S3 (dev/tests, no AWS credentials needed)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "s3").lower()
+LOCAL_STORAGE_DIR = os.getenv("LOCAL_STORAGE_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "local_s3"))
+LOCAL_STORAGE_BASE_URL = os.getenv("LOCAL_STORAGE_BASE_URL", "http://localhost:8000/local-s3")
+# MEDIA_PROXY=true hands out image URLs on this API's /media proxy instead of the bucket's own
+MEDIA_PROXY = os.getenv("MEDIA_PROXY", "false").lower() == "true"
+MEDIA_BASE_URL = os.getenv("MEDIA_BASE_URL", "http://localhost:8000/media")
+# Streaming uploads hold at most (S3_UPLOAD_MAX_CONCURRENCY + 1) parts of this size in memory
+S3_UPLOAD_CHUNK_SIZE = int(os.getenv("S3_UPLOAD_CHUNK_SIZE", str(8 * 1024 * 1024)))
+S3_UPLOAD_MAX_CONCURRENCY = int(os.getenv("S3_UPLOAD_MAX_CONCURRENCY", "2"))
+# Server-side CopyObject requests in flight when duplicating a project's images
+S3_COPY_CONCURRENCY = int(os.getenv("S3_COPY_CONCURRENCY", "16"))
+# Pooled connections in the shared S3 client (botocore's default of 10 is fewer than copies run at once)
+S3_MAX_POOL_CONNECTIONS = int(os.getenv("S3_MAX_POOL_CONNECTIONS", "32"))
+
+
+@lru_cache(maxsize=None)
+def get_transfer_config():
+    # boto3.s3.transfer is slow to import, so wait until the first upload
+    from boto3.s3.transfer import TransferConfig
+    return TransferConfig(
+        multipart_threshold=S3_UPLOAD_CHUNK_SIZE,
+        multipart_chunksize=S3_UPLOAD_CHUNK_SIZE,
+        max_concurrency=S3_UPLOAD_MAX_CONCURRENCY,
+    )
+
+
+def _client_error(code: str, message: str, operation: str):
+    # botocore is only imported once an error is raised, so importing this module stays cheap
+    from botocore.exceptions import ClientError
+    return ClientError({"Error": {"Code": code, "Message": message}}, operation)
+
+
+class LocalS3Client:
+    """Minimal stand-in for the boto3 S3 client that keeps objects on the local filesystem"""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, bucket: str, key: str) -> str:
+        path = os.path.normpath(os.path.join(self.root, bucket, key))
+        if not path.startswith(os.path.normpath(os.path.join(self.root, bucket)) + os.sep):
+            raise ValueError(f"Invalid object key: {key}")
+        return path
+
+    def put_object(self, Bucket: str, Key: str, Body: bytes, ContentType: str = None, **kwargs):
+        path = self._path(Bucket, Key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(Body)
+        return {}
+
+    def upload_fileobj(self, Fileobj, Bucket: str, Key: str, ExtraArgs: dict = None, Config=None, **kwargs):
+        path = self._path(Bucket, Key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        chunk_size = Config.multipart_chunksize if Config else S3_UPLOAD_CHUNK_SIZE
+        with open(path, "wb") as f:
+            shutil.copyfileobj(Fileobj, f, chunk_size)
+
+    def get_object(self, Bucket: str, Key: str, **kwargs):
+        path = self._path(Bucket, Key)
+        if not os.path.exists(path):
+            raise _client_error("NoSuchKey", f"{Key} not found", "GetObject")
+        return {"Body": open(path, "rb"), "ContentLength": os.path.getsize(path)}
+
+    def copy_object(self, Bucket: str, Key: str, CopySource: dict, **kwargs):
+        source = self._path(CopySource["Bucket"], CopySource["Key"])
+        if not os.path.exists(source):
+            raise _client_error("NoSuchKey", f"{CopySource['Key']} not found", "CopyObject")
+        path = self._path(Bucket, Key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        shutil.copyfile(source, path)
+        return {}
+
+    def head_object(self, Bucket: str, Key: str, **kwargs):
+        path = self._path(Bucket, Key)
+        if not os.path.exists(path):
+            raise _client_error("404", "Not Found", "HeadObject")
+        return {"ContentLength": os.path.getsize(path)}
+
+    def list_objects_v2(self, Bucket: str, Prefix: str = "", ContinuationToken: str = None, MaxKeys: int = 1000, **kwargs):
+        root = os.path.join(self.root, Bucket)
+        keys = []
+        # Only walk the directory the prefix points into
+        start = os.path.join(root, Prefix.rsplit("/", 1)[0]) if "/" in Prefix else root
+        for directory, _, filenames in os.walk(start):
+            directory_key = os.path.relpath(directory, root).replace(os.sep, "/")
+            directory_key = "" if directory_key == "." else directory_key + "/"
+            for filename in filenames:
+                key = directory_key + filename
+                if key.startswith(Prefix) and (ContinuationToken is None or key > ContinuationToken):
+                    keys.append(key)
+        keys.sort()
+        page = keys[:MaxKeys]
+        contents = []
+        for key in page:
+            stat = os.stat(self._path(Bucket, key))
+            contents.append({"Key": key, "Size": stat.st_size, "LastModified": datetime.fromtimestamp(stat.st_mtime, timezone.utc)})
+        response = {"Contents": contents, "KeyCount": len(contents), "IsTruncated": len(keys) > MaxKeys}
+        if response["IsTruncated"]:
+            response["NextContinuationToken"] = page[-1]
+        return response
+
+    def delete_objects(self, Bucket: str, Delete: dict, **kwargs):
+        deleted = []
+        for item in Delete["Objects"]:
+            path = self._path(Bucket, item["Key"])
+            if os.path.exists(path):
+                os.remove(path)
+            deleted.append({"Key": item["Key"]})
+        return {"Deleted": deleted, "Errors": []}
+
+    def close(self):
+        pass
+
+
+def _create_s3_client():
+    if STORAGE_BACKEND == "local":
+        return LocalS3Client(LOCAL_STORAGE_DIR)
+    import boto3
+    from botocore.config import Config
+    return boto3.client(
+        's3',
+        aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+        aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+        region_name=os.getenv("AWS_REGION", "us-east-1"),
+        # Point at MinIO/moto server etc. for local testing
+        endpoint_url=os.getenv("S3_ENDPOINT_URL") or None,
+        config=Config(max_pool_connections=S3_MAX_POOL_CONNECTIONS, tcp_keepalive=True),
+    )
+
+_s3_client = clients.register("s3", _create_s3_client, close=lambda client: client.close())
+
+def get_s3_client():
+    """The process-wide S3 client (or its local stand-in), created on first use"""
+    return _s3_client.get()
 
 BUCKET_NAME = os.getenv("S3_BUCKET_NAME", "storyboard-images")
 
-def upload_image_to_s3(image_data: bytes, filename: str, content_type: str = "image/png") -> str:
-    """Upload image to S3 and return public URL"""
+def bucket_url(filename: str) -> str:
+    """The object's URL on the bucket itself (or the local stand-in's static route)"""
+    if STORAGE_BACKEND == "local":
+        return f"{LOCAL_STORAGE_BASE_URL}/{filename}"
+    # Construct public URL
+    region = os.getenv('AWS_REGION', 'us-east-1')
+    # URL format: https://bucket-name.s3.region.amazonaws.com/key
+    return f"https://{BUCKET_NAME}.s3.{region}.amazonaws.com/{filename}"
+
+def media_url(filename: str) -> str:
+    """The object's URL on the /media proxy"""
+    return f"{MEDIA_BASE_URL}/{filename}"
+
+def get_public_url(filename: str) -> str:
+    """Return the public URL for an uploaded object key"""
+    return media_url(filename) if MEDIA_PROXY else bucket_url(filename)
+
+def object_urls(filename: str) -> List[str]:
+    """Every URL a scene may have stored for an object, whichever MEDIA_PROXY was set when it was saved"""
+    return [bucket_url(filename), media_url(filename)]
+
+def key_for_url(url: str):
+    """Object key behind a bucket or /media URL, or None for URLs outside the bucket"""
+    if not url:
+        return None
+    for prefix in object_urls(""):
+        if url.startswith(prefix) and len(url) > len(prefix):
+            return url[len(prefix):]
+    return None
+
+def object_exists(key: str) -> bool:
+    from botocore.exceptions import ClientError
     try:
-        # Upload to S3 (without ACL - use bucket policy for public access)
-        s3_client.put_object(
+        get_s3_client().head_object(Bucket=BUCKET_NAME, Key=key)
+        return True
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+            return False
+        raise
+
+def copy_objects(pairs: List[Tuple[str, str]]):
+    """Copy (source key, destination key) pairs within the bucket on the S3 side, in parallel
+
+    Content type and cache headers are copied with the object; no bytes pass through this process.
+    """
+    if not pairs:
+        return
+    def copy(pair):
+        get_s3_client().copy_object(Bucket=BUCKET_NAME, Key=pair[1], CopySource={"Bucket": BUCKET_NAME, "Key": pair[0]})
+    with ThreadPoolExecutor(max_workers=min(S3_COPY_CONCURRENCY, len(pairs))) as executor:
+        list(executor.map(copy, pairs))
+    print(f"📋 Copied {len(pairs)} objects in S3")
+
+# Most keys a single DeleteObjects request accepts
+S3_DELETE_BATCH_SIZE = 1000
+
+def list_object_pages(prefix: str) -> Iterator[List[dict]]:
+    """Objects under a key prefix ({"Key", "Size", "LastModified"}), a page of up to 1000 at a time in key order"""
+    token = None
+    while True:
+        kwargs = {"Bucket": BUCKET_NAME, "Prefix": prefix}
+        if token:
+            kwargs["ContinuationToken"] = token
+        response = get_s3_client().list_objects_v2(**kwargs)
+        if response.get("Contents"):
+            yield response["Contents"]
+        if not response.get("IsTruncated"):
+            return
+        token = response["NextContinuationToken"]
+
+def delete_objects(keys: List[str]) -> Tuple[List[str], List[dict]]:
+    """Delete keys with DeleteObjects, S3_DELETE_BATCH_SIZE per request; returns (deleted keys, errors)"""
+    deleted, errors = [], []
+    for start in range(0, len(keys), S3_DELETE_BATCH_SIZE):
+        batch = keys[start:start + S3_DELETE_BATCH_SIZE]
+        response = get_s3_client().delete_objects(
             Bucket=BUCKET_NAME,
-            Key=filename,
-            Body=image_data,
-            ContentType=content_type
+            Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True},
+        )
+        failed = {error["Key"] for error in response.get("Errors", [])}
+        errors.extend(response.get("Errors", []))
+        deleted.extend(key for key in batch if key not in failed)
+    return deleted, errors
+
+class MeteredReader:
+    """File-like wrapper that counts bytes, timing and the largest read served from a stream"""
+
+    def __init__(self, stream):
+        self._stream = stream
+        self.bytes = 0
+        self.peak_read_bytes = 0
+        # Time spent waiting on the source stream, as opposed to sending to S3
+        self.read_seconds = 0.0
+        self.started_at = time.perf_counter()
+
+    def read(self, size: int = -1) -> bytes:
+        started = time.perf_counter()
+        data = self._stream.read(size)
+        self.read_seconds += time.perf_counter() - started
+        self.bytes += len(data)
+        self.peak_read_bytes = max(self.peak_read_bytes, len(data))
+        return data
+
+    def stats(self) -> dict:
+        seconds = time.perf_counter() - self.started_at
+        return {
+            "bytes": self.bytes,
+            "seconds": seconds,
+            "read_seconds": self.read_seconds,
+            "throughput_bytes_per_second": self.bytes / seconds if seconds > 0 else 0.0,
+            "peak_read_bytes": self.peak_read_bytes,
+            "memory_bound_bytes": S3_UPLOAD_CHUNK_SIZE * (S3_UPLOAD_MAX_CONCURRENCY + 1),
+        }
+
+def upload_stream_to_s3(stream, filename: str, content_type: str = "image/png"):
+    """Stream a file-like object to S3 in bounded chunks and return (public URL, transfer stats)"""
+    from botocore.exceptions import ClientError
+    reader = MeteredReader(stream)
+    try:
+        get_s3_client().upload_fileobj(
+            reader,
+            BUCKET_NAME,
+            filename,
+            ExtraArgs={"ContentType": content_type},
+            Config=get_transfer_config(),
         )
-        
-        # Construct public URL
-        region = os.getenv('AWS_REGION', 'us-east-1')
-        # URL format: https://bucket-name.s3.region.amazonaws.com/key
-        public_url = f"https://{BUCKET_NAME}.s3.{region}.amazonaws.com/{filename}"
-        
-        print(f"✅ Successfully uploaded to S3: {public_url}")
-        return public_url
+        stats = reader.stats()
+        public_url = get_public_url(filename)
+        print(
+            f"✅ Streamed {stats['bytes']} bytes to S3 in {stats['seconds']:.2f}s "
+            f"({stats['throughput_bytes_per_second'] / 1e6:.2f} MB/s, peak read {stats['peak_read_bytes']} bytes): {public_url}"
+        )
+        return public_url, stats
     except ClientError as e:
         error_code = e.response.get('Error', {}).get('Code', 'Unknown')
         error_message = e.response.get('Error', {}).get('Message', str(e))
@@ -40,4 +290,3 @@ def upload_image_to_s3(image_data: bytes, filename: str, content_type: str = "im
     except Exception as e:
         print(f"❌ S3 upload error: {str(e)}")
         raise Exception(f"Failed to upload image to S3: {str(e)}")
-
@@ -0,0 +1,52 @@
+from typing import Dict, List, Optional
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from models.scene import Scene
+from utils.revisions import bump_project_revision
+
+LAYOUT_FIELDS = ("x", "y", "width", "height")
+
+def apply_layout_updates(db: Session, updates: Dict[str, dict], project_id: Optional[str] = None) -> List[str]:
+    """Write many scene layout changes in the caller's transaction and return the ids that changed
+
+    Takes one SELECT, one revision bump per project, and one UPDATE executemany
+    for each distinct set of changed columns (e.g. moves apart from resizes).
+
+    Raises LookupError listing unknown scene ids, or ValueError if project_id is
+    given and a scene belongs to another project.
+    """
+    if not updates:
+        return []
+    current = db.query(Scene.id, Scene.project_id, Scene.x, Scene.y, Scene.width, Scene.height).filter(
+        Scene.id.in_(list(updates))
+    ).all()
+    missing = set(updates) - {row.id for row in current}
+    if missing:
+        raise LookupError(sorted(missing))
+    if project_id and any(row.project_id != project_id for row in current):
+        raise ValueError("All scenes must belong to the given project")
+
+    changed = []
+    for row in current:
+        values = {
+            key: value for key, value in updates[row.id].items()
+            if key in LAYOUT_FIELDS and value is not None and getattr(row, key) != value
+        }
+        if values:
+            changed.append((row, values))
+    if not changed:
+        return []
+
+    # Lock project rows (and then scene rows) in id order, so concurrent updates spanning
+    # the same projects wait on each other instead of deadlocking
+    revisions = {
+        changed_project_id: bump_project_revision(db, changed_project_id)
+        for changed_project_id in sorted({row.project_id for row, _ in changed})
+    }
+    changed.sort(key=lambda item: item[0].id)
+
+    # ORM bulk UPDATE by primary key: one executemany per distinct set of changed columns
+    db.execute(update(Scene), [
+        {"id": row.id, "revision": revisions[row.project_id], **values} for row, values in changed
+    ])
+    return [row.id for row, _ in changed]
@@ -0,0 +1,116 @@
+"""Ranked search over scene prompts and captions
+
+On Postgres, whole words (stemmed, prompt ranked above caption) are matched
+through `scenes.search_vector` and its GIN index, and misspelt words through
+a pg_trgm index when the extension is installed (see 0005_scene_search).
+Elsewhere (SQLite) every query word must appear in the prompt or caption,
+found by scanning.
+"""
+import base64
+import json
+import os
+import re
+from typing import List, Optional
+from dotenv import load_dotenv
+from sqlalchemy import Float, case, func, literal, literal_column, or_, select, text
+from sqlalchemy.orm import Session
+from models.project import Project
+from models.scene import Scene
+
+load_dotenv()
+
+SEARCH_PAGE_SIZE = 20
+SEARCH_PAGE_SIZE_MAX = 100
+# Matches ranked per query; a word found in more scenes than this is ranked among those with the lowest ids
+SEARCH_RANK_CANDIDATES = int(os.getenv("SEARCH_RANK_CANDIDATES", "2000"))
+# Deepest result reachable by paging
+SEARCH_MAX_OFFSET = min(int(os.getenv("SEARCH_MAX_OFFSET", "1000")), SEARCH_RANK_CANDIDATES)
+# Set to false to match whole words only, even where pg_trgm is installed
+SEARCH_FUZZY = os.getenv("SEARCH_FUZZY", "true").lower() == "true"
+
+# Same expressions as the indexes in 0005_scene_search; literal ' ' and '' so they match them
+SEARCH_VECTOR = literal_column("scenes.search_vector")
+SEARCH_TEXT = Scene.prompt_text.op("||")(literal_column("' '")).op("||")(func.coalesce(Scene.caption, literal_column("''")))
+TEXT_SEARCH_CONFIG = literal_column("'english'::regconfig")
+
+_trigram_index: Optional[bool] = None
+
+def has_trigram_index(db: Session) -> bool:
+    """Whether the migration could create the pg_trgm index (checked once per process)"""
+    global _trigram_index
+    if _trigram_index is None:
+        _trigram_index = db.execute(
+            text("SELECT 1 FROM pg_indexes WHERE indexname = 'ix_scenes_search_text_trgm'")
+        ).scalar() is not None
+    return _trigram_index
+
+def encode_cursor(offset: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"offset": offset}).encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: str) -> int:
+    """Offset stored in a cursor; raises ValueError for anything else"""
+    try:
+        offset = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))["offset"]
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(offset, int) or not 0 <= offset <= SEARCH_MAX_OFFSET:
+        raise ValueError("Invalid cursor")
+    return offset
+
+def query_words(q: str) -> List[str]:
+    return re.findall(r"\w+", q.lower())[:16]
+
+def _postgres_match(q: str, fuzzy: bool):
+    tsquery = func.websearch_to_tsquery(TEXT_SEARCH_CONFIG, q)
+    matched = SEARCH_VECTOR.op("@@")(tsquery)
+    # Whole-word matches rank above every fuzzy-only match
+    score = case((matched, func.ts_rank_cd(SEARCH_VECTOR, tsquery, type_=Float) + 1.0), else_=0.0)
+    if not fuzzy:
+        return matched, score
+    similar = literal(q).op("<%")(SEARCH_TEXT)
+    return or_(matched, similar), score + func.word_similarity(q, SEARCH_TEXT, type_=Float)
+
+def _portable_match(q: str):
+    prompt = func.lower(Scene.prompt_text)
+    caption = func.lower(func.coalesce(Scene.caption, ""))
+    conditions, score = [], literal(0.0)
+    for word in query_words(q):
+        in_prompt, in_caption = func.instr(prompt, word) > 0, func.instr(caption, word) > 0
+        conditions.append(or_(in_prompt, in_caption))
+        score = score + case((in_prompt, 2.0), else_=0.0) + case((in_caption, 1.0), else_=0.0)
+    return conditions, score
+
+def search_query(db: Session, q: str, project_id: Optional[str], limit: int, offset: int):
+    """SELECT for one page of matching scenes, best first (fetches limit + 1 rows to detect a next page)
+
+    Only the SEARCH_RANK_CANDIDATES matches with the lowest ids are scored, so
+    a query for a word that is in half of all scenes costs about the same as
+    one for a rare word, and every page of a query ranks the same candidates.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        condition, score = _postgres_match(q, SEARCH_FUZZY and has_trigram_index(db))
+        conditions = [condition]
+    else:
+        conditions, score = _portable_match(q)
+    candidates = select(Scene.id).where(*conditions)
+    if project_id:
+        candidates = candidates.where(Scene.project_id == project_id)
+    candidates = candidates.order_by(Scene.id).limit(SEARCH_RANK_CANDIDATES).subquery("candidates")
+    # Score the candidates and pick the page from (id, score) pairs before loading the rest of each row
+    page = (
+        select(Scene.id, score.label("score"))
+        .join(candidates, candidates.c.id == Scene.id)
+        .order_by(score.desc(), Scene.id)
+        .limit(limit + 1)
+        .offset(offset)
+        .subquery("page")
+    )
+    return (
+        select(
+            Scene.id, Scene.project_id, Project.title.label("project_title"), Scene.prompt_text, Scene.caption,
+            Scene.image_url, Scene.thumbnails, page.c.score,
+        )
+        .join(page, page.c.id == Scene.id)
+        .join(Project, Project.id == Scene.project_id)
+        .order_by(page.c.score.desc(), Scene.id)
+    )
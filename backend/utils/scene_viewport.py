@@ -0,0 +1,92 @@
+"""Viewport queries: the scenes of a project that overlap a rectangle of the board
+
+On Postgres the overlap test is written as `box && box` over the same
+expression as the GiST index ix_scenes_bounds, so only the scenes near the
+viewport are read. 0008_scene_bounds_by_project leads that index with
+project_id when btree_gist is available. Without it the index holds only the
+box, so every project's scenes in the area are read and then filtered by
+project, which costs most where boards share coordinates around the origin.
+Elsewhere (SQLite) it is four range comparisons over the project's scenes.
+"""
+import math
+from typing import Optional, Sequence, Tuple
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from models.scene import Scene
+
+# Summary labels are cut to this many characters
+SUMMARY_LABEL_LENGTH = 80
+DETAILS = ("full", "summary")
+
+SUMMARY_COLUMNS = (Scene.id, Scene.x, Scene.y, Scene.width, Scene.height, Scene.prompt_text, Scene.caption,
+                   Scene.image_url, Scene.thumbnails, Scene.revision)
+
+# Same expression as ix_scenes_bounds (0006_scene_viewport, 0008_scene_bounds_by_project), so the index is used
+SCENE_BOUNDS = func.box(func.point(Scene.x, Scene.y), func.point(Scene.x + Scene.width, Scene.y + Scene.height))
+
+BBox = Tuple[float, float, float, float]
+
+
+def parse_bbox(value: str) -> BBox:
+    """`min_x,min_y,max_x,max_y` as floats; raises ValueError for anything else"""
+    try:
+        bbox = tuple(float(part) for part in value.split(","))
+    except ValueError:
+        raise ValueError("bbox must be min_x,min_y,max_x,max_y")
+    if len(bbox) != 4 or not all(math.isfinite(part) for part in bbox):
+        raise ValueError("bbox must be min_x,min_y,max_x,max_y")
+    if bbox[0] > bbox[2] or bbox[1] > bbox[3]:
+        raise ValueError("bbox min must not be greater than max")
+    return bbox
+
+
+def overlaps(dialect: str, bbox: BBox):
+    """Condition for scenes overlapping the box, edges included"""
+    min_x, min_y, max_x, max_y = bbox
+    if dialect == "postgresql":
+        return SCENE_BOUNDS.op("&&")(func.box(func.point(min_x, min_y), func.point(max_x, max_y)))
+    return (Scene.x <= max_x) & (Scene.x + Scene.width >= min_x) & (Scene.y <= max_y) & (Scene.y + Scene.height >= min_y)
+
+
+def scenes_query(dialect: str, project_id: str, bbox: Optional[BBox] = None, columns: Optional[Sequence] = None):
+    """Scenes of a project (those in `bbox` if given), oldest first so later scenes draw on top
+
+    Selects Scene objects, or just `columns` if given.
+    """
+    query = select(Scene) if columns is None else select(*columns)
+    query = query.where(Scene.project_id == project_id)
+    if bbox is not None:
+        query = query.where(overlaps(dialect, bbox))
+    return query.order_by(Scene.created_at, Scene.id)
+
+
+def _smallest_thumbnail(thumbnails: Optional[dict]) -> Optional[str]:
+    webp = (thumbnails or {}).get("webp")
+    if not webp:
+        return None
+    return webp[min(webp, key=int)]
+
+
+def summary(row) -> dict:
+    """What a zoomed-out board draws for a scene: its box, a short label and its smallest thumbnail"""
+    label = row.caption or row.prompt_text
+    if len(label) > SUMMARY_LABEL_LENGTH:
+        label = label[:SUMMARY_LABEL_LENGTH - 1] + "…"
+    return {
+        "id": row.id,
+        "x": row.x,
+        "y": row.y,
+        "width": row.width,
+        "height": row.height,
+        "label": label,
+        "thumbnail_url": _smallest_thumbnail(row.thumbnails) or row.image_url,
+        "revision": row.revision,
+    }
+
+
+def get_scenes(db: Session, project_id: str, bbox: Optional[BBox] = None, detail: str = "full") -> list:
+    """Scene rows, or summary dicts when `detail` is "summary" """
+    query = scenes_query(db.get_bind().dialect.name, project_id, bbox, None if detail == "full" else SUMMARY_COLUMNS)
+    if detail == "full":
+        return db.scalars(query).all()
+    return [summary(row) for row in db.execute(query)]
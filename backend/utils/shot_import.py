@@ -0,0 +1,204 @@
+"""Bulk import of shot lists (JSON Lines or CSV) into a project's scenes
+
+Rows are read from a stream and validated a batch at a time, so memory stays
+flat however long the list is. Each batch is written with COPY on Postgres
+(executemany INSERTs elsewhere), and consecutive shots are chained with
+connections in file order. The whole import is one transaction at one
+project revision: any invalid row rolls it back.
+"""
+import csv
+import io
+import json
+import os
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import IO, Iterator, List, Optional, Tuple
+from dotenv import load_dotenv
+from pydantic import AliasChoices, BaseModel, ConfigDict, Field, TypeAdapter, ValidationError, field_validator
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session
+from models.scene import Scene
+from models.connection import Connection
+from utils.revisions import bump_project_revision
+
+load_dotenv()
+
+# Rows validated and written per round trip
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+# Longest shot list accepted in one import
+IMPORT_MAX_ROWS = int(os.getenv("IMPORT_MAX_ROWS", "100000"))
+IMPORT_MAX_ERRORS = 20
+# Shots without x/y are laid out left to right in rows of this many, below the existing scenes
+IMPORT_GRID_COLUMNS = 10
+IMPORT_GRID_GAP = 50.0
+
+FORMATS = ("jsonl", "csv")
+SCENE_COLUMNS = ("id", "project_id", "prompt_text", "caption", "image_url", "x", "y", "width", "height", "created_at", "revision")
+CONNECTION_COLUMNS = ("id", "project_id", "from_scene_id", "to_scene_id", "label", "created_at", "revision")
+
+
+class ShotRow(BaseModel):
+    """One shot; columns other than these (shot numbers, notes...) are ignored"""
+
+    model_config = ConfigDict(extra="ignore")
+
+    prompt_text: str = Field(min_length=1, validation_alias=AliasChoices("prompt_text", "prompt"))
+    caption: Optional[str] = None
+    image_url: Optional[str] = None
+    x: Optional[float] = None
+    y: Optional[float] = None
+    width: float = 300.0
+    height: float = 200.0
+    # Label of the connection from the previous shot to this one
+    connection_label: Optional[str] = None
+
+    @field_validator("prompt_text")
+    @classmethod
+    def strip_prompt(cls, value: str) -> str:
+        value = value.strip()
+        if not value:
+            raise ValueError("prompt_text is blank")
+        return value
+
+
+_batch_adapter = TypeAdapter(List[ShotRow])
+
+
+class ShotImportError(Exception):
+    """Raised with up to IMPORT_MAX_ERRORS {"line", "error"} entries when rows are invalid"""
+
+    def __init__(self, errors: List[dict]):
+        super().__init__(f"{len(errors)} invalid rows")
+        self.errors = errors
+
+
+def _rows(stream: IO[bytes], fmt: str) -> Iterator[Tuple[int, object]]:
+    """(line number, parsed row or error message) for each non-empty row"""
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        for row in reader:
+            # Blank cells mean "not given", so defaults apply
+            yield reader.line_num, {key: value for key, value in row.items() if key and value not in (None, "")}
+        return
+    for line_number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except ValueError as e:
+            yield line_number, f"invalid JSON: {str(e)}"
+
+
+def _batches(rows: Iterator[Tuple[int, object]]) -> Iterator[List[Tuple[int, object]]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _validate(batch: List[Tuple[int, object]], errors: List[dict]) -> List[ShotRow]:
+    """Validate a batch in one pass, recording errors by line number"""
+    parsed = [(line, row) for line, row in batch if not isinstance(row, str)]
+    errors.extend({"line": line, "error": row} for line, row in batch if isinstance(row, str))
+    try:
+        return _batch_adapter.validate_python([row for _, row in parsed])
+    except ValidationError as e:
+        for error in e.errors():
+            index, field = error["loc"][0], ".".join(str(part) for part in error["loc"][1:])
+            errors.append({"line": parsed[index][0], "error": f"{field}: {error['msg']}" if field else error["msg"]})
+        return []
+
+
+def _copy(db: Session, table: str, columns: Tuple[str, ...], rows: List[tuple]) -> bool:
+    """COPY rows into a table on the session's connection; False if the driver can't (e.g. not psycopg2)"""
+    cursor = db.connection().connection.cursor()
+    try:
+        if not hasattr(cursor, "copy_expert"):
+            return False
+        buffer = io.StringIO()
+        # Unquoted empty fields are NULL in COPY's CSV format, which is how csv writes None
+        csv.writer(buffer).writerows(rows)
+        buffer.seek(0)
+        cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+        return True
+    finally:
+        cursor.close()
+
+
+def _write(db: Session, model, columns: Tuple[str, ...], rows: List[tuple]):
+    if not rows:
+        return
+    if db.get_bind().dialect.name == "postgresql" and _copy(db, model.__tablename__, columns, rows):
+        return
+    db.execute(insert(model), [dict(zip(columns, row)) for row in rows])
+
+
+def import_shot_list(db: Session, project_id: str, stream: IO[bytes], fmt: str = "jsonl", chain: bool = True) -> Optional[dict]:
+    """Import a shot list into a project and commit; None if the project doesn't exist
+
+    Raises ShotImportError (after rolling back) if any row is invalid.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format {fmt!r}; expected one of {', '.join(FORMATS)}")
+    started = time.perf_counter()
+    revision = bump_project_revision(db, project_id)
+    if revision is None:
+        return None
+    bottom = db.execute(select(func.max(Scene.y + Scene.height)).where(Scene.project_id == project_id)).scalar()
+    top = bottom + IMPORT_GRID_GAP * 2 if bottom is not None else 0.0
+    # Rows are stamped a microsecond apart so created_at keeps file order
+    created_at = datetime.now(timezone.utc)
+
+    errors: List[dict] = []
+    scene_count = connection_count = 0
+    previous_id = None
+    try:
+        for batch in _batches(_rows(stream, fmt)):
+            shots = _validate(batch, errors)
+            if scene_count + len(batch) > IMPORT_MAX_ROWS:
+                errors.append({"line": batch[-1][0], "error": f"more than {IMPORT_MAX_ROWS} rows"})
+            if errors:
+                # Keep reading to report more problems, but stop writing
+                if len(errors) >= IMPORT_MAX_ERRORS or scene_count + len(batch) > IMPORT_MAX_ROWS:
+                    break
+                scene_count += len(batch)
+                continue
+
+            scenes, connections = [], []
+            for shot in shots:
+                scene_id = str(uuid.uuid4())
+                stamp = created_at + timedelta(microseconds=scene_count)
+                column, row = scene_count % IMPORT_GRID_COLUMNS, scene_count // IMPORT_GRID_COLUMNS
+                x = shot.x if shot.x is not None else column * (shot.width + IMPORT_GRID_GAP)
+                y = shot.y if shot.y is not None else top + row * (shot.height + IMPORT_GRID_GAP)
+                scenes.append((scene_id, project_id, shot.prompt_text, shot.caption, shot.image_url,
+                               x, y, shot.width, shot.height, stamp, revision))
+                if chain and previous_id is not None:
+                    connections.append((str(uuid.uuid4()), project_id, previous_id, scene_id, shot.connection_label, stamp, revision))
+                previous_id = scene_id
+                scene_count += 1
+            _write(db, Scene, SCENE_COLUMNS, scenes)
+            _write(db, Connection, CONNECTION_COLUMNS, connections)
+            connection_count += len(connections)
+        if errors:
+            raise ShotImportError(sorted(errors, key=lambda error: error["line"])[:IMPORT_MAX_ERRORS])
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    seconds = time.perf_counter() - started
+    print(f"📥 Imported {scene_count} scenes and {connection_count} connections into {project_id} in {seconds:.2f}s")
+    return {
+        "project_id": project_id,
+        "scene_count": scene_count,
+        "connection_count": connection_count,
+        "revision": revision,
+        "seconds": round(seconds, 3),
+    }
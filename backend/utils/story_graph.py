@@ -0,0 +1,375 @@
+import heapq
+import json
+import os
+import threading
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional, Set, Tuple
+from dotenv import load_dotenv
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from models.scene import Scene
+from models.connection import Connection
+from models.tombstone import Tombstone
+
+load_dotenv()
+
+# Number of project graphs kept in memory per process
+STORY_GRAPH_CACHE_SIZE = int(os.getenv("STORY_GRAPH_CACHE_SIZE", "128"))
+# Set to false to reject connections that would close a loop in the story
+STORY_GRAPH_ALLOW_CYCLES = os.getenv("STORY_GRAPH_ALLOW_CYCLES", "true").lower() == "true"
+# Shortest-path searches remembered per graph revision
+PATH_CACHE_SIZE = 256
+
+
+class StoryGraph:
+    """Scenes and connections of one project as adjacency sets
+
+    Kept in memory and brought forward to newer revisions from the
+    revision/tombstone columns, so an edit costs a few indexed rows rather
+    than a reload. Scenes are numbered in creation order, which doubles as the
+    tie-break wherever the narrative order is otherwise free. Analyses are
+    computed once per change.
+    """
+
+    def __init__(self, revision: int):
+        self.revision = revision
+        self.lock = threading.Lock()
+        # scene id -> slot; slots are never reused, so dict order is creation order
+        self.scenes: Dict[str, int] = {}
+        self.scene_ids: List[Optional[str]] = []
+        self.successors: List[Set[int]] = []
+        self.predecessors: List[Set[int]] = []
+        self.edges: Dict[str, Tuple[int, int]] = {}
+        self._edge_ids: Dict[Tuple[int, int], str] = {}
+        self._analysis: Optional[dict] = None
+        self._body: Optional[Tuple[int, bytes]] = None
+        self._paths: "OrderedDict[Tuple[str, str], Optional[List[str]]]" = OrderedDict()
+
+    def add_scene(self, scene_id: str) -> int:
+        slot = self.scenes.get(scene_id)
+        if slot is None:
+            slot = self.scenes[scene_id] = len(self.scene_ids)
+            self.scene_ids.append(scene_id)
+            self.successors.append(set())
+            self.predecessors.append(set())
+            self._changed()
+        return slot
+
+    def remove_scene(self, scene_id: str):
+        slot = self.scenes.pop(scene_id, None)
+        if slot is None:
+            return
+        for next_slot in list(self.successors[slot]):
+            self.remove_edge(self._edge_ids[(slot, next_slot)])
+        for previous_slot in list(self.predecessors[slot]):
+            self.remove_edge(self._edge_ids[(previous_slot, slot)])
+        self.scene_ids[slot] = None
+        self._changed()
+
+    def add_edge(self, connection_id: str, from_id: str, to_id: str):
+        if connection_id in self.edges:
+            return
+        edge = (self.add_scene(from_id), self.add_scene(to_id))
+        if edge in self._edge_ids:
+            # A deleted duplicate whose tombstone hasn't been applied yet
+            self.remove_edge(self._edge_ids[edge])
+        self.edges[connection_id] = edge
+        self._edge_ids[edge] = connection_id
+        self.successors[edge[0]].add(edge[1])
+        self.predecessors[edge[1]].add(edge[0])
+        self._changed()
+
+    def remove_edge(self, connection_id: str):
+        edge = self.edges.pop(connection_id, None)
+        if edge is None:
+            return
+        del self._edge_ids[edge]
+        self.successors[edge[0]].discard(edge[1])
+        self.predecessors[edge[1]].discard(edge[0])
+        self._changed()
+
+    def _changed(self):
+        self._analysis = None
+        self._body = None
+        self._paths.clear()
+
+    def _topological_order(self, loops: List[List[int]] = ()) -> List[int]:
+        """Kahn's algorithm, earliest created first among ready scenes
+
+        Each of `loops` (sorted slot lists) is collapsed to a single node and
+        emitted whole once everything leading into it is done. Scenes on or
+        after a loop that isn't listed are left out.
+        """
+        successors = self.successors
+        predecessors = self.predecessors
+        leader_of = list(range(len(self.scene_ids)))
+        members = {}
+        for loop in loops:
+            members[loop[0]] = loop
+            for slot in loop:
+                leader_of[slot] = loop[0]
+        blockers = [0] * len(self.scene_ids)
+        ready = []
+        for slot in self.scenes.values():
+            if slot in members:
+                blockers[slot] = sum(1 for member in members[slot] for previous in predecessors[member] if leader_of[previous] != slot)
+            elif leader_of[slot] == slot:
+                blockers[slot] = len(predecessors[slot])
+            else:
+                continue
+            if not blockers[slot]:
+                ready.append(slot)
+        heapq.heapify(ready)
+        order = []
+        while ready:
+            leader = heapq.heappop(ready)
+            for slot in members.get(leader, (leader,)):
+                order.append(slot)
+                for next_slot in successors[slot]:
+                    next_leader = leader_of[next_slot]
+                    if next_leader != leader:
+                        blockers[next_leader] -= 1
+                        if not blockers[next_leader]:
+                            heapq.heappush(ready, next_leader)
+        return order
+
+    def _loop_candidates(self, placed: List[int]) -> Set[int]:
+        """Scenes that might be on a loop: those Kahn couldn't place, minus
+        any from which no loop can be reached again (peeled off from the ends)"""
+        placed = set(placed)
+        candidates = {slot for slot in self.scenes.values() if slot not in placed}
+        # Everything after a stuck scene is stuck too, so all successors count
+        remaining = {slot: len(self.successors[slot]) for slot in candidates}
+        queue = deque(slot for slot, count in remaining.items() if not count)
+        while queue:
+            slot = queue.popleft()
+            candidates.discard(slot)
+            for previous in self.predecessors[slot]:
+                if previous in candidates:
+                    remaining[previous] -= 1
+                    if not remaining[previous]:
+                        queue.append(previous)
+        return candidates
+
+    def strongly_connected(self, slots: Set[int]) -> List[List[int]]:
+        """Tarjan's algorithm on the subgraph of `slots`
+
+        Iterative, so long chains don't hit the recursion limit.
+        """
+        successors = self.successors
+        index = [-1] * len(self.scene_ids)
+        lowlink = [0] * len(self.scene_ids)
+        on_stack = [False] * len(self.scene_ids)
+        stack: List[int] = []
+        components = []
+        counter = 0
+        for root in sorted(slots):
+            if index[root] >= 0:
+                continue
+            index[root] = lowlink[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack[root] = True
+            work = [(root, iter(successors[root]))]
+            while work:
+                node, children = work[-1]
+                for child in children:
+                    if child not in slots:
+                        continue
+                    if index[child] < 0:
+                        index[child] = lowlink[child] = counter
+                        counter += 1
+                        stack.append(child)
+                        on_stack[child] = True
+                        work.append((child, iter(successors[child])))
+                        break
+                    if on_stack[child] and index[child] < lowlink[node]:
+                        lowlink[node] = index[child]
+                else:
+                    work.pop()
+                    if work and lowlink[node] < lowlink[work[-1][0]]:
+                        lowlink[work[-1][0]] = lowlink[node]
+                    if lowlink[node] == index[node]:
+                        component = []
+                        while True:
+                            member = stack.pop()
+                            on_stack[member] = False
+                            component.append(member)
+                            if member == node:
+                                break
+                        components.append(sorted(component))
+        return components
+
+    def analyze(self) -> dict:
+        """Narrative order, loops, branch/merge points and dead scenes"""
+        if self._analysis is not None:
+            return self._analysis
+        order = self._topological_order()
+        cycles = []
+        if len(order) < len(self.scenes):
+            # Only a graph with loops pays for Tarjan, and only around the loops
+            cycles = [component for component in self.strongly_connected(self._loop_candidates(order)) if len(component) > 1]
+            cycles.sort()
+            order = self._topological_order(cycles)
+
+        isolated, starts, ends, branches, merges = [], [], [], [], []
+        for slot in order:
+            outgoing = len(self.successors[slot])
+            incoming = len(self.predecessors[slot])
+            if not outgoing and not incoming:
+                isolated.append(slot)
+                continue
+            if not incoming:
+                starts.append(slot)
+            if not outgoing:
+                ends.append(slot)
+            if outgoing > 1:
+                branches.append(slot)
+            if incoming > 1:
+                merges.append(slot)
+        unreachable = []
+        if cycles:
+            # Without loops every connected scene descends from a start
+            reachable = self._reachable(starts)
+            unreachable = [slot for slot in order if slot not in reachable and (self.successors[slot] or self.predecessors[slot])]
+
+        ids = self.scene_ids
+        self._analysis = {
+            "order": [ids[slot] for slot in order],
+            "has_cycles": bool(cycles),
+            "cycles": [[ids[slot] for slot in component] for component in cycles],
+            "starts": [ids[slot] for slot in starts],
+            "ends": [ids[slot] for slot in ends],
+            "branches": [ids[slot] for slot in branches],
+            "merges": [ids[slot] for slot in merges],
+            "isolated": [ids[slot] for slot in isolated],
+            # Connected scenes no start leads to: closed loops and whatever only they lead to
+            "unreachable": [ids[slot] for slot in unreachable],
+        }
+        return self._analysis
+
+    def body(self) -> bytes:
+        """analyze() with the revision as JSON, serialized once per revision"""
+        if self._body is None or self._body[0] != self.revision:
+            document = {"revision": self.revision, **self.analyze()}
+            self._body = (self.revision, json.dumps(document, separators=(",", ":")).encode("utf-8"))
+        return self._body[1]
+
+    def _reachable(self, start_slots: List[int]) -> Set[int]:
+        successors = self.successors
+        seen = set(start_slots)
+        queue = deque(seen)
+        while queue:
+            for next_slot in successors[queue.popleft()]:
+                if next_slot not in seen:
+                    seen.add(next_slot)
+                    queue.append(next_slot)
+        return seen
+
+    def shortest_path(self, from_id: str, to_id: str) -> Optional[List[str]]:
+        """Fewest connections from one scene to another (breadth-first), or None"""
+        key = (from_id, to_id)
+        if key in self._paths:
+            self._paths.move_to_end(key)
+            return self._paths[key]
+        source, target = self.scenes[from_id], self.scenes[to_id]
+        came_from = {source: None}
+        queue = deque([source])
+        path = None
+        while queue:
+            slot = queue.popleft()
+            if slot == target:
+                path = []
+                while slot is not None:
+                    path.append(self.scene_ids[slot])
+                    slot = came_from[slot]
+                path.reverse()
+                break
+            for next_slot in self.successors[slot]:
+                if next_slot not in came_from:
+                    came_from[next_slot] = slot
+                    queue.append(next_slot)
+        self._paths[key] = path
+        while len(self._paths) > PATH_CACHE_SIZE:
+            self._paths.popitem(last=False)
+        return path
+
+    def creates_cycle(self, from_id: str, to_id: str) -> bool:
+        """Whether a new from -> to connection would close a loop"""
+        if from_id not in self.scenes or to_id not in self.scenes:
+            return False
+        return self.shortest_path(to_id, from_id) is not None
+
+
+_cache: "OrderedDict[str, StoryGraph]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _load(db: Session, project_id: str, revision: int) -> StoryGraph:
+    graph = StoryGraph(revision)
+    for scene_id, in db.execute(
+        select(Scene.id).where(Scene.project_id == project_id).order_by(Scene.created_at, Scene.id)
+    ):
+        graph.add_scene(scene_id)
+    for connection_id, from_id, to_id in db.execute(
+        select(Connection.id, Connection.from_scene_id, Connection.to_scene_id).where(Connection.project_id == project_id)
+    ):
+        graph.add_edge(connection_id, from_id, to_id)
+    return graph
+
+
+def _catch_up(db: Session, project_id: str, graph: StoryGraph, revision: int):
+    """Apply the tombstones, new scenes and new connections written since the graph's revision
+
+    Deletes are read first: anything the later reads return was still live
+    after them. Every step is idempotent, so rows committed beyond `revision`
+    are simply applied again on the next catch-up.
+    """
+    since = graph.revision
+    for entity_type, entity_id in db.execute(
+        select(Tombstone.entity_type, Tombstone.entity_id)
+        .where(Tombstone.project_id == project_id, Tombstone.revision > since)
+        .order_by(Tombstone.revision)
+    ):
+        if entity_type == "connection":
+            graph.remove_edge(entity_id)
+        elif entity_type == "scene":
+            graph.remove_scene(entity_id)
+    for scene_id, in db.execute(
+        select(Scene.id)
+        .where(Scene.project_id == project_id, Scene.revision > since)
+        .order_by(Scene.created_at, Scene.id)
+    ):
+        graph.add_scene(scene_id)
+    for connection_id, from_id, to_id in db.execute(
+        select(Connection.id, Connection.from_scene_id, Connection.to_scene_id)
+        .where(Connection.project_id == project_id, Connection.revision > since)
+    ):
+        graph.add_edge(connection_id, from_id, to_id)
+    # Edits that leave the graph alone (captions, positions) keep the cached analysis
+    graph.revision = revision
+
+
+def get_graph(db: Session, project_id: str, revision: int) -> StoryGraph:
+    """The project's graph as of at least `revision`; the caller holds graph.lock while reading it"""
+    with _cache_lock:
+        graph = _cache.get(project_id)
+        if graph is not None:
+            _cache.move_to_end(project_id)
+    if graph is None:
+        graph = _load(db, project_id, revision)
+        with _cache_lock:
+            _cache[project_id] = graph
+            _cache.move_to_end(project_id)
+            while len(_cache) > STORY_GRAPH_CACHE_SIZE:
+                _cache.popitem(last=False)
+        return graph
+    with graph.lock:
+        if graph.revision < revision:
+            _catch_up(db, project_id, graph, revision)
+    return graph
+
+
+def invalidate(project_id: str):
+    with _cache_lock:
+        _cache.pop(project_id, None)
@@ -0,0 +1,121 @@
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+from PIL import Image, features
+from utils.s3 import get_s3_client, BUCKET_NAME, get_public_url, key_for_url, object_exists
+
+load_dotenv()
+
+THUMBNAILS_ENABLED = os.getenv("THUMBNAILS_ENABLED", "true").lower() == "true"
+# Thumbnail widths in pixels; height follows the original aspect ratio
+THUMBNAIL_WIDTHS = [int(width) for width in os.getenv("THUMBNAIL_WIDTHS", "256,512").split(",") if width.strip()]
+THUMBNAIL_FORMATS = [fmt.strip().lower() for fmt in os.getenv("THUMBNAIL_FORMATS", "webp,avif").split(",") if fmt.strip()]
+THUMBNAIL_QUALITY = int(os.getenv("THUMBNAIL_QUALITY", "70"))
+# Encoder processes; encoding is CPU-bound and would otherwise hold the GIL in the API process
+THUMBNAIL_WORKERS = int(os.getenv("THUMBNAIL_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+
+CONTENT_TYPES = {"webp": "image/webp", "avif": "image/avif", "jpeg": "image/jpeg", "png": "image/png"}
+# Derivative keys are unique per original, so they never change once written
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def supported_formats() -> List[str]:
+    """THUMBNAIL_FORMATS that this Pillow build can encode"""
+    return [fmt for fmt in THUMBNAIL_FORMATS if fmt in ("jpeg", "png") or features.check(fmt)]
+
+
+def derivative_key(s3_key: str, width: int, fmt: str) -> str:
+    """{project_id}/{uuid}.png -> {project_id}/{uuid}_w256.webp"""
+    base, _ = os.path.splitext(s3_key)
+    return f"{base}_w{width}.{fmt}"
+
+
+def render_derivatives(data: bytes, widths: List[int], formats: List[str], quality: int) -> Dict[Tuple[int, str], bytes]:
+    """Resize and encode an image at each width/format (runs in a pool process)"""
+    rendered = {}
+    with Image.open(io.BytesIO(data)) as image:
+        image.load()
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+        for width in widths:
+            # Never upscale: a small original is re-encoded at its own size
+            target_width = min(width, image.width)
+            target_height = max(1, round(image.height * target_width / image.width))
+            resized = image.resize((target_width, target_height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+            for fmt in formats:
+                buffer = io.BytesIO()
+                resized.save(buffer, format=fmt.upper(), quality=quality)
+                rendered[(width, fmt)] = buffer.getvalue()
+    return rendered
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn rather than fork: the API process has threads (job queue, DB pool) that fork would copy mid-state
+            _pool = ProcessPoolExecutor(max_workers=THUMBNAIL_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def shutdown():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def derivative_urls(s3_key: str, formats: List[str]) -> Dict[str, Dict[str, str]]:
+    """{format: {width: url}} for an original's derivatives"""
+    return {
+        fmt: {str(width): get_public_url(derivative_key(s3_key, width, fmt)) for width in THUMBNAIL_WIDTHS}
+        for fmt in formats
+    }
+
+
+def create_derivatives(s3_key: str, force: bool = False) -> Dict[str, Dict[str, str]]:
+    """Render thumbnails for a stored original in the process pool and upload them next to it
+
+    Originals shared through the image cache already have their derivatives,
+    so those are reused unless `force` is set.
+    """
+    formats = supported_formats()
+    keys = [derivative_key(s3_key, width, fmt) for width in THUMBNAIL_WIDTHS for fmt in formats]
+    if not force and all(object_exists(key) for key in keys):
+        return derivative_urls(s3_key, formats)
+
+    original = get_s3_client().get_object(Bucket=BUCKET_NAME, Key=s3_key)
+    try:
+        data = original["Body"].read()
+    finally:
+        original["Body"].close()
+    rendered = _get_pool().submit(render_derivatives, data, THUMBNAIL_WIDTHS, formats, THUMBNAIL_QUALITY).result()
+    for (width, fmt), body in rendered.items():
+        get_s3_client().put_object(
+            Bucket=BUCKET_NAME,
+            Key=derivative_key(s3_key, width, fmt),
+            Body=body,
+            ContentType=CONTENT_TYPES.get(fmt, f"image/{fmt}"),
+            CacheControl=CACHE_CONTROL,
+        )
+    total = sum(len(body) for body in rendered.values())
+    print(f"🖼️  Stored {len(rendered)} thumbnails for {s3_key} ({total} bytes, original {len(data)} bytes)")
+    return derivative_urls(s3_key, formats)
+
+
+def thumbnails_for_url(image_url: str, force: bool = False) -> Optional[Dict[str, Dict[str, str]]]:
+    """Derivatives for an image stored in our bucket, or None if disabled or the image lives elsewhere"""
+    if not THUMBNAILS_ENABLED or not THUMBNAIL_WIDTHS:
+        return None
+    s3_key = key_for_url(image_url)
+    if s3_key is None:
+        return None
+    return create_derivatives(s3_key, force)
@@ -61,3 +61,9 @@ export const generateImageApi = useMock ? mockGenerateImageApi : {
   generate: (prompt: string, projectId: string) => 
     apiClient.post('/api/generate_image/', { prompt, project_id: projectId }),
 };
+
+// Exports are built and streamed by the backend; the browser downloads them directly
+export const exportApi = useMock ? null : {
+  url: (projectId: string, format: 'pdf' | 'zip') =>
+    `${API_URL}/api/projects/${projectId}/export?format=${format}`,
+};
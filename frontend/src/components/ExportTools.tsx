@@ -1,6 +1,7 @@
 import jsPDF from 'jspdf';
 import Konva from 'konva';
 import { useStoryboardStore } from '../store/storyboardStore';
+import { exportApi } from '../api/client';
 
 export default function ExportTools() {
   const { currentProject } = useStoryboardStore();
@@ -29,7 +30,19 @@ export default function ExportTools() {
     }
   };
 
+  const downloadServerExport = (format: 'pdf' | 'zip') => {
+    if (!exportApi || !currentProject) return;
+    // The server streams the file in story order, so large boards don't have to fit in the browser
+    const link = document.createElement('a');
+    link.href = exportApi.url(currentProject.id, format);
+    link.click();
+  };
+
   const handleExportPDF = async () => {
+    if (exportApi && currentProject) {
+      downloadServerExport('pdf');
+      return;
+    }
     try {
       const stage = Konva.stages[0];
       if (!stage) {
@@ -71,6 +84,14 @@ export default function ExportTools() {
       >
         Export PDF
       </button>
+      {exportApi && currentProject && (
+        <button
+          onClick={() => downloadServerExport('zip')}
+          className="px-4 py-2 bg-gray-700 text-white rounded-md hover:bg-gray-800"
+        >
+          Export ZIP
+        </button>
+      )}
     </div>
   );
 }
@@ -14,9 +14,23 @@ interface SceneNodeProps {
   onConnectionStart: () => void;
 }
 
+// Smallest WebP thumbnail that covers the card at this screen's pixel density, else the original
+function pickImageUrl(scene: Scene): string {
+  const webp = scene.thumbnails?.webp;
+  if (webp) {
+    const needed = scene.width * (window.devicePixelRatio || 1);
+    const widths = Object.keys(webp).map(Number).sort((a, b) => a - b);
+    const width = widths.find((w) => w >= needed);
+    if (width !== undefined) {
+      return webp[String(width)];
+    }
+  }
+  return scene.image_url || '';
+}
+
 function SceneNode({ scene, isSelected, onSelect, onDragEnd, onConnectionStart }: SceneNodeProps) {
   // Try without crossOrigin first - S3 should handle CORS via bucket policy
-  const [image, imageStatus] = useImage(scene.image_url || '');
+  const [image, imageStatus] = useImage(pickImageUrl(scene));
   const [isHovered, setIsHovered] = useState(false);
   const [loadError, setLoadError] = useState(false);
   
@@ -6,6 +6,8 @@ export type Scene = {
   prompt_text: string;
   caption?: string;
   image_url?: string;
+  // Resized copies of image_url: { format: { width: url } }
+  thumbnails?: Record<string, Record<string, string>> | null;
   x: number;
   y: number;
   width: number;